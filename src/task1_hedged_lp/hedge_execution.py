@@ -0,0 +1,287 @@
+"""
+Hedge execution-cost estimator that walks order-book depth.
+
+analyze_hedge_costs() prices funding only. This module prices the trades
+themselves: for each book snapshot and each hedge size, it walks the
+levels of the side being hit and reports the VWAP fill price, the
+slippage against mid and touch, and the number of levels consumed.
+
+The walk is vectorized. Cumulative level sizes and notionals are taken
+once per snapshot (a cumsum along depth). The number of fully consumed
+levels for every (snapshot, size) pair is then a count of cumulative
+sizes below the order size. The fill is the cumulative notional of
+those levels plus the remainder at the next level. A day of snapshots
+times a vector of sizes is a handful of array operations.
+
+Sizes are in the book's base currency (ETH). Positive sizes sell into the
+bids (adding to a short hedge); negative sizes buy from the asks. Books
+load from eth-btc-orderbooks.csv or a .obk store through the task 3
+order-book loader. Slippage is reported in bps, so it applies to a USD
+hedge of the same size even though the ETH/BTC book quotes in BTC.
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from hedge_v2_v3 import calculate_v3_hedge
+from lp_lookup import scale_quote, v3_closed_form
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'task3_suspicious_patterns'))
+
+from orderbook import BookSnapshots, ORDERBOOK_CSV, load_orderbook_csv  # noqa: E402
+
+# Configuration
+MAX_CELLS = 16_000_000  # Snapshot x level x size cells compared per chunk
+EXAMPLE_SIZES = [0.01, 0.05, 0.1, 0.5, 1.0]  # ETH
+EXAMPLE_LIQUIDITY = 500.0  # V3 liquidity of a ~$2,200 ±10% position holding ~0.52 ETH at $2,000
+
+
+def walk_levels(prices: np.ndarray, sizes: np.ndarray, quantities: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Fill quantities against one side's level arrays.
+
+    Args:
+        prices: (n, depth) level prices, best first, NaN-padded
+        sizes: (n, depth) level sizes, NaN-padded
+        quantities: (m,) sizes applied to every snapshot, or (n, m)
+            per-snapshot sizes; must be non-negative
+
+    Returns:
+        Dict of (n, m) arrays: 'filled', 'notional', 'vwap' (NaN for
+        nothing filled), 'levels' (levels touched, including a partial
+        last level) and 'complete' (whole quantity filled)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    n, depth = prices.shape
+    quantities = np.asarray(quantities, dtype=np.float64)
+    quantities = np.broadcast_to(quantities, (n, quantities.shape[-1])) if quantities.ndim == 1 else quantities
+    if quantities.shape[0] != n:
+        raise ValueError(f"Per-snapshot quantities must have {n} rows")
+    if np.any(quantities < 0):
+        raise ValueError("Quantities must be non-negative; pick the side instead")
+
+    valid = np.isfinite(prices) & np.isfinite(sizes) & (sizes > 0)
+    level_sizes = np.where(valid, sizes, 0.0)
+    cum_size = np.cumsum(level_sizes, axis=1)
+    cum_notional = np.cumsum(np.where(valid, prices * sizes, 0.0), axis=1)
+    level_prices = np.where(valid, prices, np.nan)
+
+    m = quantities.shape[1]
+    full = np.empty((n, m), dtype=np.int64)
+    rows_per_chunk = max(1, MAX_CELLS // max(1, depth * m))
+    for start in range(0, n, rows_per_chunk):
+        stop = min(n, start + rows_per_chunk)
+        # Levels whose cumulative size stays below the order are fully consumed
+        full[start:stop] = (cum_size[start:stop, :, None] < quantities[start:stop, None, :]).sum(axis=1)
+
+    rows = np.arange(n)[:, None]
+    total_size = cum_size[:, -1:] if depth else np.zeros((n, 1))
+    total_notional = cum_notional[:, -1:] if depth else np.zeros((n, 1))
+    before_size = np.where(full > 0, cum_size[rows, np.maximum(full - 1, 0)], 0.0)
+    before_notional = np.where(full > 0, cum_notional[rows, np.maximum(full - 1, 0)], 0.0)
+
+    complete = quantities <= total_size
+    partial_level = np.minimum(full, depth - 1)
+    remainder = np.where(complete, quantities - before_size, 0.0)
+    notional = np.where(complete, before_notional + remainder * np.nan_to_num(level_prices[rows, partial_level]),
+                        total_notional)
+    filled = np.where(complete, quantities, total_size)
+
+    # Levels touched: the full ones plus the partially taken one (skipping empty padding)
+    touched = np.cumsum(valid, axis=1)
+    levels = np.where(full > 0, touched[rows, np.maximum(full - 1, 0)], 0) + ((remainder > 0) & complete)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(filled > 0, notional / filled, np.nan)
+    return {'filled': filled, 'notional': notional, 'vwap': vwap, 'levels': levels, 'complete': complete}
+
+
+def estimate_execution(book: BookSnapshots, quantities) -> Dict[str, np.ndarray]:
+    """
+    Execution estimates for signed hedge sizes against every snapshot.
+
+    Args:
+        book: Order-book snapshots
+        quantities: (m,) signed sizes for every snapshot, or (n, m)
+            per-snapshot sizes (e.g. one rebalance per snapshot as (n, 1)).
+            Positive sells into the bids, negative buys from the asks.
+
+    Returns:
+        Dict of (n, m) arrays: walk_levels() outputs plus 'mid', 'touch',
+        'slippage_bps' (adverse VWAP distance from mid) and
+        'touch_slippage_bps' (from the best price on the side hit)
+    """
+    quantities = np.asarray(quantities, dtype=np.float64)
+    sell = quantities >= 0
+    size = np.abs(quantities)
+
+    # Walk both sides, then keep the one each order actually hits
+    bids = walk_levels(book.bid_prices, book.bid_sizes, np.where(sell, size, 0.0))
+    asks = walk_levels(book.ask_prices, book.ask_sizes, np.where(sell, 0.0, size))
+    sell = np.broadcast_to(sell, bids['filled'].shape)
+    result = {name: np.where(sell, bids[name], asks[name]) for name in bids}
+
+    mid = book.mid()[:, None]
+    touch = np.where(sell, book.best_bid()[:, None], book.best_ask()[:, None])
+    direction = np.where(sell, 1.0, -1.0)
+    result['mid'] = np.broadcast_to(mid, sell.shape)
+    result['touch'] = touch
+    result['slippage_bps'] = direction * (mid - result['vwap']) / mid * 10000
+    result['touch_slippage_bps'] = direction * (touch - result['vwap']) / mid * 10000
+    return result
+
+
+def execution_table(book: BookSnapshots, quantities) -> pd.DataFrame:
+    """
+    Long-format execution estimates, one row per snapshot and size.
+
+    Returns:
+        DataFrame with timestamp, size, filled, vwap, mid, slippage_bps,
+        touch_slippage_bps, levels and complete
+    """
+    result = estimate_execution(book, quantities)
+    n, m = result['vwap'].shape
+    sizes = np.broadcast_to(np.asarray(quantities, dtype=np.float64), (n, m))
+    return pd.DataFrame({
+        'timestamp': np.repeat(book.times(), m),
+        'size': sizes.ravel(),
+        'filled': result['filled'].ravel() * np.sign(sizes.ravel()),
+        'vwap': result['vwap'].ravel(),
+        'mid': result['mid'].ravel(),
+        'slippage_bps': result['slippage_bps'].ravel(),
+        'touch_slippage_bps': result['touch_slippage_bps'].ravel(),
+        'levels': result['levels'].ravel(),
+        'complete': result['complete'].ravel()
+    })
+
+
+def analyze_execution_costs(hedge_size: float, eth_price: float, book: BookSnapshots) -> dict:
+    """
+    Execution cost of one hedge trade across all snapshots.
+
+    The companion of analyze_hedge_costs(): slippage in bps is measured on
+    the book, then applied to the hedge notional at eth_price.
+
+    Args:
+        hedge_size: Signed hedge trade in ETH (positive sells)
+        eth_price: ETH price for the USD notional
+        book: Order-book snapshots
+
+    Returns:
+        Dict with slippage statistics (bps), USD cost statistics, levels
+        consumed and the fraction of snapshots deep enough to fill
+    """
+    result = estimate_execution(book, [hedge_size])
+    complete = result['complete'][:, 0]
+    slippage = result['slippage_bps'][complete, 0]
+    notional_usd = abs(hedge_size) * eth_price
+
+    if not len(slippage):
+        return {'hedge_size_eth': hedge_size, 'notional_value_usd': notional_usd,
+                'fill_rate': 0.0}
+
+    return {
+        'hedge_size_eth': hedge_size,
+        'notional_value_usd': notional_usd,
+        'fill_rate': float(complete.mean()),
+        'slippage_bps_mean': float(slippage.mean()),
+        'slippage_bps_median': float(np.median(slippage)),
+        'slippage_bps_p95': float(np.percentile(slippage, 95)),
+        'execution_cost_mean': float(slippage.mean()) / 10000 * notional_usd,
+        'execution_cost_p95': float(np.percentile(slippage, 95)) / 10000 * notional_usd,
+        'levels_mean': float(result['levels'][complete, 0].mean())
+    }
+
+
+def v3_rebalance_sizes(eth_prices: np.ndarray, liquidity: float, range_pct: float = 0.10) -> np.ndarray:
+    """
+    Hedge trades that keep a V3 position delta-neutral along a price path.
+
+    The range is set once around the first price and held fixed. The short
+    tracks the ETH the position holds (its value delta, see formulas.md),
+    so the first element opens the hedge at the entry ETH amount and later
+    ones are the changes in ETH held between consecutive prices. Outside
+    the range the holdings stop changing and no trades are needed.
+
+    Args:
+        eth_prices: ETH price path, entry price first
+        liquidity: V3 liquidity L
+        range_pct: Half-width of the range around the entry price
+
+    Returns:
+        Signed hedge trades in ETH (positive sells)
+    """
+    eth_prices = np.asarray(eth_prices, dtype=np.float64)
+    entry_price = float(eth_prices[0])
+    _, info = calculate_v3_hedge(entry_price, liquidity, range_pct)
+    position_value = info['eth_amount'] * entry_price + info['usdt_amount']
+
+    quote = v3_closed_form(eth_prices / entry_price, range_pct)
+    eth_held = scale_quote(quote, position_value, entry_price)['delta_eth']
+    return np.diff(eth_held, prepend=0.0)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Estimate hedge execution costs over the ETH/BTC book capture."""
+    parser = argparse.ArgumentParser(description='Hedge execution-cost estimator')
+    parser.add_argument('--book', default=ORDERBOOK_CSV, help='Order-book CSV or .obk store')
+    args = parser.parse_args(argv)
+
+    if args.book.endswith('.obk'):
+        from book_store import BookStore
+        with BookStore(args.book) as store:
+            book = store.read()
+    else:
+        book = load_orderbook_csv(args.book)
+    print("=== Hedge Execution Costs ===\n")
+    print(f"Snapshots: {len(book)} (depth {book.depth})")
+    print(f"Median visible depth: bids {np.median(np.nansum(book.bid_sizes, axis=1)):.4f} ETH, "
+          f"asks {np.median(np.nansum(book.ask_sizes, axis=1)):.4f} ETH\n")
+
+    sizes = np.array(EXAMPLE_SIZES + [-s for s in EXAMPLE_SIZES])
+    table = execution_table(book, sizes)
+    summary = table.groupby('size').agg(
+        fill_rate=('complete', 'mean'),
+        slippage_bps=('slippage_bps', 'median'),
+        touch_slippage_bps=('touch_slippage_bps', 'median'),
+        levels=('levels', 'median'))
+    print("Median cost per hedge size (positive sells into bids):")
+    print(summary.to_string(float_format='%.3f'))
+
+    # A small V3 position hedged along the book's own price path: relative
+    # ETH/BTC moves are applied to a $2,000 ETH price, the range stays at entry
+    eth_prices = 2000.0 * book.mid() / book.mid()[0]
+    _, info = calculate_v3_hedge(eth_prices[0], EXAMPLE_LIQUIDITY)
+    rebalances = v3_rebalance_sizes(eth_prices, EXAMPLE_LIQUIDITY)
+    result = estimate_execution(book, rebalances[:, None])
+    trades = np.abs(rebalances) > 0
+    complete = result['complete'][:, 0] & trades
+    cost_usd = np.abs(rebalances) * eth_prices * result['slippage_bps'][:, 0] / 10000
+    later = np.arange(len(rebalances)) > 0
+
+    print(f"\nV3 position along the captured path (L = {EXAMPLE_LIQUIDITY:,.0f}, "
+          f"range ${info['p_low']:,.0f}-${info['p_high']:,.0f}):")
+    print(f"  Entry: {info['eth_amount']:.4f} ETH + {info['usdt_amount']:,.2f} USDT, "
+          f"ETH moved {eth_prices.min() / eth_prices[0] - 1:+.2%} to {eth_prices.max() / eth_prices[0] - 1:+.2%}")
+    print(f"  Opening hedge: {rebalances[0]:.4f} ETH, slippage {result['slippage_bps'][0, 0]:.2f} bps, "
+          f"cost ${cost_usd[0]:,.2f}")
+    print(f"  Rebalances: {int(trades[later].sum())} trades, {np.abs(rebalances[later]).sum():.4f} ETH traded, "
+          f"filled within visible depth: {int(complete[later].sum())}, "
+          f"cost ${np.nansum(cost_usd[complete & later]):,.2f}")
+    print(f"  Hedge at end: {rebalances.sum():.4f} ETH short")
+    print(f"  Total execution cost: ${np.nansum(cost_usd[complete]):,.2f}")
+
+    costs = analyze_execution_costs(rebalances[0], eth_prices[0], book)
+    print("\nInitial hedge across all snapshots:")
+    for name, value in costs.items():
+        print(f"  {name}: {value:,.4f}")
+
+
+if __name__ == "__main__":
+    main()
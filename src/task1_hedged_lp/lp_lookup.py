@@ -0,0 +1,416 @@
+"""
+Precomputed Uniswap V3 LP value / IL / delta / gamma lookup tables.
+
+All quantities are normalized by the position's entry value V0 and entry
+price P0, so one table serves every position size and price level:
+
+    value  = V(P) / V0
+    il     = V(P) / HODL(P) - 1
+    delta  = dV/dP   in units of V0 / P0     (ETH held, as a fraction of V0/P0)
+    gamma  = d2V/dP2 in units of V0 / P0^2
+
+For a range [P0(1-w), P0(1+w)] these depend only on w and r = P/P0. Each
+tabulated width gets a grid of CELLS_PER_RANGE cells uniform in r across
+the range, plus one cell on either side. Every cell stores an intercept
+and a slope per quantity, so a quote is one multiply-add for the cell
+coordinate, one gather of the cell's six coefficients and one multiply-add
+per quantity. There is no search, square root or branch. Out of range the
+position is all ETH or all USDT: value is linear in r and delta and gamma
+are constant, so extrapolating the edge cells is exact. IL is derived
+exactly from the value and the (linear) HODL value.
+
+The tables for all widths are flattened into one coefficient array. Callers
+quoting many prices per position look up each width's table index once with
+range_index() and call quote_index(); quote_v3() does that lookup itself
+and falls back to the closed form for widths that were not tabulated. V2
+positions always use the closed form, which is a single square root.
+
+Interpolation error is measured against the closed forms when the tables
+are built (see formulas.md, "Lookup Tables").
+"""
+
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from hedge_v2_v3 import calculate_v2_hedge, calculate_v3_hedge
+
+# Configuration
+RANGE_PCTS = [0.005, 0.01, 0.02, 0.05, 0.10, 0.20, 0.50]  # Tabulated range half-widths
+CELLS_PER_RANGE = 512  # Grid cells across each range
+N_ERROR_SAMPLES = 200000
+N_BENCHMARK = 1000000
+
+QUANTITIES = ['value', 'il', 'delta', 'gamma']
+TABULATED = ['value', 'delta', 'gamma']  # il is derived from value
+
+
+def entry_value(range_pct: np.ndarray) -> np.ndarray:
+    """Entry value of a +/-range_pct position in units of L sqrt(P0)."""
+    return 2 - 1 / np.sqrt(1 + range_pct) - np.sqrt(1 - range_pct)
+
+
+def v3_closed_form(price_ratio: np.ndarray, range_pct: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Exact normalized V3 quantities for a symmetric +/-range_pct position.
+
+    With s = sqrt(r), a = sqrt(1-w), b = sqrt(1+w) and entry value
+    V0 = L sqrt(P0) (2 - 1/b - a):
+
+        below range  V / (L sqrt(P0)) = s^2 (1/a - 1/b)
+        in range     V / (L sqrt(P0)) = 2s - s^2/b - a
+        above range  V / (L sqrt(P0)) = b - a
+
+    Args:
+        price_ratio: P / P0
+        range_pct: Half-width w of the range as a fraction of P0
+
+    Returns:
+        Dict of value, il, delta, gamma arrays (normalized as in the module docstring)
+    """
+    r = np.asarray(price_ratio, dtype=np.float64)
+    w = np.asarray(range_pct, dtype=np.float64)
+    r, w = np.broadcast_arrays(r, w)
+
+    s = np.sqrt(r)
+    a = np.sqrt(1 - w)
+    b = np.sqrt(1 + w)
+    entry = entry_value(w)
+
+    below = s < a
+    above = s > b
+    s_in = np.clip(s, a, b)
+
+    value = np.where(below, r * (1 / a - 1 / b), np.where(above, b - a, 2 * s_in - s_in ** 2 / b - a)) / entry
+    delta = np.where(below, 1 / a - 1 / b, np.where(above, 0.0, 1 / s_in - 1 / b)) / entry
+    gamma = np.where(below | above, 0.0, -1 / (2 * s_in ** 3)) / entry
+
+    # HODL keeps the entry token amounts: x0 = L(1 - 1/b)/sqrt(P0), y0 = L sqrt(P0)(1 - a)
+    hodl = (r * (1 - 1 / b) + (1 - a)) / entry
+    il = value / hodl - 1
+
+    return {'value': value, 'il': il, 'delta': delta, 'gamma': gamma}
+
+
+def v2_closed_form(price_ratio: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Exact normalized V2 (full-range 50/50) quantities.
+
+    value = sqrt(r), il = 2 sqrt(r) / (1 + r) - 1, delta = 1 / (2 sqrt(r)),
+    gamma = -1 / (4 r^1.5).
+    """
+    r = np.asarray(price_ratio, dtype=np.float64)
+    s = np.sqrt(r)
+    return {
+        'value': s,
+        'il': 2 * s / (1 + r) - 1,
+        'delta': 0.5 / s,
+        'gamma': -0.25 / (s * r)
+    }
+
+
+class LPLookup:
+    """
+    Piecewise-linear lookup tables of normalized V3 quantities, one per range width.
+
+    Args:
+        range_pcts: Range half-widths to tabulate
+        cells: Grid cells across each range
+        error_bounds: Optional measured max error per quantity (relative; il absolute)
+    """
+
+    def __init__(self, range_pcts: Sequence[float] = RANGE_PCTS, cells: int = CELLS_PER_RANGE,
+                 error_bounds: Optional[Dict[str, float]] = None):
+        self.range_pcts = np.unique(np.asarray(range_pcts, dtype=np.float64))
+        if len(self.range_pcts) == 0 or self.range_pcts[0] <= 0 or self.range_pcts[-1] >= 1:
+            raise ValueError("Range widths must be in (0, 1)")
+        self.cells = cells
+        self.n_nodes = cells + 3  # One extra node below and above the range
+        self._build()
+        self.error_bounds = error_bounds if error_bounds is not None else self.measure_error()
+
+    def _build(self) -> None:
+        w = self.range_pcts[:, None]
+        step = 2 * w / self.cells
+        origin = 1 - w - step
+
+        # Nodes in r; the range edges are set exactly so the edge cells do not straddle them
+        r = origin + step * np.arange(self.n_nodes)
+        r[:, 1] = 1 - self.range_pcts
+        r[:, -2] = 1 + self.range_pcts
+
+        self._inv_step = (1 / step).ravel()
+        self._shift = (origin / step).ravel()
+        self._offset = np.arange(len(self.range_pcts)) * (self.n_nodes - 1)
+        # HODL value in units of V0 is linear in r (see v3_closed_form)
+        entry = entry_value(self.range_pcts)
+        self._hodl_slope = (1 - 1 / np.sqrt(1 + self.range_pcts)) / entry
+        self._hodl_base = (1 - np.sqrt(1 - self.range_pcts)) / entry
+
+        x = r * self._inv_step[:, None] - self._shift[:, None]
+        exact = v3_closed_form(r, np.broadcast_to(w, r.shape))
+        nodes = np.stack([exact[name] for name in TABULATED])  # (quantity, width, node)
+        slope = np.diff(nodes, axis=-1) / np.diff(x, axis=-1)
+        intercept = nodes[..., :-1] - slope * x[:, :-1]
+        # Gamma jumps to zero at the range edges; the outer cells are flat
+        gamma = TABULATED.index('gamma')
+        slope[gamma, :, [0, -1]] = 0.0
+        intercept[gamma, :, [0, -1]] = 0.0
+
+        # Flattened (intercepts then slopes, width * cell) so one take() gathers a cell
+        n_cells = len(self.range_pcts) * (self.n_nodes - 1)
+        self.coefficients = np.ascontiguousarray(
+            np.concatenate([intercept, slope]).reshape(2 * len(TABULATED), n_cells))
+
+        # Plain-float copies for single quotes, where NumPy call overhead dominates
+        self._width_index = {float(width): i for i, width in enumerate(self.range_pcts)}
+        self._cell_rows = self.coefficients.T.tolist()
+        self._scalars = list(zip(self._inv_step.tolist(), self._shift.tolist(), self._offset.tolist(),
+                                 self._hodl_slope.tolist(), self._hodl_base.tolist()))
+
+    def range_index(self, range_pct: np.ndarray) -> np.ndarray:
+        """Table index of each range width (-1 where the width is not tabulated)."""
+        w = np.asarray(range_pct, dtype=np.float64)
+        index = np.minimum(np.searchsorted(self.range_pcts, w), len(self.range_pcts) - 1)
+        return np.where(self.range_pcts[index] == w, index, -1)
+
+    def quote_index(self, price_ratio: np.ndarray, index) -> Dict[str, np.ndarray]:
+        """
+        Normalized V3 quantities for precomputed table indices.
+
+        Args:
+            price_ratio: P / P0 (any shape)
+            index: Table index from range_index(), a scalar or an array of
+                price_ratio's shape; every index must be valid
+
+        Returns:
+            Dict of value, il, delta, gamma arrays of price_ratio's shape.
+            Exactly at a range edge gamma jumps, and rounding decides
+            whether the in-range value or 0 is returned.
+        """
+        r = np.asarray(price_ratio, dtype=np.float64)
+        if np.ndim(index) == 0:
+            inv_step, shift, offset, hodl_slope, hodl_base = self._scalars[int(index)]
+        else:
+            inv_step, shift = self._inv_step[index], self._shift[index]
+            offset, hodl_slope, hodl_base = self._offset[index], self._hodl_slope[index], self._hodl_base[index]
+
+        x = r * inv_step - shift
+        cell = x.astype(np.int64)
+        np.clip(cell, 0, self.n_nodes - 2, out=cell)
+        cell += offset
+        coefficients = self.coefficients.take(cell, axis=1)
+
+        n = len(TABULATED)
+        values = coefficients[n:] * x
+        values += coefficients[:n]
+        value, delta, gamma = values
+        il = value / (r * hodl_slope + hodl_base)
+        il -= 1
+        return {'value': value, 'il': il, 'delta': delta, 'gamma': gamma}
+
+    def _quote_scalar(self, r: float, index: int) -> Dict[str, float]:
+        inv_step, shift, offset, hodl_slope, hodl_base = self._scalars[index]
+        x = r * inv_step - shift
+        a_value, a_delta, a_gamma, b_value, b_delta, b_gamma = \
+            self._cell_rows[min(max(int(x), 0), self.n_nodes - 2) + offset]
+        value = a_value + b_value * x
+        return {'value': value, 'il': value / (r * hodl_slope + hodl_base) - 1,
+                'delta': a_delta + b_delta * x, 'gamma': a_gamma + b_gamma * x}
+
+    def quote_v3(self, price_ratio: np.ndarray, range_pct: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Normalized V3 quantities by table lookup.
+
+        Tabulated widths are looked up; any other width uses the closed form.
+        Scalar queries return floats.
+
+        Args:
+            price_ratio: P / P0 (array or scalar)
+            range_pct: Range half-width w (array or scalar)
+
+        Returns:
+            Dict of value, il, delta, gamma arrays
+        """
+        if np.ndim(price_ratio) == 0 and np.ndim(range_pct) == 0:
+            index = self._width_index.get(float(range_pct))
+            if index is None:
+                return {name: float(v) for name, v in v3_closed_form(price_ratio, range_pct).items()}
+            return self._quote_scalar(float(price_ratio), index)
+
+        index = self.range_index(range_pct)
+        if np.ndim(index) == 0:
+            if index < 0:
+                return v3_closed_form(price_ratio, range_pct)
+            return self.quote_index(price_ratio, int(index))
+
+        r, index = np.broadcast_arrays(np.asarray(price_ratio, dtype=np.float64), index)
+        tabulated = index >= 0
+        if tabulated.all():
+            return self.quote_index(r, index)
+
+        result = {name: np.empty(r.shape) for name in QUANTITIES}
+        looked_up = self.quote_index(r[tabulated], index[tabulated])
+        exact = v3_closed_form(r[~tabulated], np.broadcast_to(range_pct, r.shape)[~tabulated])
+        for name in QUANTITIES:
+            result[name][tabulated] = looked_up[name]
+            result[name][~tabulated] = exact[name]
+        return result
+
+    def measure_error(self, n_samples: int = N_ERROR_SAMPLES, seed: int = 0) -> Dict[str, float]:
+        """
+        Worst interpolation error over random in-range points.
+
+        Half the samples are cell centres, where linear interpolation error
+        peaks. Value, delta and gamma errors are relative; il errors are
+        absolute (il is zero at entry, so a relative error is meaningless
+        there). Out of range the tables are exact.
+        """
+        rng = np.random.default_rng(seed)
+        n_random = n_samples // 2
+        index = rng.integers(0, len(self.range_pcts), n_samples)
+        # Cell coordinates 1..cells + 1 span the range
+        x = rng.uniform(1, self.cells + 1, n_samples)
+        x[n_random:] = np.floor(x[n_random:]) + 0.5
+        r = (x + self._shift[index]) / self._inv_step[index]
+
+        exact = v3_closed_form(r, self.range_pcts[index])
+        approx = self.quote_index(r, index)
+        errors = {}
+        for name in QUANTITIES:
+            error = np.abs(approx[name] - exact[name])
+            if name != 'il':
+                error = error / np.abs(exact[name])
+            errors[name] = float(np.max(error))
+        return errors
+
+
+def scale_quote(quote: Dict[str, np.ndarray], position_usd: float, entry_price: float) -> Dict[str, np.ndarray]:
+    """
+    Convert a normalized quote to position units.
+
+    Returns:
+        value_usd, il (fraction), delta_eth (ETH to short for delta-neutral)
+        and gamma (ETH per USD of price move)
+    """
+    return {
+        'value_usd': quote['value'] * position_usd,
+        'il': quote['il'],
+        'delta_eth': quote['delta'] * position_usd / entry_price,
+        'gamma': quote['gamma'] * position_usd / entry_price ** 2
+    }
+
+
+def check_against_formulas(lookup: LPLookup, eth_price: float = 2000.0, liquidity: float = 1000.0,
+                           position_usd: float = 100000.0) -> Dict[str, float]:
+    """
+    Compare lookups with the formulas.md closed forms in hedge_v2_v3.
+
+    Checks, as relative errors:
+    - V2 delta against calculate_v2_hedge, V/(2P)
+    - V3 entry value and delta against the token amounts of calculate_v3_hedge
+    - V3 gamma against L/(2 P^1.5), the rate of change of the ETH amount
+    - V3 value across the range against token amounts re-derived at each price
+    """
+    errors = {}
+
+    v2 = scale_quote(v2_closed_form(1.0), position_usd, eth_price)
+    errors['v2_delta'] = abs(v2['delta_eth'] / calculate_v2_hedge(eth_price, position_usd) - 1)
+
+    worst = {'v3_entry_value': 0.0, 'v3_delta': 0.0, 'v3_gamma': 0.0, 'v3_value_path': 0.0}
+    for range_pct in lookup.range_pcts:
+        rate_of_eth, info = calculate_v3_hedge(eth_price, liquidity, range_pct)
+        position_value = info['eth_amount'] * eth_price + info['usdt_amount']
+        quote = scale_quote(lookup.quote_v3(1.0, range_pct), position_value, eth_price)
+
+        worst['v3_entry_value'] = max(worst['v3_entry_value'], abs(quote['value_usd'] / position_value - 1))
+        worst['v3_delta'] = max(worst['v3_delta'], abs(quote['delta_eth'] / info['eth_amount'] - 1))
+        worst['v3_gamma'] = max(worst['v3_gamma'], abs(-quote['gamma'] / rate_of_eth - 1))
+
+        # Hold L and the range fixed and move the price through and past the range
+        p_low, p_high = info['p_low'], info['p_high']
+        prices = eth_price * np.linspace(1 - 1.5 * range_pct, 1 + 1.5 * range_pct, 61)
+        sp = np.sqrt(np.clip(prices, p_low, p_high))
+        eth = liquidity * (1 / sp - 1 / np.sqrt(p_high))
+        usdt = liquidity * (sp - np.sqrt(p_low))
+        expected = eth * prices + usdt
+        quoted = lookup.quote_v3(prices / eth_price, range_pct)['value'] * position_value
+        worst['v3_value_path'] = max(worst['v3_value_path'], float(np.max(np.abs(quoted / expected - 1))))
+
+    errors.update(worst)
+    return errors
+
+
+def _best_time(func, repeats: int) -> float:
+    best = np.inf
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def benchmark(lookup: LPLookup, n: int = N_BENCHMARK, seed: int = 1) -> Dict[str, float]:
+    """
+    Time table quotes against the closed form (best of several runs).
+
+    Returns:
+        Seconds per batch of n quotes for mixed widths (closed form,
+        quote_v3, quote_index with precomputed indices) and a single width,
+        plus microseconds per scalar quote
+    """
+    rng = np.random.default_rng(seed)
+    ratios = rng.uniform(0.8, 1.2, n)
+    widths = rng.choice(lookup.range_pcts, n)
+    index = lookup.range_index(widths)
+    width = float(np.median(lookup.range_pcts))
+
+    return {
+        'mixed_closed_form': _best_time(lambda: v3_closed_form(ratios, widths), 5),
+        'mixed_quote_v3': _best_time(lambda: lookup.quote_v3(ratios, widths), 5),
+        'mixed_quote_index': _best_time(lambda: lookup.quote_index(ratios, index), 5),
+        'single_closed_form': _best_time(lambda: v3_closed_form(ratios, width), 5),
+        'single_quote_v3': _best_time(lambda: lookup.quote_v3(ratios, width), 5),
+        'scalar_closed_form_us': _best_time(lambda: [v3_closed_form(1.05, width) for _ in range(1000)], 5) * 1000,
+        'scalar_quote_v3_us': _best_time(lambda: [lookup.quote_v3(1.05, width) for _ in range(1000)], 5) * 1000
+    }
+
+
+def main():
+    """Build the tables, report their error and speed, and quote an example position."""
+    print("=== LP Lookup Tables ===\n")
+
+    started = time.perf_counter()
+    lookup = LPLookup()
+    print(f"Tables ready in {time.perf_counter() - started:.3f}s "
+          f"({len(lookup.range_pcts)} widths x {lookup.cells} cells)")
+
+    print("\nInterpolation error bounds (relative; il absolute):")
+    for name, bound in lookup.error_bounds.items():
+        print(f"  {name:>6}: {bound:.2e}")
+
+    print("\nCheck against formulas.md closed forms (max relative error):")
+    for name, error in check_against_formulas(lookup).items():
+        print(f"  {name:>15}: {error:.2e}")
+
+    timings = benchmark(lookup)
+    print(f"\nV3 quotes, batch of {N_BENCHMARK:,} (ms):")
+    print(f"  Mixed widths: closed form {timings['mixed_closed_form'] * 1000:.1f}, "
+          f"quote_v3 {timings['mixed_quote_v3'] * 1000:.1f}, "
+          f"quote_index {timings['mixed_quote_index'] * 1000:.1f}")
+    print(f"  One width:    closed form {timings['single_closed_form'] * 1000:.1f}, "
+          f"quote_v3 {timings['single_quote_v3'] * 1000:.1f}")
+    print(f"  Scalar quote (us): closed form {timings['scalar_closed_form_us']:.1f}, "
+          f"quote_v3 {timings['scalar_quote_v3_us']:.1f}")
+
+    quote = scale_quote(lookup.quote_v3(1.05, 0.10), 100000.0, 2000.0)
+    print("\n±10% V3 position, $100,000 at $2,000, price moves to $2,100:")
+    print(f"  Value: ${float(quote['value_usd']):,.2f}")
+    print(f"  IL: {float(quote['il']) * 100:.4f}%")
+    print(f"  Hedge (short): {float(quote['delta_eth']):.4f} ETH")
+    print(f"  Gamma: {float(quote['gamma']):.6f} ETH per $")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Entry point for ``python -m src.task2_usdc_peg``.
+
+The task modules import each other as top-level scripts (``from utils
+import ...``), so this directory is put on the path before loading the
+pipeline.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import main  # noqa: E402
+
+main()
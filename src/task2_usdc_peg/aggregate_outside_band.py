@@ -11,8 +11,9 @@ import os
 from datetime import datetime, timezone
 from utils import (
     load_from_parquet, save_to_csv, aggregate_hourly_data, 
-    merge_venue_data, is_outside_band, create_temp_dir
+    merge_venue_data, is_outside_band, create_temp_dir, RAW_COLUMNS
 )
+from instrumentation import stage, count, get_recorder, print_report
 
 
 def load_venue_data(venue: str) -> pd.DataFrame:
@@ -30,7 +31,7 @@ def load_venue_data(venue: str) -> pd.DataFrame:
     
     if not os.path.exists(filepath):
         print(f"Warning: {filepath} not found, creating empty DataFrame")
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+        return pd.DataFrame(columns=RAW_COLUMNS)
     
     try:
         df = load_from_parquet(filepath)
@@ -38,7 +39,7 @@ def load_venue_data(venue: str) -> pd.DataFrame:
         return df
     except Exception as e:
         print(f"Error loading {venue} data: {e}")
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+        return pd.DataFrame(columns=RAW_COLUMNS)
 
 
 def process_venue_data(df: pd.DataFrame, venue: str) -> pd.DataFrame:
@@ -58,21 +59,26 @@ def process_venue_data(df: pd.DataFrame, venue: str) -> pd.DataFrame:
             'time', f'{venue}_volume', f'{venue}_min_price', f'{venue}_max_price'
         ])
     
-    # Filter for outside band trades
-    df['outside_band'] = df['price'].apply(is_outside_band)
-    outside_df = df[df['outside_band']].copy()
-    
-    print(f"{venue}: {len(outside_df)} trades outside band out of {len(df)} total")
-    
-    if outside_df.empty:
-        print(f"No outside-band trades for {venue}")
-        return pd.DataFrame(columns=[
-            'time', f'{venue}_volume', f'{venue}_min_price', f'{venue}_max_price'
-        ])
-    
-    # Aggregate by hour
-    agg_df = aggregate_hourly_data(outside_df, venue)
-    print(f"{venue}: Aggregated into {len(agg_df)} hours")
+    with stage(f'aggregate.{venue}'):
+        count('rows_in', len(df))
+        
+        # Filter for outside band trades
+        df['outside_band'] = df['price'].apply(is_outside_band)
+        outside_df = df[df['outside_band']].copy()
+        count('outside_band_rows', len(outside_df))
+        
+        print(f"{venue}: {len(outside_df)} trades outside band out of {len(df)} total")
+        
+        if outside_df.empty:
+            print(f"No outside-band trades for {venue}")
+            return pd.DataFrame(columns=[
+                'time', f'{venue}_volume', f'{venue}_min_price', f'{venue}_max_price'
+            ])
+        
+        # Aggregate by hour
+        agg_df = aggregate_hourly_data(outside_df, venue)
+        count('hours_out', len(agg_df))
+        print(f"{venue}: Aggregated into {len(agg_df)} hours")
     
     return agg_df
 
@@ -87,7 +93,7 @@ def create_full_hour_range() -> pd.DataFrame:
     start_time = datetime(2025, 7, 1, tzinfo=timezone.utc)
     end_time = datetime(2025, 9, 30, 23, tzinfo=timezone.utc)
     
-    hours = pd.date_range(start=start_time, end=end_time, freq='H')
+    hours = pd.date_range(start=start_time, end=end_time, freq='h')
     hour_strings = [h.strftime('%Y-%m-%dT%H:%M:%SZ') for h in hours]
     
     return pd.DataFrame({'time': hour_strings})
@@ -257,6 +263,12 @@ def main():
     print(f"\nOutput saved to: {output_path}")
     print(f"Output shape: {final_df.shape}")
     
+    # Save run report
+    report_path = os.path.join(create_temp_dir(), 'aggregate_run_report.json')
+    get_recorder().write_report(report_path)
+    print_report(get_recorder().report())
+    print(f"Run report saved to: {report_path}")
+    
     # Show sample
     print("\nSample output:")
     print(final_df.head(10))
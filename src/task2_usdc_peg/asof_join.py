@@ -0,0 +1,186 @@
+"""
+Trade-level cross-venue as-of join for DEX/CEX dislocation analysis.
+
+Attaches the latest Bybit reference price (last trade, or mid when book
+data is available) to every Uniswap swap, and the latest Uniswap swap
+price to every Bybit trade. Both sides are sorted by timestamp once and
+matched with a single searchsorted pass, so no hour-expanded grid or
+pandas merge is needed.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import save_to_parquet, create_temp_dir
+
+
+def _sorted_view(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df sorted by timestamp, skipping the sort when already ordered."""
+    timestamps = df['timestamp'].to_numpy()
+    if len(timestamps) < 2 or np.all(timestamps[1:] >= timestamps[:-1]):
+        return df
+    return df.iloc[np.argsort(timestamps, kind='stable')]
+
+
+def asof_indices(left_ts: np.ndarray, right_ts: np.ndarray) -> np.ndarray:
+    """
+    Index of the latest right row at or before each left timestamp.
+
+    Args:
+        left_ts: Timestamps to look up
+        right_ts: Sorted reference timestamps
+
+    Returns:
+        Array of indices into right_ts, -1 where no earlier row exists
+    """
+    return np.searchsorted(right_ts, left_ts, side='right') - 1
+
+
+def attach_asof(left: pd.DataFrame, right: pd.DataFrame, value_col: str,
+                prefix: str, max_staleness: Optional[int] = None) -> pd.DataFrame:
+    """
+    Attach the latest right-side value to each left row.
+
+    Args:
+        left: Rows to enrich ('timestamp' in seconds)
+        right: Reference rows ('timestamp' and value_col)
+        value_col: Column of right to attach
+        prefix: Prefix for the new columns
+        max_staleness: Drop matches older than this many seconds (None keeps all)
+
+    Returns:
+        Copy of left (sorted by timestamp) with '{prefix}_price' and
+        '{prefix}_age_seconds' columns
+    """
+    left = _sorted_view(left).copy()
+    right = _sorted_view(right)
+
+    left_ts = left['timestamp'].to_numpy(dtype=np.int64)
+    right_ts = right['timestamp'].to_numpy(dtype=np.int64)
+    values = right[value_col].to_numpy(dtype=np.float64)
+
+    prices = np.full(len(left_ts), np.nan)
+    ages = np.full(len(left_ts), np.nan)
+
+    idx = asof_indices(left_ts, right_ts)
+    matched = idx >= 0
+    prices[matched] = values[idx[matched]]
+    ages[matched] = left_ts[matched] - right_ts[idx[matched]]
+
+    if max_staleness is not None:
+        stale = ages > max_staleness
+        prices[stale] = np.nan
+        ages[stale] = np.nan
+
+    left[f'{prefix}_price'] = prices
+    left[f'{prefix}_age_seconds'] = ages
+    return left
+
+
+def book_mid_prices(book_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute mid prices from top-of-book snapshots.
+
+    Args:
+        book_df: Snapshots with 'timestamp', 'best_bid' and 'best_ask'
+
+    Returns:
+        DataFrame with 'timestamp' and 'price' (mid) for valid two-sided books
+    """
+    bids = book_df['best_bid'].to_numpy(dtype=np.float64)
+    asks = book_df['best_ask'].to_numpy(dtype=np.float64)
+    valid = (bids > 0) & (asks > 0) & (asks >= bids)
+
+    return pd.DataFrame({
+        'timestamp': book_df['timestamp'].to_numpy()[valid],
+        'price': (bids[valid] + asks[valid]) / 2
+    })
+
+
+def compute_swap_dislocation(uniswap_df: pd.DataFrame, bybit_df: pd.DataFrame,
+                             bybit_book: Optional[pd.DataFrame] = None,
+                             max_staleness: Optional[int] = None) -> pd.DataFrame:
+    """
+    Per-swap dislocation of Uniswap prices against the latest Bybit reference.
+
+    Args:
+        uniswap_df: Raw Uniswap swaps
+        bybit_df: Raw Bybit trades
+        bybit_book: Optional Bybit top-of-book snapshots; mids are used instead
+            of last trade prices when given
+        max_staleness: Ignore Bybit references older than this many seconds
+
+    Returns:
+        Uniswap swaps with 'cex_price', 'cex_age_seconds' and 'dislocation_bps'
+    """
+    reference = book_mid_prices(bybit_book) if bybit_book is not None else bybit_df
+    result = attach_asof(uniswap_df, reference, 'price', 'cex', max_staleness)
+    result['dislocation_bps'] = (result['price'] / result['cex_price'] - 1) * 10000
+    return result
+
+
+def compute_trade_dislocation(bybit_df: pd.DataFrame, uniswap_df: pd.DataFrame,
+                              max_staleness: Optional[int] = None) -> pd.DataFrame:
+    """
+    Per-trade dislocation of Bybit prices against the latest Uniswap swap.
+
+    Args:
+        bybit_df: Raw Bybit trades
+        uniswap_df: Raw Uniswap swaps
+        max_staleness: Ignore swaps older than this many seconds
+
+    Returns:
+        Bybit trades with 'dex_price', 'dex_age_seconds' and 'dislocation_bps'
+    """
+    result = attach_asof(bybit_df, uniswap_df, 'price', 'dex', max_staleness)
+    result['dislocation_bps'] = (result['price'] / result['dex_price'] - 1) * 10000
+    return result
+
+
+def summarize_dislocation(df: pd.DataFrame, venue: str) -> None:
+    """Print summary statistics for a dislocation table."""
+    matched = df.dropna(subset=['dislocation_bps'])
+    print(f"\n{venue}: {len(matched)} of {len(df)} rows matched")
+
+    if matched.empty:
+        return
+
+    abs_bps = matched['dislocation_bps'].abs()
+    age_col = [c for c in matched.columns if c.endswith('_age_seconds')][0]
+    print(f"  Median |dislocation|: {abs_bps.median():.2f} bps")
+    print(f"  99th pct |dislocation|: {abs_bps.quantile(0.99):.2f} bps")
+    print(f"  Rows > 10 bps: {(abs_bps > 10).sum()}")
+    print(f"  Median reference age: {matched[age_col].median():.0f}s")
+
+
+def main():
+    """Compute per-swap and per-trade cross-venue dislocation."""
+    from aggregate_outside_band import load_venue_data
+
+    print("Starting cross-venue as-of join...")
+    temp_dir = create_temp_dir()
+
+    uniswap_df = load_venue_data('uniswap')
+    bybit_df = load_venue_data('bybit')
+
+    if uniswap_df.empty or bybit_df.empty:
+        print("Both venues are required for the as-of join!")
+        return
+
+    swaps = compute_swap_dislocation(uniswap_df, bybit_df)
+    trades = compute_trade_dislocation(bybit_df, uniswap_df)
+
+    summarize_dislocation(swaps, 'uniswap')
+    summarize_dislocation(trades, 'bybit')
+
+    for name, df in [('uniswap_dislocation', swaps), ('bybit_dislocation', trades)]:
+        output_path = os.path.join(temp_dir, f'{name}.parquet')
+        save_to_parquet(df, output_path)
+        print(f"Saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Segment USDC peg deviations into episodes.
+
+Hourly buckets blur individual depeg events, so this module walks the
+merged, time-ordered trade stream of both venues and groups outside-band
+trades into episodes: consecutive outside-band trades at most a gap
+tolerance apart belong to the same episode. The extractor keeps the last
+open episode between chunks and applies the same rule across them, so
+shards can be streamed through it in order with the same result as one
+pass over the whole stream.
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import outside_band_mask
+
+# Configuration
+VENUES = ['uniswap', 'bybit']
+DEFAULT_GAP_TOLERANCE = 60  # Max seconds between consecutive outside-band trades of one episode
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+EPISODE_COLUMNS = [
+    'start', 'end', 'duration_seconds', 'max_deviation_bps',
+    'min_price', 'max_price', 'uniswap_volume', 'bybit_volume',
+    'uniswap_trades', 'bybit_trades', 'first_venue'
+]
+
+
+def format_timestamp(timestamp: int) -> str:
+    """Format unix timestamp as ISO8601 (same format as the hourly table)."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def merge_venue_streams(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Merge per-venue raw trades into one time-ordered stream.
+
+    Args:
+        frames: Venue name -> raw trades ('timestamp', 'price', 'volume')
+
+    Returns:
+        DataFrame sorted by timestamp with a 'venue' column
+    """
+    parts = []
+    for venue, df in frames.items():
+        if df.empty:
+            continue
+        part = df[['timestamp', 'price', 'volume']].copy()
+        part['venue'] = venue
+        parts.append(part)
+
+    if not parts:
+        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+
+    merged = pd.concat(parts, ignore_index=True)
+    # Each venue is already time-ordered, so the stable sort only has to
+    # interleave sorted runs, which timsort does in linear time
+    order = np.argsort(merged['timestamp'].to_numpy(), kind='stable')
+    return merged.iloc[order].reset_index(drop=True)
+
+
+class EpisodeExtractor:
+    """
+    Streaming peg-deviation episode extractor.
+
+    Feed time-ordered chunks of the merged stream to update(); each call
+    returns the episodes that can no longer be extended. Call finalize()
+    after the last chunk to flush the open episode.
+    """
+
+    def __init__(self, gap_tolerance: int = DEFAULT_GAP_TOLERANCE):
+        if gap_tolerance < 0:
+            raise ValueError("Gap tolerance must be non-negative")
+        self.gap_tolerance = gap_tolerance
+        self._open: Optional[dict] = None
+        self._last_ts: Optional[int] = None
+
+    def update(self, stream: pd.DataFrame) -> pd.DataFrame:
+        """
+        Process the next chunk of the merged stream.
+
+        Args:
+            stream: Time-ordered chunk with 'timestamp', 'price', 'volume', 'venue'
+
+        Returns:
+            DataFrame of episodes closed by this chunk
+        """
+        if stream.empty:
+            return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+        timestamps = stream['timestamp'].to_numpy(dtype=np.int64)
+        if np.any(np.diff(timestamps) < 0) or (self._last_ts is not None and timestamps[0] < self._last_ts):
+            raise ValueError("Stream chunks must be time-ordered")
+        self._last_ts = int(timestamps[-1])
+
+        closed = []
+        for episode in self._segment(stream, timestamps):
+            if self._open is not None and episode['start'] - self._open['end'] <= self.gap_tolerance:
+                self._open = self._combine(self._open, episode)
+            else:
+                if self._open is not None:
+                    closed.append(self._open)
+                self._open = episode
+
+        # Later trades cannot extend an episode once the stream has moved past its tolerance
+        if self._open is not None and self._last_ts - self._open['end'] > self.gap_tolerance:
+            closed.append(self._open)
+            self._open = None
+
+        return self._to_frame(closed)
+
+    def finalize(self) -> pd.DataFrame:
+        """Close and return the open episode, if any."""
+        closed = [self._open] if self._open is not None else []
+        self._open = None
+        return self._to_frame(closed)
+
+    def _segment(self, stream: pd.DataFrame, timestamps: np.ndarray) -> List[dict]:
+        prices = stream['price'].to_numpy(dtype=np.float64)
+        flags = outside_band_mask(prices)
+        if not flags.any():
+            return []
+
+        # A gap longer than the tolerance between consecutive outside-band
+        # trades starts a new episode; update() applies the same rule across chunks
+        outside_idx = np.flatnonzero(flags)
+        out_ts = timestamps[outside_idx]
+        new_episode = np.concatenate([[True], np.diff(out_ts) > self.gap_tolerance])
+        row_episode = np.cumsum(new_episode) - 1
+        n_episodes = int(row_episode[-1]) + 1
+        bounds = np.flatnonzero(new_episode)
+
+        out_prices = prices[outside_idx]
+        out_volumes = stream['volume'].to_numpy(dtype=np.float64)[outside_idx]
+        venue_codes = pd.Categorical(stream['venue'].to_numpy()[outside_idx], categories=VENUES).codes
+        if np.any(venue_codes < 0):
+            raise ValueError(f"Unexpected venue in stream (expected one of {VENUES})")
+
+        flat = row_episode * len(VENUES) + venue_codes
+        volumes = np.bincount(flat, weights=out_volumes, minlength=n_episodes * len(VENUES)).reshape(n_episodes, -1)
+        trades = np.bincount(flat, minlength=n_episodes * len(VENUES)).reshape(n_episodes, -1)
+
+        starts = out_ts[bounds]
+        ends = out_ts[np.append(bounds[1:] - 1, len(out_ts) - 1)]
+        max_dev = np.maximum.reduceat(np.abs(out_prices - 1.0), bounds) * 10000
+        min_price = np.minimum.reduceat(out_prices, bounds)
+        max_price = np.maximum.reduceat(out_prices, bounds)
+        first_venue = venue_codes[bounds]
+
+        return [
+            {
+                'start': int(starts[i]),
+                'end': int(ends[i]),
+                'max_deviation_bps': float(max_dev[i]),
+                'min_price': float(min_price[i]),
+                'max_price': float(max_price[i]),
+                'volume': volumes[i].copy(),
+                'trades': trades[i].copy(),
+                'first_venue': VENUES[first_venue[i]]
+            }
+            for i in range(n_episodes)
+        ]
+
+    @staticmethod
+    def _combine(earlier: dict, later: dict) -> dict:
+        return {
+            'start': earlier['start'],
+            'end': max(earlier['end'], later['end']),
+            'max_deviation_bps': max(earlier['max_deviation_bps'], later['max_deviation_bps']),
+            'min_price': min(earlier['min_price'], later['min_price']),
+            'max_price': max(earlier['max_price'], later['max_price']),
+            'volume': earlier['volume'] + later['volume'],
+            'trades': earlier['trades'] + later['trades'],
+            'first_venue': earlier['first_venue']
+        }
+
+    @staticmethod
+    def _to_frame(episodes: List[dict]) -> pd.DataFrame:
+        if not episodes:
+            return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+        rows = []
+        for episode in episodes:
+            row = {
+                'start': format_timestamp(episode['start']),
+                'end': format_timestamp(episode['end']),
+                'duration_seconds': episode['end'] - episode['start'],
+                'max_deviation_bps': episode['max_deviation_bps'],
+                'min_price': episode['min_price'],
+                'max_price': episode['max_price'],
+                'first_venue': episode['first_venue']
+            }
+            for i, venue in enumerate(VENUES):
+                row[f'{venue}_volume'] = float(episode['volume'][i])
+                row[f'{venue}_trades'] = int(episode['trades'][i])
+            rows.append(row)
+
+        return pd.DataFrame(rows)[EPISODE_COLUMNS]
+
+
+def extract_episodes(chunks: Iterable[pd.DataFrame],
+                     gap_tolerance: int = DEFAULT_GAP_TOLERANCE) -> pd.DataFrame:
+    """
+    Extract episodes from an iterable of time-ordered merged-stream chunks.
+
+    Args:
+        chunks: Chunks of the merged stream (e.g. one per shard)
+        gap_tolerance: Max seconds between consecutive outside-band trades of one episode
+
+    Returns:
+        Episode table
+    """
+    extractor = EpisodeExtractor(gap_tolerance)
+    frames = [extractor.update(chunk) for chunk in chunks]
+    frames.append(extractor.finalize())
+    frames = [f for f in frames if not f.empty]
+
+    if not frames:
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_chunks(df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterable[pd.DataFrame]:
+    """Yield consecutive row chunks of a DataFrame."""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def assert_chunking_invariance():
+    """
+    Self-check that chunked extraction matches a single pass over the stream.
+    """
+    # Two outside-band trades 100s apart are separate episodes at 60s tolerance
+    # however the stream is split
+    pair = pd.DataFrame({'timestamp': [0, 100], 'price': [0.99, 0.99],
+                         'volume': [1.0, 1.0], 'venue': ['bybit', 'bybit']})
+    for chunk_size in (1, 2):
+        assert len(extract_episodes(iter_chunks(pair, chunk_size), 60)) == 2
+
+    rng = np.random.default_rng(7)
+    n = 3_000
+    stream = pd.DataFrame({
+        'timestamp': np.cumsum(rng.integers(0, 40, n)),
+        'price': np.where(rng.random(n) < 0.3, 0.998, 1.0),
+        'volume': rng.random(n) * 1000,
+        'venue': rng.choice(VENUES, n)
+    })
+    for gap_tolerance in (0, 30, DEFAULT_GAP_TOLERANCE):
+        expected = extract_episodes([stream], gap_tolerance)
+        for chunk_size in (1, 7, 500):
+            chunked = extract_episodes(iter_chunks(stream, chunk_size), gap_tolerance)
+            pd.testing.assert_frame_equal(chunked, expected, check_dtype=False)
+
+    print("Episode chunking tests passed!")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Extract peg-deviation episodes from raw venue data."""
+    parser = argparse.ArgumentParser(description='Extract USDC peg-deviation episodes')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Check that chunked and single-pass extraction agree, then exit')
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        assert_chunking_invariance()
+        return
+
+    from aggregate_outside_band import load_venue_data
+
+    print("Starting peg-deviation episode extraction...")
+
+    frames = {venue: load_venue_data(venue) for venue in VENUES}
+    stream = merge_venue_streams(frames)
+    print(f"Merged stream: {len(stream)} trades")
+
+    episodes = extract_episodes(iter_chunks(stream))
+    print(f"Found {len(episodes)} episodes (gap tolerance {DEFAULT_GAP_TOLERANCE}s)")
+
+    if episodes.empty:
+        return
+
+    output_path = 'outputs/usdc_peg_episodes.csv'
+    os.makedirs('outputs', exist_ok=True)
+    episodes.to_csv(output_path, index=False, float_format='%.6f')
+    print(f"Episodes saved to: {output_path}")
+
+    print(f"Median duration: {episodes['duration_seconds'].median():.0f}s")
+    print(f"Longest episode: {episodes['duration_seconds'].max()}s")
+    print("Venue breaking first:")
+    print(episodes['first_venue'].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,14 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
-import time
 import os
 from utils import (
-    validate_price, validate_volume, round_to_hour, is_outside_band,
-    save_to_parquet, create_temp_dir
+    round_to_hour, is_outside_band, save_to_parquet, create_temp_dir, RAW_COLUMNS
 )
+from http_client import get_default_client, is_settled
+from instrumentation import stage, count
+from validation import validate_frame, save_quarantine, format_counts
+from trade_store import SortedTradeStore
 
 # Configuration
 BYBIT_BASE_URL = "https://api.bybit.com"
@@ -23,11 +25,12 @@ SYMBOL = "USDCUSDT"
 START_TIMESTAMP = int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp())
 END_TIMESTAMP = int(datetime(2025, 9, 30, 23, 59, 59, tzinfo=timezone.utc).timestamp())
 BATCH_SIZE = 1000  # Number of trades per request
-RATE_LIMIT_DELAY = 0.1  # Seconds between requests
+RATE_LIMIT_DELAY = 0.1  # Seconds between network requests (cache hits skip it)
 
 
 def fetch_trades_batch(start_time_ms: int, end_time_ms: int, 
-                      limit: int = 1000) -> List[Dict[str, Any]]:
+                      limit: int = 1000,
+                      failures: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
     """
     Fetch a batch of trades from Bybit API.
     
@@ -35,10 +38,18 @@ def fetch_trades_batch(start_time_ms: int, end_time_ms: int,
         start_time_ms: Start timestamp in milliseconds
         end_time_ms: End timestamp in milliseconds
         limit: Maximum number of trades to fetch
+        failures: Optional dict that receives window start -> error when
+            the request fails
         
     Returns:
-        List of trade records
+        List of trade records (empty if the request failed)
     """
+    def fail(error: str) -> List[Dict[str, Any]]:
+        if failures is not None:
+            window = datetime.fromtimestamp(start_time_ms / 1000, tz=timezone.utc)
+            failures[window.strftime('%Y-%m-%d %H:%M')] = error
+        return []
+    
     url = f"{BYBIT_BASE_URL}/v5/market/recent-trade"
     
     params = {
@@ -49,79 +60,96 @@ def fetch_trades_batch(start_time_ms: int, end_time_ms: int,
         'endTime': end_time_ms
     }
     
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get('retCode') != 0:
-            print(f"Bybit API error: {data.get('retMsg', 'Unknown error')}")
-            return []
+    with stage('bybit.fetch_batch'):
+        try:
+            data = get_default_client().get_json(
+                url, params=params,
+                cacheable=is_settled(end_time_ms / 1000),
+                cache_check=lambda d: d.get('retCode') == 0,
+                min_interval=RATE_LIMIT_DELAY
+            )
+            if data.get('retCode') != 0:
+                count('api_errors')
+                print(f"Bybit API error: {data.get('retMsg', 'Unknown error')}")
+                return fail(f"retCode {data.get('retCode')}: {data.get('retMsg', 'Unknown error')}")
         
-        return data.get('result', {}).get('list', [])
+            trades = data.get('result', {}).get('list', [])
+            count('trades_fetched', len(trades))
+            return trades
     
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return []
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return []
+        except requests.exceptions.RequestException as e:
+            count('request_errors')
+            print(f"Request failed: {e}")
+            return fail(f'{type(e).__name__}: {e}')
+        except Exception as e:
+            count('request_errors')
+            print(f"Unexpected error: {e}")
+            return fail(f'{type(e).__name__}: {e}')
 
 
-def process_trade_data(trades: List[Dict[str, Any]]) -> pd.DataFrame:
+def process_trade_data(trades: List[Dict[str, Any]], start_ts: Optional[int] = None,
+                       end_ts: Optional[int] = None,
+                       quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
     """
     Process raw trade data into structured DataFrame.
     
     Args:
         trades: List of raw trade records
+        start_ts: Earliest valid timestamp in seconds (None for no bound)
+        end_ts: Latest valid timestamp in seconds (None for no bound)
+        quarantine: Optional list that rejected rows are appended to
         
     Returns:
         Processed DataFrame
     """
     if not trades:
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
-    
-    processed_data = []
+        return pd.DataFrame(columns=RAW_COLUMNS)
     
-    for trade in trades:
-        try:
-            # Extract fields
-            timestamp_ms = int(trade['time'])
-            timestamp = timestamp_ms // 1000  # Convert to seconds
-            
-            price = float(trade['price'])
-            volume = float(trade['size'])  # Size is in USDC terms for USDCUSDT
-            
-            # Validate data
-            if not validate_price(price) or not validate_volume(volume):
-                continue
-            
-            processed_data.append({
-                'timestamp': timestamp,
-                'price': price,
-                'volume': volume,
-                'venue': 'bybit'
-            })
-            
-        except (ValueError, KeyError, TypeError) as e:
-            print(f"Error processing trade: {e}")
-            continue
+    with stage('bybit.process_trades'):
+        count('rows_in', len(trades))
+        raw = pd.DataFrame.from_records(trades)
+        
+        def column(name: str) -> pd.Series:
+            return raw[name] if name in raw.columns else pd.Series(np.nan, index=raw.index)
+        
+        df = pd.DataFrame({
+            'timestamp': pd.to_numeric(column('time'), errors='coerce') // 1000,  # ms -> s
+            'price': pd.to_numeric(column('price'), errors='coerce'),
+            'volume': pd.to_numeric(column('size'), errors='coerce'),  # Size is in USDC terms for USDCUSDT
+            'venue': 'bybit',
+            'side': column('side').map({'Buy': 1, 'Sell': -1}).fillna(0).astype(np.int8),  # Taker side
+            'trade_id': column('execId')
+        })
+        pair_ok = (column('symbol') == SYMBOL).to_numpy() if 'symbol' in raw.columns else None
+        
+        df, rejected, rule_counts = validate_frame(df, start_ts, end_ts, pair_ok)
+        for rule, n in rule_counts.items():
+            if n:
+                count(f'rejected_{rule}', n)
+        if not rejected.empty:
+            print(f"Quarantined {len(rejected)} of {len(raw)} trades ({format_counts(rule_counts)})")
+            if quarantine is not None:
+                quarantine.append(rejected)
+        
+        count('rows_out', len(df))
     
-    return pd.DataFrame(processed_data)
+    return df[RAW_COLUMNS]
 
 
-def fetch_all_trades(start_ts: int, end_ts: int) -> pd.DataFrame:
+def fetch_all_trades(start_ts: int, end_ts: int,
+                     quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
     """
     Fetch all trades for the given time range.
     
     Args:
         start_ts: Start timestamp in seconds
         end_ts: End timestamp in seconds
+        quarantine: Optional list that rejected rows are appended to
         
     Returns:
         DataFrame with all trade data
     """
-    all_trades = []
+    store = SortedTradeStore('bybit')
     current_ts = start_ts
     batch_days = 1  # Fetch 1 day at a time to avoid rate limits
     
@@ -146,35 +174,59 @@ def fetch_all_trades(start_ts: int, end_ts: int) -> pd.DataFrame:
             continue
         
         # Process batch data
-        batch_df = process_trade_data(batch_trades)
+        batch_df = process_trade_data(batch_trades, current_ts, batch_end_ts, quarantine)
         if not batch_df.empty:
-            all_trades.append(batch_df)
-            print(f"Processed {len(batch_df)} trades in this batch")
+            added = store.ingest(batch_df)
+            print(f"Processed {len(batch_df)} trades in this batch ({added} new)")
         
         # Move to next batch
         current_ts = batch_end_ts
+    
+    return store.to_frame()
+
+
+def fetch_raw_trades_by_hour(start_ts: int, end_ts: int,
+                             failures: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch raw (unprocessed) trade records hour by hour.
+    
+    Args:
+        start_ts: Start timestamp in seconds
+        end_ts: End timestamp in seconds
+        failures: Optional dict that receives window start -> error for
+            hours whose request failed
         
-        # Rate limiting
-        time.sleep(RATE_LIMIT_DELAY)
+    Returns:
+        List of raw trade records as returned by the API, without the
+        failed hours
+    """
+    all_trades = []
+    current_ts = start_ts
+    
+    while current_ts < end_ts:
+        hour_end_ts = min(current_ts + 3600, end_ts)
+        all_trades.extend(fetch_trades_batch(current_ts * 1000, hour_end_ts * 1000, BATCH_SIZE,
+                                             failures))
+        current_ts = hour_end_ts
     
-    if all_trades:
-        return pd.concat(all_trades, ignore_index=True)
-    else:
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+    print(f"Fetched {len(all_trades)} raw Bybit trades")
+    return all_trades
 
 
-def fetch_trades_by_hour(start_ts: int, end_ts: int) -> pd.DataFrame:
+def fetch_trades_by_hour(start_ts: int, end_ts: int,
+                         quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
     """
     Alternative method: fetch trades hour by hour to ensure completeness.
     
     Args:
         start_ts: Start timestamp in seconds
         end_ts: End timestamp in seconds
+        quarantine: Optional list that rejected rows are appended to
         
     Returns:
         DataFrame with all trade data
     """
-    all_trades = []
+    store = SortedTradeStore('bybit')
     current_ts = start_ts
     
     print(f"Fetching Bybit data hour by hour from {datetime.fromtimestamp(start_ts)} to {datetime.fromtimestamp(end_ts)}")
@@ -192,21 +244,16 @@ def fetch_trades_by_hour(start_ts: int, end_ts: int) -> pd.DataFrame:
         
         if hour_trades:
             # Process hour data
-            hour_df = process_trade_data(hour_trades)
+            hour_df = process_trade_data(hour_trades, current_ts, hour_end_ts, quarantine)
             if not hour_df.empty:
-                all_trades.append(hour_df)
-                print(f"Processed {len(hour_df)} trades for hour {datetime.fromtimestamp(current_ts)}")
+                added = store.ingest(hour_df)
+                print(f"Processed {len(hour_df)} trades for hour {datetime.fromtimestamp(current_ts)} ({added} new)")
         
-        # Move to next hour
+        # Move to next hour; windows share their boundary millisecond and the
+        # store drops trades seen in both
         current_ts = hour_end_ts
-        
-        # Rate limiting
-        time.sleep(RATE_LIMIT_DELAY)
     
-    if all_trades:
-        return pd.concat(all_trades, ignore_index=True)
-    else:
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+    return store.to_frame()
 
 
 def main():
@@ -218,11 +265,17 @@ def main():
     
     # Try hourly fetch first (more reliable)
     print("Attempting hourly fetch...")
-    df = fetch_trades_by_hour(START_TIMESTAMP, END_TIMESTAMP)
+    quarantine = []
+    df = fetch_trades_by_hour(START_TIMESTAMP, END_TIMESTAMP, quarantine)
     
     if df.empty:
         print("Hourly fetch failed, trying daily batches...")
-        df = fetch_all_trades(START_TIMESTAMP, END_TIMESTAMP)
+        df = fetch_all_trades(START_TIMESTAMP, END_TIMESTAMP, quarantine)
+    
+    # Save rejected rows
+    quarantine_path = os.path.join(temp_dir, 'bybit_quarantine.parquet')
+    n_quarantined = save_quarantine(quarantine, quarantine_path)
+    print(f"Quarantined {n_quarantined} rows, saved to: {quarantine_path}")
     
     if df.empty:
         print("No data fetched!")
@@ -0,0 +1,449 @@
+"""
+Download Bybit USDC/USDT spot trade archives.
+
+Bybit publishes one gzipped CSV of spot trades per symbol and day on its
+public data portal. This module downloads several days concurrently over
+the shared HTTP session and pipes each response body straight through an
+incremental gzip decompressor into the CSV parser, so download,
+decompression and parsing overlap and the archive is never written to
+disk. Interrupted downloads resume with a ranged request from the last
+byte received. Parsed rows are validated and merged into a
+SortedTradeStore like the REST fetcher's output. A day that fails after
+its retries and resumes is reported at the end instead of stopping the
+other downloads.
+
+Usage:
+    python src/task2_usdc_peg/fetch_bybit_archive.py [--workers N] [--base-url URL] [--self-check]
+"""
+
+import argparse
+import io
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import requests
+import urllib3
+
+from utils import RAW_COLUMNS, create_temp_dir, save_to_parquet
+from http_client import HttpClient, backoff_delay, get_default_client
+from instrumentation import count, stage
+from validation import format_counts, save_quarantine, validate_frame
+from trade_store import SortedTradeStore
+
+# Configuration
+ARCHIVE_BASE_URL = "https://public.bybit.com/spot"
+SYMBOL = "USDCUSDT"
+START_TIMESTAMP = int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp())
+END_TIMESTAMP = int(datetime(2025, 9, 30, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+DOWNLOAD_WORKERS = 6
+READ_CHUNK_BYTES = 256 * 1024  # Compressed bytes per network read
+PARSE_CHUNK_BYTES = 8 * 1024 * 1024  # Decompressed bytes per parsed CSV chunk
+MAX_RESUMES = 5  # Ranged re-requests after a dropped connection
+
+# Archive column names seen across Bybit exports -> RAW_COLUMNS field
+COLUMN_ALIASES = {
+    'timestamp': ['timestamp', 'tradeTime', 'time'],
+    'price': ['price'],
+    'volume': ['volume', 'qty', 'size'],
+    'side': ['side'],
+    'trade_id': ['id', 'tradeId', 'trdMatchID', 'execId']
+}
+
+
+def archive_url(symbol: str, day: datetime, base_url: str = ARCHIVE_BASE_URL) -> str:
+    """URL of the daily trade archive for a symbol."""
+    return f"{base_url.rstrip('/')}/{symbol}/{symbol}_{day.strftime('%Y-%m-%d')}.csv.gz"
+
+
+def archive_days(start_ts: int, end_ts: int) -> List[datetime]:
+    """UTC days covering [start_ts, end_ts]."""
+    day = datetime.fromtimestamp(start_ts, tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = datetime.fromtimestamp(end_ts, tz=timezone.utc)
+    days = []
+    while day <= end_date:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def resolve_columns(header: List[str]) -> Dict[str, str]:
+    """
+    Map RAW_COLUMNS fields to archive header names.
+
+    Raises:
+        ValueError: if timestamp, price or volume has no matching column
+    """
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                mapping[field] = alias
+                break
+    missing = [f for f in ('timestamp', 'price', 'volume') if f not in mapping]
+    if missing:
+        raise ValueError(f"Archive header {header} has no column for {missing}")
+    return mapping
+
+
+def to_seconds(values: pd.Series) -> pd.Series:
+    """Archive timestamps (ms, or fractional seconds in older files) -> seconds."""
+    values = pd.to_numeric(values, errors='coerce')
+    if values.notna().any() and values.max() > 1e11:
+        return values // 1000
+    return np.floor(values)
+
+
+class GzipCsvStream:
+    """
+    Incremental gzip -> CSV decoder.
+
+    feed() takes compressed bytes in any split, decompresses them and parses
+    every PARSE_CHUNK_BYTES of complete lines into a RAW_COLUMNS frame.
+    Multi-member gzip files are handled. Call finish() after the last byte.
+
+    Args:
+        symbol: Expected symbol (rows of other symbols fail the token_pair rule)
+        parse_chunk_bytes: Decompressed bytes buffered before parsing
+    """
+
+    def __init__(self, symbol: str = SYMBOL, parse_chunk_bytes: int = PARSE_CHUNK_BYTES):
+        self.symbol = symbol
+        self.parse_chunk_bytes = parse_chunk_bytes
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._header: Optional[bytes] = None
+        self._mapping: Dict[str, str] = {}
+        self._buffer = bytearray()
+        self.frames: List[pd.DataFrame] = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, data: bytes) -> None:
+        """Decompress a block of the gzip stream and parse any full chunk."""
+        self.bytes_in += len(data)
+        while data:
+            out = self._decompressor.decompress(data)
+            self._buffer += out
+            self.bytes_out += len(out)
+            data = self._decompressor.unused_data
+            if data:
+                # Next gzip member
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if len(self._buffer) >= self.parse_chunk_bytes:
+            cut = self._buffer.rfind(b'\n') + 1
+            if cut:
+                self._parse(bytes(self._buffer[:cut]))
+                del self._buffer[:cut]
+
+    def finish(self) -> pd.DataFrame:
+        """
+        Parse the remaining buffer.
+
+        Returns:
+            All parsed rows in RAW_COLUMNS order, before validation
+
+        Raises:
+            ValueError: if the gzip stream is truncated
+        """
+        if not self._decompressor.eof and self.bytes_in:
+            raise ValueError("Truncated gzip stream")
+        if self._buffer:
+            self._parse(bytes(self._buffer))
+            self._buffer.clear()
+        if not self.frames:
+            return pd.DataFrame(columns=RAW_COLUMNS + ['symbol'])
+        return pd.concat(self.frames, ignore_index=True)
+
+    def _parse(self, block: bytes) -> None:
+        if self._header is None:
+            end = block.find(b'\n') + 1
+            self._header = block[:end]
+            block = block[end:]
+            header = [name.strip() for name in self._header.decode('utf-8').split(',')]
+            self._mapping = resolve_columns(header)
+        if not block.strip():
+            return
+
+        raw = pd.read_csv(io.BytesIO(self._header + block), dtype=str, engine='c')
+        raw.columns = [name.strip() for name in raw.columns]
+        columns = self._mapping
+
+        df = pd.DataFrame({
+            'timestamp': to_seconds(raw[columns['timestamp']]),
+            'price': pd.to_numeric(raw[columns['price']], errors='coerce'),
+            'volume': pd.to_numeric(raw[columns['volume']], errors='coerce'),
+            'venue': 'bybit',
+            'side': (raw[columns['side']].str.strip().str.capitalize().map({'Buy': 1, 'Sell': -1})
+                     .fillna(0).astype(np.int8) if 'side' in columns else np.int8(0)),
+            'trade_id': raw[columns['trade_id']] if 'trade_id' in columns else None,
+            'symbol': raw['symbol'] if 'symbol' in raw.columns else self.symbol
+        })
+        if 'trade_id' not in columns:
+            # Older archives have no id; position in the day file is stable
+            offset = sum(len(f) for f in self.frames)
+            df['trade_id'] = [f'{self.symbol}-{ts:.0f}-{offset + i}' for i, ts in enumerate(df['timestamp'])]
+        self.frames.append(df)
+
+
+def stream_archive(client: HttpClient, url: str, parser: GzipCsvStream,
+                   max_resumes: int = MAX_RESUMES) -> bool:
+    """
+    Download one archive into a parser, resuming from the last byte on drops.
+
+    Args:
+        client: HTTP client (its retries cover failures before the body starts)
+        url: Archive URL
+        parser: Stream decoder that receives the compressed bytes
+        max_resumes: Ranged re-requests allowed after a dropped connection
+
+    Returns:
+        True if the archive was read, False if it does not exist (404)
+
+    The body is read raw (decode_content=False): the parser gunzips the
+    file itself, so a server that also sets Content-Encoding: gzip must
+    not have it decompressed first.
+    """
+    received = 0
+    resumes = 0
+
+    while True:
+        headers = {'Range': f'bytes={received}-'} if received else None
+        try:
+            response = client.send('GET', url, headers=headers, stream=True)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                e.response.close()
+                return False
+            raise
+
+        with response:
+            # A server that ignores Range resends the whole file; skip what we have
+            skip = received if received and response.status_code != 206 else 0
+            try:
+                for block in response.raw.stream(READ_CHUNK_BYTES, decode_content=False):
+                    if skip:
+                        if len(block) <= skip:
+                            skip -= len(block)
+                            continue
+                        block = block[skip:]
+                        skip = 0
+                    received += len(block)
+                    parser.feed(block)
+                return True
+            except (urllib3.exceptions.ProtocolError, urllib3.exceptions.ReadTimeoutError,
+                    requests.exceptions.ConnectionError) as e:
+                if resumes == max_resumes:
+                    raise
+                count('resumes', stage='bybit_archive.download')
+                print(f"Connection dropped after {received} bytes of {url} ({e}), resuming")
+                time.sleep(backoff_delay(resumes))
+                resumes += 1
+
+
+def fetch_archive_day(client: HttpClient, url: str, symbol: str = SYMBOL) -> Optional[pd.DataFrame]:
+    """
+    Download and parse one daily archive.
+
+    Returns:
+        Parsed rows (unvalidated, with a 'symbol' column), or None if missing
+    """
+    with stage('bybit_archive.download'):
+        parser = GzipCsvStream(symbol)
+        if not stream_archive(client, url, parser):
+            count('missing_files')
+            return None
+        df = parser.finish()
+        count('files')
+        count('bytes_compressed', parser.bytes_in)
+        count('bytes_decompressed', parser.bytes_out)
+        count('rows_in', len(df))
+    return df
+
+
+def fetch_archive_trades(start_ts: int, end_ts: int, base_url: str = ARCHIVE_BASE_URL,
+                         symbol: str = SYMBOL, workers: int = DOWNLOAD_WORKERS,
+                         client: Optional[HttpClient] = None,
+                         quarantine: Optional[List[pd.DataFrame]] = None,
+                         failures: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Fetch all archived trades for the given time range.
+
+    Args:
+        start_ts: Start timestamp in seconds
+        end_ts: End timestamp in seconds (inclusive)
+        base_url: Archive root (point at a local static server for testing)
+        symbol: Trading pair symbol
+        workers: Concurrent downloads
+        client: HTTP client (defaults to the shared client)
+        quarantine: Optional list that rejected rows are appended to
+        failures: Optional dict that receives archive name -> error for
+            days that could not be downloaded or decoded
+
+    Returns:
+        DataFrame in RAW_COLUMNS order, sorted and de-duplicated, without
+        the failed days
+    """
+    failures = {} if failures is None else failures
+    client = client or get_default_client()
+    store = SortedTradeStore('bybit')
+    urls = [archive_url(symbol, day, base_url) for day in archive_days(start_ts, end_ts)]
+
+    print(f"Downloading {len(urls)} Bybit archives with {workers} workers from {base_url}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_archive_day, client, url, symbol): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            name = url.rsplit('/', 1)[-1]
+            try:
+                raw = future.result()
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError,
+                    zlib.error, ValueError) as e:
+                # One bad day must not discard the others
+                count('failed_files')
+                failures[name] = f'{type(e).__name__}: {e}'
+                print(f"{name}: failed ({failures[name]})")
+                continue
+            if raw is None:
+                print(f"{name}: not found")
+                continue
+
+            with stage('bybit_archive.validate'):
+                pair_ok = (raw['symbol'] == symbol).to_numpy()
+                df, rejected, rule_counts = validate_frame(raw[RAW_COLUMNS], start_ts, end_ts, pair_ok)
+                for rule, n in rule_counts.items():
+                    if n:
+                        count(f'rejected_{rule}', n)
+                if not rejected.empty and quarantine is not None:
+                    quarantine.append(rejected)
+                added = store.ingest(df)
+                count('rows_out', added)
+
+            print(f"{name}: {len(raw)} rows, {added} new, quarantined {format_counts(rule_counts)}")
+
+    if failures:
+        print(f"{len(failures)} of {len(urls)} archives failed: {', '.join(sorted(failures))}")
+    return store.to_frame()
+
+
+def assert_archive_download():
+    """
+    Self-check of archive streaming against a local http.server stand-in.
+
+    Covers a connection dropped mid-body (resumed with a Range request), a
+    response with Content-Encoding: gzip, a missing day and a failing day.
+    """
+    import gzip
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    day = datetime(2025, 7, 1, tzinfo=timezone.utc)
+    start_ts = int(day.timestamp())
+    rows = [f"{start_ts + i},{SYMBOL},Buy,{10 + i % 7},1.000{i % 3},t{i}" for i in range(5000)]
+    body = gzip.compress(("timestamp,symbol,side,size,price,tradeId\n" + "\n".join(rows) + "\n").encode())
+    ranges = []
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.rsplit('/', 1)[-1]
+            if name.startswith(f'{SYMBOL}_2025-07-01'):
+                # First request drops the connection halfway; resumes honour Range
+                offset = int(self.headers['Range'][6:-1]) if self.headers.get('Range') else 0
+                ranges.append(offset)
+                self.send_response(206 if offset else 200)
+                self.send_header('Content-Length', str(len(body) - offset))
+                self.end_headers()
+                self.wfile.write(body[offset:] if offset else body[:len(body) // 2])
+                self.close_connection = True
+            elif name.startswith(f'{SYMBOL}_2025-07-02'):
+                self.send_response(200)
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif name.startswith(f'{SYMBOL}_2025-07-03'):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Length', '9')
+                self.end_headers()
+                self.wfile.write(b'not gzip!')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = HttpClient(cache_dir=cache_dir, max_retries=0)
+
+            parser = GzipCsvStream()
+            assert stream_archive(client, archive_url(SYMBOL, day, base_url), parser)
+            assert ranges == [0, len(body) // 2], f"Unexpected Range requests: {ranges}"
+            assert len(parser.finish()) == len(rows)
+
+            failures = {}
+            df = fetch_archive_trades(start_ts, start_ts + 4 * 86400 - 1, base_url, workers=2,
+                                      client=client, failures=failures)
+            # Day 1 and day 2 (gzip Content-Encoding) are the same rows, day 3 is missing
+            assert len(df) == len(rows), f"Expected {len(rows)} trades, got {len(df)}"
+            assert list(failures) == [f'{SYMBOL}_2025-07-04.csv.gz'], failures
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("Archive download tests passed!")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to download and save Bybit archive data."""
+    parser = argparse.ArgumentParser(description='Download Bybit spot trade archives')
+    parser.add_argument('--base-url', default=ARCHIVE_BASE_URL, help='Archive root URL')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help='Concurrent downloads')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Check resume and error handling against a local stand-in server, then exit')
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        assert_archive_download()
+        return
+
+    print("Starting Bybit archive download...")
+    temp_dir = create_temp_dir()
+
+    quarantine = []
+    failures = {}
+    started = time.perf_counter()
+    df = fetch_archive_trades(START_TIMESTAMP, END_TIMESTAMP, args.base_url,
+                              workers=args.workers, quarantine=quarantine, failures=failures)
+    elapsed = time.perf_counter() - started
+
+    quarantine_path = os.path.join(temp_dir, 'bybit_quarantine.parquet')
+    n_quarantined = save_quarantine(quarantine, quarantine_path)
+    print(f"Quarantined {n_quarantined} rows, saved to: {quarantine_path}")
+
+    if df.empty:
+        print("No data fetched!")
+        return
+
+    print(f"Total trades fetched: {len(df)} in {elapsed:.1f}s")
+    print(f"Date range: {datetime.fromtimestamp(df['timestamp'].min())} to {datetime.fromtimestamp(df['timestamp'].max())}")
+
+    output_path = os.path.join(temp_dir, 'bybit_raw_data.parquet')
+    save_to_parquet(df, output_path)
+    print(f"Raw data saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+"""
+Fetch Uniswap V3 USDC/USDT swaps from raw Swap event logs over JSON-RPC.
+
+Alternative to the subgraph backend in fetch_uniswap_v3.py: needs any
+Ethereum JSON-RPC endpoint instead of a Graph API key. Swap logs are
+pulled with eth_getLogs over block ranges that halve when the provider
+rejects a range as too large and grow back after successful calls. ABI
+data (amount0, amount1, sqrtPriceX96, liquidity, tick) is decoded for
+the whole batch at once from a (n, 5, 32) byte array. Block timestamps
+come from a block-time index cached on disk, filled with batched
+eth_getBlockByNumber calls for blocks it has not seen. Output rows have
+the same schema as process_swap_data, with trade ids in the subgraph's
+'<tx hash>#<log index>' format.
+
+Usage:
+    python src/task2_usdc_peg/fetch_uniswap_logs.py [--rpc-url URL] [--self-check]
+"""
+
+import argparse
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import RAW_COLUMNS, create_temp_dir, save_to_parquet
+from http_client import HttpClient, get_default_client
+from instrumentation import count, stage
+from validation import format_counts, save_quarantine, validate_frame
+from trade_store import SortedTradeStore
+from fetch_uniswap_v3 import POOL_ADDRESS, build_swap_frame
+
+# Configuration
+RPC_URL = os.environ.get('ETH_RPC_URL', 'http://localhost:8545')  # Any Ethereum mainnet endpoint
+SWAP_TOPIC = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"  # Swap(address,address,int256,int256,uint160,uint128,int24)
+TOKEN0_SYMBOL = "USDC"  # Pool token order (token0 < token1 by address)
+TOKEN1_SYMBOL = "USDT"
+TOKEN0_DECIMALS = 6
+TOKEN1_DECIMALS = 6
+START_TIMESTAMP = int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp())
+END_TIMESTAMP = int(datetime(2025, 9, 30, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+INITIAL_BLOCK_SPAN = 2000  # Blocks per eth_getLogs call before adapting
+MAX_BLOCK_SPAN = 10000
+BLOCK_BATCH_SIZE = 100  # eth_getBlockByNumber calls per JSON-RPC batch
+CONFIRMATIONS = 64  # Blocks behind head treated as final (cacheable)
+RATE_LIMIT_DELAY = 0.05  # Seconds between network requests (cache hits skip it)
+BLOCK_INDEX_PATH = os.path.join('temp', 'block_times.npz')
+
+# Provider messages for a result cap or a block-range cap (Infura, Alchemy, geth,
+# Erigon, Ankr, ...); anything else, timeouts included, is a hard failure
+RANGE_ERROR_HINTS = ('query returned more than', 'too many results', 'response size exceeded',
+                     'block range', 'range is too wide', 'range too large')
+
+
+class RpcError(Exception):
+    """JSON-RPC error object returned by the node."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"RPC error {code}: {message}")
+        self.code = code
+        self.message = message
+
+    def is_range_error(self) -> bool:
+        """Whether the provider rejected the request for returning too much data."""
+        return self.code == -32005 or any(hint in self.message.lower() for hint in RANGE_ERROR_HINTS)
+
+
+class JsonRpcClient:
+    """
+    Minimal JSON-RPC client on top of HttpClient.
+
+    Args:
+        url: JSON-RPC endpoint
+        client: HTTP client (defaults to the shared client)
+    """
+
+    def __init__(self, url: str = RPC_URL, client: Optional[HttpClient] = None):
+        self.url = url
+        self.client = client or get_default_client()
+
+    def call(self, method: str, params: List[Any], cacheable: bool = False) -> Any:
+        """
+        Make one JSON-RPC call.
+
+        Raises:
+            RpcError: if the node returns an error object
+        """
+        return self.batch([(method, params)], cacheable)[0]
+
+    def batch(self, calls: List[Tuple[str, List[Any]]], cacheable: bool = False) -> List[Any]:
+        """
+        Make several JSON-RPC calls in one request.
+
+        Args:
+            calls: (method, params) pairs
+            cacheable: Whether the results are final and may be cached
+
+        Returns:
+            Results in the order of calls
+
+        Raises:
+            RpcError: for the first call that returned an error
+        """
+        # Ids are positions in the batch, so identical batches share a cache entry
+        body = [{'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+                for i, (method, params) in enumerate(calls)]
+        responses = self.client.post_json(
+            self.url, body if len(body) > 1 else body[0],
+            cacheable=cacheable,
+            cache_check=lambda d: all('result' in r for r in (d if isinstance(d, list) else [d])),
+            min_interval=RATE_LIMIT_DELAY
+        )
+        if isinstance(responses, dict):
+            responses = [responses]
+
+        by_id = {r.get('id'): r for r in responses}
+        results = []
+        for i in range(len(calls)):
+            response = by_id.get(i, {})
+            if 'error' in response:
+                error = response['error']
+                raise RpcError(error.get('code', 0), error.get('message', ''))
+            if 'result' not in response:
+                raise RpcError(0, f"Missing response for request {i}")
+            results.append(response['result'])
+        return results
+
+    def block_number(self) -> int:
+        """Current head block number."""
+        return int(self.call('eth_blockNumber', []), 16)
+
+
+class BlockTimeIndex:
+    """
+    Sorted block number -> timestamp map, persisted as .npz.
+
+    Args:
+        rpc: JSON-RPC client used to fill in unknown blocks
+        path: Cache file (None to keep the index in memory only)
+    """
+
+    def __init__(self, rpc: JsonRpcClient, path: Optional[str] = BLOCK_INDEX_PATH):
+        self.rpc = rpc
+        self.path = path
+        self.blocks = np.empty(0, dtype=np.int64)
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                self.blocks = data['blocks']
+                self.timestamps = data['timestamps']
+
+    def _insert(self, blocks: np.ndarray, timestamps: np.ndarray) -> None:
+        with self._lock:
+            all_blocks = np.concatenate([self.blocks, blocks])
+            all_timestamps = np.concatenate([self.timestamps, timestamps])
+            all_blocks, first = np.unique(all_blocks, return_index=True)
+            self.blocks = all_blocks
+            self.timestamps = all_timestamps[first]
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the index to its cache file if blocks were added since the last save."""
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp.npz'
+        np.savez(tmp_path, blocks=self.blocks, timestamps=self.timestamps)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _positions(self, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(known mask, index positions) of blocks in the sorted index."""
+        if not len(self.blocks):
+            return np.zeros(len(blocks), dtype=bool), np.zeros(len(blocks), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.blocks, blocks), len(self.blocks) - 1)
+        return self.blocks[pos] == blocks, pos
+
+    def lookup(self, blocks: np.ndarray, head: Optional[int] = None, persist: bool = True) -> np.ndarray:
+        """
+        Timestamps of the given blocks, fetching unknown ones in batches.
+
+        Args:
+            blocks: Block numbers (any order, repeats allowed)
+            head: Current head; blocks within CONFIRMATIONS of it can still be
+                reorged, so they are neither cached nor added to the index
+            persist: Save the index once after this lookup (callers making
+                many small lookups pass False and call save() themselves)
+
+        Returns:
+            int64 timestamps aligned with blocks
+        """
+        blocks = np.asarray(blocks, dtype=np.int64)
+        known, pos = self._positions(blocks)
+        missing = np.unique(blocks[~known])
+        if not len(missing):
+            return self.timestamps[pos]
+
+        with stage('uniswap_logs.block_times'):
+            fetched = []
+            for i in range(0, len(missing), BLOCK_BATCH_SIZE):
+                chunk = missing[i:i + BLOCK_BATCH_SIZE]
+                final = head is None or int(chunk[-1]) <= head - CONFIRMATIONS
+                results = self.rpc.batch(
+                    [('eth_getBlockByNumber', [hex(int(b)), False]) for b in chunk], cacheable=final
+                )
+                fetched.append(np.array([int(r['timestamp'], 16) for r in results], dtype=np.int64))
+            count('blocks_fetched', len(missing))
+        fetched = np.concatenate(fetched)
+
+        confirmed = np.ones(len(missing), dtype=bool) if head is None else missing <= head - CONFIRMATIONS
+        if confirmed.any():
+            self._insert(missing[confirmed], fetched[confirmed])
+            if persist:
+                self.save()
+
+        known, pos = self._positions(blocks)
+        timestamps = np.where(known, self.timestamps[pos], 0)
+        if not known.all():
+            # Unconfirmed blocks are answered from this fetch only
+            timestamps[~known] = fetched[np.searchsorted(missing, blocks[~known])]
+        return timestamps
+
+    def block_at_or_after(self, timestamp: int, low: int, high: int,
+                          head: Optional[int] = None) -> int:
+        """
+        First block in [low, high] with a timestamp >= the given one (binary search).
+
+        Args:
+            timestamp: Target timestamp in seconds
+            low: First candidate block
+            high: Last candidate block
+            head: Current chain head (see lookup); the index is saved once
+                the search is done, not on every probe
+
+        Returns:
+            Block number (high + 1 if every block is earlier)
+        """
+        while low <= high:
+            mid = (low + high) // 2
+            if self.lookup(np.array([mid]), head=head, persist=False)[0] < timestamp:
+                low = mid + 1
+            else:
+                high = mid - 1
+        self.save()
+        return low
+
+
+def get_logs_adaptive(rpc: JsonRpcClient, address: str, topic: str, from_block: int,
+                      to_block: int, head: Optional[int] = None,
+                      span: int = INITIAL_BLOCK_SPAN, max_span: int = MAX_BLOCK_SPAN) -> List[Dict[str, Any]]:
+    """
+    Fetch logs for a block range, halving the span when the provider caps results.
+
+    Args:
+        rpc: JSON-RPC client
+        address: Contract address
+        topic: topic0 filter
+        from_block: First block (inclusive)
+        to_block: Last block (inclusive)
+        head: Current head; ranges within CONFIRMATIONS of it are not cached
+        span: Initial blocks per call
+        max_span: Upper bound the span grows back to after successes
+
+    Returns:
+        Log objects in block order
+
+    Raises:
+        RpcError: for non-range errors, or a range error on a single block
+    """
+    logs = []
+    start = from_block
+
+    with stage('uniswap_logs.get_logs'):
+        while start <= to_block:
+            end = min(start + span - 1, to_block)
+            final = head is None or end <= head - CONFIRMATIONS
+            try:
+                result = rpc.call('eth_getLogs', [{
+                    'address': address,
+                    'topics': [topic],
+                    'fromBlock': hex(start),
+                    'toBlock': hex(end)
+                }], cacheable=final)
+            except RpcError as e:
+                if not e.is_range_error() or end == start:
+                    raise
+                count('range_splits')
+                span = max(1, (end - start + 1) // 2)
+                continue
+
+            logs.extend(result)
+            count('calls')
+            count('logs', len(result))
+            start = end + 1
+            span = min(span * 2, max_span)
+
+    return logs
+
+
+def _words_to_float(words: np.ndarray) -> np.ndarray:
+    """Big-endian uint64 words (..., k) of an unsigned integer -> float64."""
+    value = np.zeros(words.shape[:-1], dtype=np.float64)
+    for i in range(words.shape[-1]):
+        value = value * 18446744073709551616.0 + words[..., i].astype(np.float64)
+    return value
+
+
+def decode_swap_logs(logs: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Decode Swap event logs in one vectorized pass.
+
+    Args:
+        logs: eth_getLogs log objects (removed logs are dropped)
+
+    Returns:
+        DataFrame with block_number, log_index, tx_hash, amount0, amount1
+        (raw token units, pool deltas), sqrt_price_x96, liquidity and tick
+    """
+    logs = [log for log in logs if not log.get('removed')]
+    n = len(logs)
+    if n == 0:
+        return pd.DataFrame(columns=['block_number', 'log_index', 'tx_hash', 'amount0', 'amount1',
+                                     'sqrt_price_x96', 'liquidity', 'tick'])
+
+    data = bytes.fromhex(''.join(log['data'][2:] for log in logs))
+    if len(data) != n * 160:
+        raise ValueError(f"Expected 160 bytes of Swap data per log, got {len(data)} for {n} logs")
+
+    # Five 32-byte ABI words per log, each as four big-endian uint64 limbs
+    words = np.frombuffer(data, dtype='>u8').reshape(n, 5, 4).astype(np.uint64)
+
+    def signed(word: np.ndarray) -> np.ndarray:
+        # Two's complement int256: magnitude of negatives is ~x + 1
+        negative = (word[:, 0] >> np.uint64(63)).astype(bool)
+        magnitude = _words_to_float(np.where(negative[:, None], ~word, word))
+        return np.where(negative, -(magnitude + 1.0), magnitude)
+
+    tick = words[:, 4, 3].astype(np.int64).astype(np.int32)  # int24, sign-extended in the low limb
+
+    return pd.DataFrame({
+        'block_number': np.array([int(log['blockNumber'], 16) for log in logs], dtype=np.int64),
+        'log_index': np.array([int(log['logIndex'], 16) for log in logs], dtype=np.int64),
+        'tx_hash': [log['transactionHash'] for log in logs],
+        'amount0': signed(words[:, 0]),
+        'amount1': signed(words[:, 1]),
+        'sqrt_price_x96': _words_to_float(words[:, 2]),
+        'liquidity': _words_to_float(words[:, 3]),
+        'tick': tick
+    })
+
+
+def logs_to_swaps(decoded: pd.DataFrame, timestamps: np.ndarray, start_ts: Optional[int] = None,
+                  end_ts: Optional[int] = None,
+                  quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
+    """
+    Convert decoded Swap logs to the process_swap_data schema.
+
+    Args:
+        decoded: Output of decode_swap_logs
+        timestamps: Block timestamp per row
+        start_ts: Earliest valid timestamp in seconds (None for no bound)
+        end_ts: Latest valid timestamp in seconds (None for no bound)
+        quarantine: Optional list that rejected rows are appended to
+
+    Returns:
+        DataFrame in RAW_COLUMNS order
+    """
+    if decoded.empty:
+        return pd.DataFrame(columns=RAW_COLUMNS)
+
+    n = len(decoded)
+    trade_ids = (decoded['tx_hash'].str.lower() + '#' + decoded['log_index'].astype(str)).to_numpy(dtype=object)
+    df, pair_ok = build_swap_frame(
+        trade_ids,
+        np.asarray(timestamps, dtype=np.float64),
+        decoded['amount0'].to_numpy() / 10 ** TOKEN0_DECIMALS,
+        decoded['amount1'].to_numpy() / 10 ** TOKEN1_DECIMALS,
+        np.full(n, TOKEN0_SYMBOL, dtype=object),
+        np.full(n, TOKEN1_SYMBOL, dtype=object)
+    )
+
+    df, rejected, rule_counts = validate_frame(df, start_ts, end_ts, pair_ok)
+    for rule, k in rule_counts.items():
+        if k:
+            count(f'rejected_{rule}', k, stage='uniswap_logs.decode')
+    if not rejected.empty:
+        print(f"Quarantined {len(rejected)} of {n} swaps ({format_counts(rule_counts)})")
+        if quarantine is not None:
+            quarantine.append(rejected)
+    return df
+
+
+def fetch_swap_logs(start_ts: int, end_ts: int, rpc_url: str = RPC_URL,
+                    pool: str = POOL_ADDRESS, client: Optional[HttpClient] = None,
+                    index_path: Optional[str] = BLOCK_INDEX_PATH,
+                    quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
+    """
+    Fetch all pool swaps between two timestamps from event logs.
+
+    Args:
+        start_ts: Start timestamp in seconds
+        end_ts: End timestamp in seconds (inclusive)
+        rpc_url: JSON-RPC endpoint (point at a local stand-in for testing)
+        pool: Pool address
+        client: HTTP client (defaults to the shared client)
+        index_path: Block-time index cache file (None for in-memory only)
+        quarantine: Optional list that rejected rows are appended to
+
+    Returns:
+        DataFrame in RAW_COLUMNS order, sorted and de-duplicated
+    """
+    rpc = JsonRpcClient(rpc_url, client)
+    index = BlockTimeIndex(rpc, index_path)
+
+    head = rpc.block_number()
+    from_block = index.block_at_or_after(start_ts, 0, head, head)
+    to_block = index.block_at_or_after(end_ts + 1, from_block, head, head) - 1
+    print(f"Fetching Swap logs for {pool} from block {from_block} to {to_block} (head {head})")
+
+    logs = get_logs_adaptive(rpc, pool, SWAP_TOPIC, from_block, to_block, head)
+    print(f"Fetched {len(logs)} logs")
+
+    with stage('uniswap_logs.decode'):
+        decoded = decode_swap_logs(logs)
+        timestamps = index.lookup(decoded['block_number'].to_numpy(), head)
+        count('rows_in', len(decoded))
+        df = logs_to_swaps(decoded, timestamps, start_ts, end_ts, quarantine)
+        count('rows_out', len(df))
+
+    return SortedTradeStore('uniswap', df).to_frame()
+
+
+def assert_log_fetch():
+    """
+    Self-check of log fetching against a local JSON-RPC stand-in.
+
+    Covers signed amount and tick decoding, range splitting when the
+    stand-in caps results, the process_swap_data schema, and a second run
+    that resumes from the HTTP cache and block-time index, refetching only
+    blocks too close to the head to be final.
+    """
+    import json
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    def word(value: int) -> str:
+        return (value % (1 << 256)).to_bytes(32, 'big').hex()
+
+    def swap_log(block: int, index: int, amount0: int, amount1: int, tick: int,
+                 removed: bool = False) -> Dict[str, Any]:
+        data = '0x' + ''.join(word(v) for v in (amount0, amount1, 1 << 96, 10 ** 18, tick))
+        return {'address': POOL_ADDRESS, 'topics': [SWAP_TOPIC], 'data': data,
+                'blockNumber': hex(block), 'logIndex': hex(index),
+                'transactionHash': f'0x{block:064x}', 'removed': removed}
+
+    # Two's complement decoding at the int256 and int24 extremes
+    extremes = [(-1, 1, -887272), (-(1 << 255), (1 << 255) - 1, 887272), (5, -7, -1)]
+    decoded = decode_swap_logs([swap_log(1, i, a0, a1, t) for i, (a0, a1, t) in enumerate(extremes)])
+    assert decoded['amount0'].tolist() == [float(a0) for a0, _, _ in extremes]
+    assert decoded['amount1'].tolist() == [float(a1) for _, a1, _ in extremes]
+    assert decoded['tick'].tolist() == [t for _, _, t in extremes]
+    assert decoded['sqrt_price_x96'].eq(2.0 ** 96).all() and decoded['liquidity'].eq(1e18).all()
+
+    first_block, n_blocks, max_results = 20_000_000, 3000, 100
+    head = first_block + n_blocks + 20
+    genesis = START_TIMESTAMP - first_block * 12
+
+    def block_time(block: int) -> int:
+        return genesis + block * 12
+
+    # One swap every other block alternating sides around 1.0, plus a reorged log
+    logs = [swap_log(b, 0, (-1) ** b * 1_000_000_000, -(-1) ** b * (999_500_000 + b % 1000), -(b % 9))
+            for b in range(first_block, first_block + n_blocks, 2)]
+    logs.insert(1, swap_log(first_block + 1, 3, 1, -1, 0, removed=True))
+    history = []
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            calls = body if isinstance(body, list) else [body]
+            responses = []
+            for call in calls:
+                method, params = call['method'], call['params']
+                if method == 'eth_blockNumber':
+                    outcome = {'result': hex(head)}
+                elif method == 'eth_getBlockByNumber':
+                    outcome = {'result': {'number': params[0], 'timestamp': hex(block_time(int(params[0], 16)))}}
+                else:
+                    low, high = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+                    found = [log for log in logs if low <= int(log['blockNumber'], 16) <= high]
+                    outcome = ({'error': {'code': -32000, 'message': f'query returned more than {max_results} results'}}
+                               if len(found) > max_results else {'result': found})
+                history.append((method, params, 'error' in outcome))
+                responses.append({'jsonrpc': '2.0', 'id': call['id'], **outcome})
+            payload = json.dumps(responses if isinstance(body, list) else responses[0]).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rpc_url = f'http://127.0.0.1:{server.server_address[1]}'
+    start_ts = block_time(first_block + 100)
+    end_ts = block_time(first_block + n_blocks - 1)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            def fetch() -> pd.DataFrame:
+                return fetch_swap_logs(start_ts, end_ts, rpc_url,
+                                       client=HttpClient(cache_dir=os.path.join(tmp, 'http_cache')),
+                                       index_path=os.path.join(tmp, 'block_times.npz'))
+
+            df = fetch()
+            served = [log for log in logs if not log['removed']
+                      and first_block + 100 <= int(log['blockNumber'], 16) < first_block + n_blocks]
+            assert list(df.columns) == RAW_COLUMNS and len(df) == len(served), (len(df), len(served))
+            assert any(capped for method, _, capped in history if method == 'eth_getLogs'), \
+                "The adaptive span never hit the result cap"
+
+            # Block 20000100 is a USDC sell: the pool took 1,000 USDC and paid 999.5001 USDT
+            row = df[df['trade_id'] == f'0x{first_block + 100:064x}#0'].iloc[0]
+            assert row['timestamp'] == start_ts and row['side'] == -1 and row['volume'] == 1000.0, row
+            assert abs(row['price'] - 0.9995001) < 1e-12, row['price']
+
+            # Resume: only ranges and blocks within CONFIRMATIONS of the head are
+            # served again (capped probes are errors, which are never cached)
+            history.clear()
+            resumed = fetch()
+            pd.testing.assert_frame_equal(resumed, df)
+            unconfirmed = head - CONFIRMATIONS
+            for method, params, capped in history:
+                if method == 'eth_getLogs' and not capped:
+                    assert int(params[0]['toBlock'], 16) > unconfirmed, params
+                elif method == 'eth_getBlockByNumber':
+                    assert int(params[0], 16) > unconfirmed, params
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("Log fetch tests passed!")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to fetch and save Uniswap V3 data from event logs."""
+    parser = argparse.ArgumentParser(description='Fetch Uniswap V3 swaps from eth_getLogs')
+    parser.add_argument('--rpc-url', default=RPC_URL, help='Ethereum JSON-RPC endpoint')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Check decoding, range splitting and resume against a local stand-in, then exit')
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        assert_log_fetch()
+        return
+
+    print("Starting Uniswap V3 log fetch...")
+    temp_dir = create_temp_dir()
+
+    quarantine = []
+    df = fetch_swap_logs(START_TIMESTAMP, END_TIMESTAMP, args.rpc_url, quarantine=quarantine)
+
+    quarantine_path = os.path.join(temp_dir, 'uniswap_quarantine.parquet')
+    n_quarantined = save_quarantine(quarantine, quarantine_path)
+    print(f"Quarantined {n_quarantined} rows, saved to: {quarantine_path}")
+
+    if df.empty:
+        print("No data fetched!")
+        return
+
+    print(f"Total swaps fetched: {len(df)}")
+    print(f"Date range: {datetime.fromtimestamp(df['timestamp'].min())} to {datetime.fromtimestamp(df['timestamp'].max())}")
+    print(f"Price range: {df['price'].min():.6f} to {df['price'].max():.6f}")
+
+    output_path = os.path.join(temp_dir, 'uniswap_raw_data.parquet')
+    save_to_parquet(df, output_path)
+    print(f"Raw data saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,22 +6,28 @@ import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any
-import time
+from typing import List, Dict, Any, Optional, Tuple
 import os
+import re
 from utils import (
-    calculate_price_from_amounts, validate_price, validate_volume,
-    round_to_hour, is_outside_band, save_to_parquet, create_temp_dir
+    round_to_hour, is_outside_band, save_to_parquet, create_temp_dir,
+    RAW_COLUMNS
 )
+from http_client import get_default_client, is_settled
+from instrumentation import stage, count
+from validation import validate_frame, save_quarantine, format_counts
+from trade_store import SortedTradeStore
 
 # Get your free API key from https://thegraph.com/studio/
 GRAPH_API_KEY = "XXXXXX"  # Replace with your key
 GRAPH_URL = f"https://gateway.thegraph.com/api/{GRAPH_API_KEY}/subgraphs/id/5zvR82QoaXYFyDEKLZ9t6v9adgnptxYpKpSbxtgVENFV"
+GRAPH_CACHE_URL = re.sub(r'/api/[^/]+/', '/api/', GRAPH_URL)  # Cache identity without the API key
 POOL_ADDRESS = "0x3416cf6c708da44db2624d63ea0aaef7113527c6"
 START_TIMESTAMP = int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp())
 END_TIMESTAMP = int(datetime(2025, 9, 30, 23, 59, 59, tzinfo=timezone.utc).timestamp())
 BATCH_SIZE = 1000
 BATCH_DAYS = 7
+RATE_LIMIT_DELAY = 0.2  # Seconds between network requests (cache hits skip it)
 
 
 def build_query(pool_id: str, timestamp_gte: int, timestamp_lt: int, 
@@ -68,119 +74,206 @@ def build_query(pool_id: str, timestamp_gte: int, timestamp_lt: int,
     return query
 
 
-def fetch_swaps_for_day(pool_id: str, day_start: int, day_end: int) -> List[Dict[str, Any]]:
-    """Fetch all swaps for a day using id_gt pagination."""
+def fetch_swaps_for_day(pool_id: str, day_start: int, day_end: int,
+                        failures: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch all swaps for a day using id_gt pagination.
+    
+    Args:
+        pool_id: Pool address
+        day_start: Day start timestamp (inclusive)
+        day_end: Day end timestamp (exclusive)
+        failures: Optional dict that receives day -> error when a page fails;
+            the swaps fetched before the failure are still returned
+        
+    Returns:
+        List of raw swap records
+    """
+    def fail(error: str) -> None:
+        if failures is not None:
+            day = datetime.fromtimestamp(day_start, tz=timezone.utc).strftime('%Y-%m-%d')
+            failures[day] = f'page {page}: {error}'
+    
     all_swaps = []
     last_id = ""
     page = 0
     
-    while True:
-        query = build_query(pool_id, day_start, day_end, BATCH_SIZE, last_id)
+    with stage('uniswap.fetch_day'):
+        while True:
+            query = build_query(pool_id, day_start, day_end, BATCH_SIZE, last_id)
         
-        try:
-            response = requests.post(GRAPH_URL, json={'query': query}, timeout=30)
-            response.raise_for_status()
+            try:
+                data = get_default_client().post_json(
+                    GRAPH_URL, {'query': query},
+                    cacheable=is_settled(day_end), cache_url=GRAPH_CACHE_URL,
+                    cache_check=lambda d: 'errors' not in d,
+                    min_interval=RATE_LIMIT_DELAY
+                )
+                if 'errors' in data:
+                    count('graphql_errors')
+                    print(f"GraphQL errors: {data['errors']}")
+                    fail(f"GraphQL errors: {data['errors']}")
+                    break
             
-            data = response.json()
-            if 'errors' in data:
-                print(f"GraphQL errors: {data['errors']}")
-                break
-            
-            swaps = data.get('data', {}).get('swaps', [])
-            
-            if not swaps:
-                break
+                swaps = data.get('data', {}).get('swaps', [])
             
-            all_swaps.extend(swaps)
-            page += 1
+                if not swaps:
+                    break
             
-            # Update last_id for pagination
-            last_id = swaps[-1]['id']
+                all_swaps.extend(swaps)
+                page += 1
+                count('pages')
             
-            # If we got fewer than BATCH_SIZE, we're done
-            if len(swaps) < BATCH_SIZE:
-                break
+                # Update last_id for pagination
+                last_id = swaps[-1]['id']
             
-            # Rate limiting
-            time.sleep(0.2)
+                # If we got fewer than BATCH_SIZE, we're done
+                if len(swaps) < BATCH_SIZE:
+                    break
         
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed: {e}")
-            break
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            break
+            except requests.exceptions.RequestException as e:
+                count('request_errors')
+                print(f"Request failed: {e}")
+                fail(f'{type(e).__name__}: {e}')
+                break
+            except Exception as e:
+                count('request_errors')
+                print(f"Unexpected error: {e}")
+                fail(f'{type(e).__name__}: {e}')
+                break
+    
+        count('swaps_fetched', len(all_swaps))
     
     return all_swaps
 
 
-def process_swap_data(swaps: List[Dict[str, Any]]) -> pd.DataFrame:
+def build_swap_frame(trade_ids: np.ndarray, timestamps: np.ndarray,
+                     amount0: np.ndarray, amount1: np.ndarray,
+                     token0_symbols: np.ndarray, token1_symbols: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Build decoded swap rows from decimal-adjusted pool deltas.
+    
+    Args:
+        trade_ids: Swap ids
+        timestamps: Swap timestamps in seconds (NaN where unparseable)
+        amount0: Pool delta of token0 in token units
+        amount1: Pool delta of token1 in token units
+        token0_symbols: token0 symbol per swap
+        token1_symbols: token1 symbol per swap
+        
+    Returns:
+        (DataFrame in RAW_COLUMNS order, boolean mask of rows with a USDC/USDT pair)
+    """
+    token0_is_usdc = (token0_symbols == 'USDC') & (token1_symbols == 'USDT')
+    token1_is_usdc = (token0_symbols == 'USDT') & (token1_symbols == 'USDC')
+    pair_ok = token0_is_usdc | token1_is_usdc
+    
+    usdc_amount = np.where(token0_is_usdc, amount0, np.where(token1_is_usdc, amount1, np.nan))
+    usdt_amount = np.where(token0_is_usdc, amount1, np.where(token1_is_usdc, amount0, np.nan))
+    
+    # Price is USDT per USDC; amounts are pool deltas with opposite signs, so
+    # a positive USDC amount means the trader sold USDC into the pool
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price = np.where(usdc_amount != 0, np.abs(usdt_amount) / np.abs(usdc_amount), np.nan)
+    
+    df = pd.DataFrame({
+        'timestamp': timestamps,
+        'price': price,
+        'volume': np.abs(usdc_amount),
+        'venue': 'uniswap',
+        'side': -np.sign(np.nan_to_num(usdc_amount)).astype(np.int8),
+        'trade_id': trade_ids
+    })
+    return df[RAW_COLUMNS], pair_ok
+
+
+def process_swap_data(swaps: List[Dict[str, Any]], start_ts: Optional[int] = None,
+                      end_ts: Optional[int] = None,
+                      quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
     """
     Process raw swap data into structured DataFrame.
     
+    Subgraph amounts are already decimal-adjusted (BigDecimal token units).
+    
     Args:
         swaps: List of raw swap records
+        start_ts: Earliest valid timestamp in seconds (None for no bound)
+        end_ts: Latest valid timestamp in seconds (None for no bound)
+        quarantine: Optional list that rejected rows are appended to
         
     Returns:
         Processed DataFrame
     """
     if not swaps:
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+        return pd.DataFrame(columns=RAW_COLUMNS)
+    
+    with stage('uniswap.process_swaps'):
+        count('rows_in', len(swaps))
+        raw = pd.DataFrame.from_records(
+            swaps, columns=['id', 'timestamp', 'amount0', 'amount1', 'token0', 'token1']
+        )
+        
+        def symbols(name: str) -> np.ndarray:
+            return np.array([t.get('symbol') if isinstance(t, dict) else None for t in raw[name]])
+        
+        df, pair_ok = build_swap_frame(
+            raw['id'].to_numpy(dtype=object),
+            pd.to_numeric(raw['timestamp'], errors='coerce').to_numpy(dtype=np.float64),
+            pd.to_numeric(raw['amount0'], errors='coerce').to_numpy(dtype=np.float64),
+            pd.to_numeric(raw['amount1'], errors='coerce').to_numpy(dtype=np.float64),
+            symbols('token0'),
+            symbols('token1')
+        )
+        
+        df, rejected, rule_counts = validate_frame(df, start_ts, end_ts, pair_ok)
+        for rule, n in rule_counts.items():
+            if n:
+                count(f'rejected_{rule}', n)
+        if not rejected.empty:
+            print(f"Quarantined {len(rejected)} of {len(raw)} swaps ({format_counts(rule_counts)})")
+            if quarantine is not None:
+                quarantine.append(rejected)
+        
+        count('rows_out', len(df))
     
-    processed_data = []
+    return df
+
+
+def fetch_raw_swaps(pool_id: str, start_ts: int, end_ts: int,
+                    failures: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch raw (undecoded) swap records for the given time range, day by day.
     
-    for swap in swaps:
-        try:
-            # Extract basic fields
-            timestamp = int(swap['timestamp'])
-            amount0 = float(swap['amount0'])
-            amount1 = float(swap['amount1'])
-            amount_usd = float(swap.get('amountUSD', 0))
-            
-            # Extract token information
-            token0_symbol = swap['token0']['symbol']
-            token1_symbol = swap['token1']['symbol']
-            token0_decimals = int(swap['token0']['decimals'])
-            token1_decimals = int(swap['token1']['decimals'])
-            
-            # Calculate price
-            price = calculate_price_from_amounts(
-                amount0, amount1, token0_decimals, token1_decimals,
-                token0_symbol, token1_symbol
-            )
-            
-            # Validate price
-            if not validate_price(price):
-                continue
-            
-            # Calculate volume in USDC terms
-            if token0_symbol == 'USDC':
-                volume = abs(amount0) / (10 ** token0_decimals)
-            elif token1_symbol == 'USDC':
-                volume = abs(amount1) / (10 ** token1_decimals)
-            else:
-                # Fallback to USD amount if available
-                volume = amount_usd if amount_usd > 0 else 0
-            
-            # Validate volume
-            if not validate_volume(volume):
-                continue
-            
-            processed_data.append({
-                'timestamp': timestamp,
-                'price': price,
-                'volume': volume,
-                'venue': 'uniswap'
-            })
-            
-        except (ValueError, KeyError, TypeError) as e:
-            print(f"Error processing swap {swap.get('id', 'unknown')}: {e}")
-            continue
+    Args:
+        pool_id: Pool address
+        start_ts: Start timestamp
+        end_ts: End timestamp
+        failures: Optional dict that receives day -> error for days with a
+            failed page
+        
+    Returns:
+        List of raw swap records as returned by the subgraph, possibly
+        incomplete for the failed days
+    """
+    all_swaps = []
+    current_date = datetime.fromtimestamp(start_ts, tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = datetime.fromtimestamp(end_ts, tz=timezone.utc)
     
-    return pd.DataFrame(processed_data)
+    while current_date <= end_date:
+        day_start = int(current_date.timestamp())
+        day_end = int((current_date + timedelta(days=1)).timestamp())  # Exclusive (timestamp_lt)
+        
+        day_swaps = fetch_swaps_for_day(pool_id, day_start, day_end, failures)
+        all_swaps.extend(day_swaps)
+        print(f"Fetched {len(day_swaps)} raw swaps for {current_date.strftime('%Y-%m-%d')}")
+        
+        current_date += timedelta(days=1)
+    
+    return all_swaps
 
 
-def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int) -> pd.DataFrame:
+def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int,
+                    quarantine: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
     """
     Fetch all swaps for the given time range, day by day.
     
@@ -188,11 +281,12 @@ def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int) -> pd.DataFrame:
         pool_id: Pool address
         start_ts: Start timestamp
         end_ts: End timestamp
+        quarantine: Optional list that rejected rows are appended to
         
     Returns:
         DataFrame with all swap data
     """
-    all_dataframes = []
+    store = SortedTradeStore('uniswap')
     current_date = datetime.fromtimestamp(start_ts, tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     end_date = datetime.fromtimestamp(end_ts, tz=timezone.utc)
     
@@ -204,7 +298,7 @@ def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int) -> pd.DataFrame:
     
     while current_date <= end_date:
         day_start = int(current_date.timestamp())
-        day_end = int((current_date.replace(hour=23, minute=59, second=59)).timestamp())
+        day_end = int((current_date + timedelta(days=1)).timestamp())  # Exclusive (timestamp_lt)
         
         print(f"Fetching day: {current_date.strftime('%Y-%m-%d')}...", end=" ")
         
@@ -213,11 +307,11 @@ def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int) -> pd.DataFrame:
         
         if day_swaps:
             # Process the swaps
-            day_df = process_swap_data(day_swaps)
+            day_df = process_swap_data(day_swaps, day_start, day_end - 1, quarantine)
             if not day_df.empty:
-                all_dataframes.append(day_df)
-                total_swaps += len(day_df)
-                print(f"{len(day_df)} swaps")
+                added = store.ingest(day_df)
+                total_swaps += added
+                print(f"{len(day_df)} swaps ({added} new)")
                 
                 # Show sample prices for first day
                 if days_processed == 0 and len(day_df) > 0:
@@ -234,10 +328,7 @@ def fetch_all_swaps(pool_id: str, start_ts: int, end_ts: int) -> pd.DataFrame:
     
     print(f"\nTotal: {days_processed} days processed, {total_swaps} swaps")
     
-    if all_dataframes:
-        return pd.concat(all_dataframes, ignore_index=True)
-    else:
-        return pd.DataFrame(columns=['timestamp', 'price', 'volume', 'venue'])
+    return store.to_frame()
 
 
 def main():
@@ -248,7 +339,13 @@ def main():
     temp_dir = create_temp_dir()
     
     # Fetch all swaps
-    df = fetch_all_swaps(POOL_ADDRESS, START_TIMESTAMP, END_TIMESTAMP)
+    quarantine = []
+    df = fetch_all_swaps(POOL_ADDRESS, START_TIMESTAMP, END_TIMESTAMP, quarantine)
+    
+    # Save rejected rows
+    quarantine_path = os.path.join(temp_dir, 'uniswap_quarantine.parquet')
+    n_quarantined = save_quarantine(quarantine, quarantine_path)
+    print(f"Quarantined {n_quarantined} rows, saved to: {quarantine_path}")
     
     if df.empty:
         print("No data fetched!")
@@ -0,0 +1,299 @@
+"""
+Shared HTTP transport for the Bybit and Uniswap fetchers.
+
+Wraps a connection-pooled requests.Session with bounded exponential
+backoff (full jitter), per-host request spacing and a content-addressed
+on-disk cache of JSON responses. Only requests for immutable historical
+windows should be marked cacheable; cache hits skip both the network and
+the rate-limit delay, so rerunning a finished quarter is nearly free.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import create_temp_dir
+
+# Configuration
+DEFAULT_TIMEOUT = 30  # Seconds
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # Seconds
+BACKOFF_CAP = 30.0  # Seconds
+POOL_SIZE = 16
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+SETTLE_SECONDS = 3600  # Windows older than this are treated as immutable
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff delay for a zero-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_settled(end_ts: float, settle_seconds: int = SETTLE_SECONDS) -> bool:
+    """Check whether a window ending at end_ts (seconds) is old enough to cache."""
+    return end_ts < time.time() - settle_seconds
+
+
+class HttpClient:
+    """
+    Pooled, retrying JSON client with an optional disk cache.
+
+    Counters in self.stats: requests (network attempts), hits, misses,
+    retries and errors (requests that failed after all retries).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 pool_size: int = POOL_SIZE):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'retries': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._last_request: Dict[str, float] = {}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(method: str, url: str, params: Optional[dict] = None,
+                  json_body: Optional[Any] = None) -> str:
+        """Content address of a request: sha256 over method, endpoint and query."""
+        identity = json.dumps({
+            'method': method.upper(),
+            'url': url,
+            'params': params or {},
+            'json': json_body
+        }, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _cache_read(self, key: str) -> Optional[Any]:
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cache_write(self, key: str, data: Any) -> None:
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += n
+
+    def _throttle(self, url: str, min_interval: float) -> None:
+        if min_interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            ready_at = self._last_request.get(host, 0.0) + min_interval
+            self._last_request[host] = max(now, ready_at)
+        if ready_at > now:
+            time.sleep(ready_at - now)
+
+    def send(self, method: str, url: str, params: Optional[dict] = None,
+             json_body: Optional[Any] = None, headers: Optional[dict] = None,
+             stream: bool = False, min_interval: float = 0.0) -> requests.Response:
+        """
+        Send a request with retries on connection errors and retryable statuses.
+
+        Raises:
+            requests.exceptions.RequestException: when all retries fail
+        """
+        for attempt in range(self.max_retries + 1):
+            self._throttle(url, min_interval)
+            self._count('requests')
+            try:
+                response = self.session.request(
+                    method, url, params=params, json=json_body, headers=headers,
+                    timeout=self.timeout, stream=stream
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except requests.exceptions.HTTPError:
+                        # Release the pooled connection before giving up
+                        response.close()
+                        raise
+                    return response
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} error for url: {response.url}", response=response
+                )
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                retry_after = None
+
+            if attempt == self.max_retries:
+                break
+
+            delay = backoff_delay(attempt)
+            if retry_after is not None:
+                try:
+                    delay = min(BACKOFF_CAP, max(delay, float(retry_after)))
+                except ValueError:
+                    pass
+            self._count('retries')
+            time.sleep(delay)
+
+        self._count('errors')
+        raise error
+
+    def request_json(self, method: str, url: str, params: Optional[dict] = None,
+                     json_body: Optional[Any] = None, cacheable: bool = False,
+                     cache_check: Optional[Callable[[Any], bool]] = None,
+                     min_interval: float = 0.0, cache_url: Optional[str] = None) -> Any:
+        """
+        Send a request and return the decoded JSON body.
+
+        Args:
+            method: HTTP method
+            url: Endpoint URL
+            params: Query parameters
+            json_body: JSON request body
+            cacheable: Whether the response is immutable and may be cached
+            cache_check: Optional predicate; responses failing it (e.g. API
+                errors wrapped in a 200) are returned but not cached
+            min_interval: Minimum seconds between network requests to this host
+            cache_url: URL used for the cache key instead of url, e.g. with
+                an embedded API key removed so rotating keys keeps the cache
+
+        Returns:
+            Decoded JSON response
+        """
+        use_cache = cacheable and self.cache_dir is not None
+        if use_cache:
+            key = self.cache_key(method, cache_url or url, params, json_body)
+            cached = self._cache_read(key)
+            if cached is not None:
+                self._count('hits')
+                return cached
+            self._count('misses')
+
+        data = self.send(method, url, params=params, json_body=json_body,
+                         min_interval=min_interval).json()
+
+        if use_cache and (cache_check is None or cache_check(data)):
+            self._cache_write(key, data)
+        return data
+
+    def get_json(self, url: str, params: Optional[dict] = None, **kwargs) -> Any:
+        """GET a JSON endpoint (see request_json for options)."""
+        return self.request_json('GET', url, params=params, **kwargs)
+
+    def post_json(self, url: str, json_body: Any, **kwargs) -> Any:
+        """POST a JSON body (see request_json for options)."""
+        return self.request_json('POST', url, json_body=json_body, **kwargs)
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """Shared client caching into temp/http_cache."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient(cache_dir=os.path.join(create_temp_dir(), 'http_cache'))
+        return _default_client
+
+
+def assert_retry_and_cache():
+    """
+    Self-check of retries, backoff and caching against a local http.server stand-in.
+    """
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    calls = {'/flaky': 0, '/missing': 0}
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls[self.path] += 1
+            if self.path == '/flaky' and calls[self.path] <= 2:
+                status, body = 503, b'{}'
+            elif self.path == '/missing':
+                status, body = 404, b'{}'
+            else:
+                status, body = 200, b'{"ok": true}'
+            self.send_response(status)
+            if status == 503:
+                self.send_header('Retry-After', '0.2')
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    for attempt in range(8):
+        assert 0 <= backoff_delay(attempt) <= min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = HttpClient(cache_dir=cache_dir, max_retries=3)
+
+            # Two 503s with Retry-After, then success: the waits honour the header
+            started = time.monotonic()
+            assert client.get_json(f'{base_url}/flaky', cacheable=True) == {'ok': True}
+            assert time.monotonic() - started >= 0.4, "Retry-After was not honoured"
+            assert calls['/flaky'] == 3 and client.stats['retries'] == 2
+
+            # Served from the cache without touching the network
+            assert client.get_json(f'{base_url}/flaky', cacheable=True) == {'ok': True}
+            assert calls['/flaky'] == 3 and client.stats['hits'] == 1
+
+            # The cache key can ignore parts of the URL, e.g. an API key
+            keyed = client.get_json(f'{base_url}/flaky?key=other', cacheable=True,
+                                    cache_url=f'{base_url}/flaky')
+            assert keyed == {'ok': True} and calls['/flaky'] == 3
+
+            # Non-retryable statuses fail at once
+            try:
+                client.get_json(f'{base_url}/missing')
+                raise AssertionError("404 did not raise")
+            except requests.exceptions.HTTPError:
+                pass
+            assert calls['/missing'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("HTTP client tests passed!")
+
+
+if __name__ == "__main__":
+    assert_retry_and_cache()
@@ -0,0 +1,222 @@
+"""
+Lightweight stage instrumentation for the peg pipeline.
+
+Provides context-manager timers, per-stage counters and peak-RSS sampling,
+plus optional cProfile (or pyinstrument, when installed) dumps of hot
+stages. A module-level recorder is shared by the fetchers, processors and
+aggregation, so instrumenting a function only takes a ``with stage(...)``
+block and ``count(...)`` calls. The run report is written as JSON.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+# Configuration
+SAMPLE_INTERVAL = 0.05  # Seconds between RSS samples while a stage is active
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (falls back to peak RSS off Linux, 0 on Windows)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            # No resource module on Windows
+            return 0.0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KB elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class RunRecorder:
+    """
+    Collects per-stage timings, counters and peak RSS for one run.
+
+    Stages are aggregated by name, so a stage entered once per hour of data
+    reports its call count, total and max seconds.
+    """
+
+    def __init__(self, sample_interval: float = SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.profile_dir: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, name: str) -> Dict[str, Any]:
+        if name not in self._stages:
+            self._stages[name] = {'calls': 0, 'seconds_total': 0.0, 'seconds_max': 0.0,
+                                  'peak_rss_mb': 0.0, 'counters': {}}
+        return self._stages[name]
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while True:
+            time.sleep(self.sample_interval)
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                rss = current_rss_mb()
+                for active in self._active.values():
+                    active['peak_rss_mb'] = max(active['peak_rss_mb'], rss)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block and sample its peak RSS; counters inside go to this stage."""
+        token = object()
+        active = {'name': name, 'peak_rss_mb': current_rss_mb()}
+        with self._lock:
+            self._active[id(token)] = active
+            self._ensure_sampler()
+
+        self._stack().append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack().pop()
+            with self._lock:
+                del self._active[id(token)]
+                record = self._record(name)
+                record['calls'] += 1
+                record['seconds_total'] += elapsed
+                record['seconds_max'] = max(record['seconds_max'], elapsed)
+                record['peak_rss_mb'] = max(record['peak_rss_mb'], active['peak_rss_mb'], current_rss_mb())
+
+    def count(self, counter: str, n: int = 1, stage: Optional[str] = None) -> None:
+        """Add n to a counter of the given stage (default: innermost active stage)."""
+        if stage is None:
+            stack = self._stack()
+            stage = stack[-1] if stack else 'run'
+        with self._lock:
+            counters = self._record(stage)['counters']
+            counters[counter] = counters.get(counter, 0) + n
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """
+        Profile a block when profiling is enabled (self.profile_dir is set).
+
+        Uses pyinstrument if installed (HTML report), otherwise cProfile
+        (.prof dump). Only one block is profiled at a time; concurrent
+        blocks run unprofiled.
+        """
+        if self.profile_dir is None or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                Profiler = None
+
+            if Profiler is not None:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    with open(os.path.join(self.profile_dir, f'{name}.html'), 'w', encoding='utf-8') as f:
+                        f.write(profiler.output_html())
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+                    profiler.dump_stats(os.path.join(self.profile_dir, f'{name}.prof'))
+        finally:
+            self._profile_lock.release()
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run report as a JSON-serializable dict."""
+        with self._lock:
+            stages = {name: {**record, 'counters': dict(record['counters'])}
+                      for name, record in self._stages.items()}
+
+        report = {
+            'started_at': self.started_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'finished_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'peak_rss_mb': current_rss_mb() if not stages else max(
+                [current_rss_mb()] + [s['peak_rss_mb'] for s in stages.values()]),
+            'stages': stages
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    def write_report(self, filepath: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Write the run report as JSON."""
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.report(extra), f, indent=2)
+
+
+_recorder = RunRecorder()
+
+
+def get_recorder() -> RunRecorder:
+    """Shared recorder used by the pipeline modules."""
+    return _recorder
+
+
+def stage(name: str):
+    """Time a block on the shared recorder."""
+    return _recorder.stage(name)
+
+
+def count(counter: str, n: int = 1, stage: Optional[str] = None) -> None:
+    """Increment a counter on the shared recorder."""
+    _recorder.count(counter, n, stage)
+
+
+def profile(name: str):
+    """Profile a block on the shared recorder (no-op unless enabled)."""
+    return _recorder.profile(name)
+
+
+def enable_profiling(profile_dir: str) -> None:
+    """Turn on profile dumps of hot stages into profile_dir."""
+    _recorder.profile_dir = profile_dir
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a compact stage timing table."""
+    print("\n=== Run Report ===")
+    for name, record in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds_total']):
+        counters = ', '.join(f'{k}={v}' for k, v in sorted(record['counters'].items()))
+        print(f"{name:<28} {record['calls']:>6} calls {record['seconds_total']:>9.2f}s "
+              f"{record['peak_rss_mb']:>8.1f} MB  {counters}")
+    print(f"Peak RSS: {report['peak_rss_mb']:.1f} MB")
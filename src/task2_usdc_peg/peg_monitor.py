@@ -0,0 +1,638 @@
+"""
+Real-time USDC peg monitor over a live trade/swap event stream.
+
+The batch pipeline only sees a quarter once it has been fetched. This
+service consumes events as they arrive from a pluggable source (a tailed
+JSON-lines file or a local socket, both stand-ins for venue websockets)
+and keeps, per venue:
+
+- the current hour's outside-band volume, min/max price and VWAP
+- the same statistics over a rolling window (default 5 minutes)
+
+Every event is O(1) amortized: hour buckets are running sums, and the
+rolling window pairs running sums with monotonic deques for min/max.
+Alerts are raised when the price deviation or the rolling outside-band
+volume crosses a threshold, and cleared when it falls back. The hourly
+statistics are checkpointed in the same table format that
+aggregate_outside_band.py writes, and event latency (producer send time,
+or arrival time when the producer does not stamp events, to processed)
+is reported on exit.
+
+Events are one JSON object per line:
+
+    {"venue": "bybit", "timestamp": 1751328000, "price": 0.9987,
+     "volume": 2500.0, "sent_at": 1751328000.012}
+
+'sent_at' (unix seconds, float) is optional.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import BAND_CENTER, BAND_LOWER, BAND_UPPER, create_temp_dir, save_to_csv, validate_price
+from instrumentation import count, get_recorder, print_report, stage
+
+# Configuration
+VENUES = ['uniswap', 'bybit']
+WINDOW_SECONDS = 300
+DEVIATION_ALERT_BPS = 20.0  # |price - 1| in bps; the band itself is 10 bps
+VOLUME_ALERT = 1_000_000.0  # Rolling-window outside-band volume (USDC)
+ALERT_CLEAR_RATIO = 0.8  # An alert clears once its value falls below this fraction of the threshold
+CHECKPOINT_INTERVAL = 30.0  # Wall seconds between checkpoints (also written at each hour close)
+POLL_INTERVAL = 0.1  # Seconds between reads of a tailed file at EOF
+LATENCY_SAMPLES = 100_000
+MAX_TIMESTAMP = 253_402_300_799  # 9999-12-31T23:59:59Z, the last second datetime can format
+SOCKET_HOST = '127.0.0.1'
+SOCKET_PORT = 9870
+EVENTS_PATH = 'temp/live_events.jsonl'
+CHECKPOINT_PATH = 'outputs/usdc_peg_outside_band_live.csv'
+ALERTS_PATH = 'outputs/usdc_peg_alerts.jsonl'
+
+HOURLY_COLUMNS = [
+    'time', 'uniswap_volume', 'bybit_volume',
+    'uniswap_min_price', 'uniswap_max_price',
+    'bybit_min_price', 'bybit_max_price'
+]
+
+# Float bounds for the per-event check (same band as utils.is_outside_band)
+BAND_CENTER_FLOAT = float(BAND_CENTER)
+BAND_LOWER_FLOAT = float(BAND_LOWER)
+BAND_UPPER_FLOAT = float(BAND_UPPER)
+
+
+def format_hour(hour: int) -> str:
+    """Format an hour start (unix seconds) as in the hourly table."""
+    return datetime.fromtimestamp(hour, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class HourBucket:
+    """Outside-band volume, notional and price range of one venue-hour."""
+
+    def __init__(self):
+        self.volume = 0.0
+        self.notional = 0.0
+        self.min_price = np.nan
+        self.max_price = np.nan
+        self.trades = 0
+
+    def add(self, price: float, volume: float) -> None:
+        self.volume += volume
+        self.notional += price * volume
+        self.min_price = price if self.trades == 0 else min(self.min_price, price)
+        self.max_price = price if self.trades == 0 else max(self.max_price, price)
+        self.trades += 1
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume > 0 else np.nan
+
+
+class RollingWindow:
+    """
+    Outside-band statistics over the last `seconds` of event time.
+
+    Volume and notional are running sums; min and max come from monotonic
+    deques whose heads are the window extremes. Each event is pushed and
+    popped at most once per deque, so updates are O(1) amortized.
+    Timestamps that go backwards are clamped to the latest seen, which
+    keeps all three deques ordered by time.
+    """
+
+    def __init__(self, seconds: float = WINDOW_SECONDS):
+        if seconds <= 0:
+            raise ValueError("Window length must be positive")
+        self.seconds = seconds
+        self.volume = 0.0
+        self.notional = 0.0
+        self._latest = -np.inf
+        self._events: Deque[Tuple[float, float, float]] = deque()
+        self._min: Deque[Tuple[float, float]] = deque()
+        self._max: Deque[Tuple[float, float]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, timestamp: float, price: float, volume: float) -> None:
+        timestamp = max(timestamp, self._latest)
+        self._latest = timestamp
+        self._events.append((timestamp, price, volume))
+        self.volume += volume
+        self.notional += price * volume
+
+        while self._min and self._min[-1][1] >= price:
+            self._min.pop()
+        self._min.append((timestamp, price))
+        while self._max and self._max[-1][1] <= price:
+            self._max.pop()
+        self._max.append((timestamp, price))
+
+    def expire(self, now: float) -> None:
+        """Drop events at or before now - seconds."""
+        cutoff = now - self.seconds
+        while self._events and self._events[0][0] <= cutoff:
+            _, price, volume = self._events.popleft()
+            self.volume -= volume
+            self.notional -= price * volume
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+        if not self._events:
+            # Reset instead of carrying float residue from the subtractions
+            self.volume = 0.0
+            self.notional = 0.0
+
+    @property
+    def min_price(self) -> float:
+        return self._min[0][1] if self._min else np.nan
+
+    @property
+    def max_price(self) -> float:
+        return self._max[0][1] if self._max else np.nan
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume > 0 else np.nan
+
+
+class LatencyTracker:
+    """Keeps the most recent latency samples and summarizes them."""
+
+    def __init__(self, max_samples: int = LATENCY_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.total += 1
+
+    def summary(self) -> Dict[str, float]:
+        """Count plus mean, p50, p99 and max latency in milliseconds."""
+        if not self._samples:
+            return {'events': 0}
+        samples = np.fromiter(self._samples, dtype=np.float64) * 1000
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {'events': self.total, 'mean_ms': float(samples.mean()), 'p50_ms': float(p50),
+                'p99_ms': float(p99), 'max_ms': float(samples.max())}
+
+
+class PegMonitor:
+    """
+    Per-venue current-hour and rolling-window outside-band statistics.
+
+    Feed events to process(). It returns the alerts raised or cleared by
+    that event. Every event advances a shared event-time clock and expires
+    all venues' windows, so a venue that goes quiet has its volume alert
+    cleared by the other venue's events. Hour buckets are kept for every hour seen, so
+    hourly_table() can rebuild the whole checkpoint at any time.
+
+    Args:
+        window_seconds: Rolling window length in event-time seconds
+        deviation_alert_bps: |price - 1| in bps that raises a deviation alert
+        volume_alert: Rolling outside-band volume that raises a volume alert
+    """
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS,
+                 deviation_alert_bps: float = DEVIATION_ALERT_BPS,
+                 volume_alert: float = VOLUME_ALERT):
+        self.deviation_alert_bps = deviation_alert_bps
+        self.volume_alert = volume_alert
+        self.windows = {venue: RollingWindow(window_seconds) for venue in VENUES}
+        self.hours: Dict[int, Dict[str, HourBucket]] = {}
+        self.current_hour = {venue: None for venue in VENUES}
+        self.last_price = {venue: np.nan for venue in VENUES}
+        self.hours_closed = 0
+        self.clock = -np.inf  # Latest event time seen on any venue
+        self.counters = {'events': 0, 'outside_band': 0, 'rejected': 0, 'alerts': 0}
+        self._alerting: Dict[Tuple[str, str], bool] = {}
+
+    def process(self, event: dict) -> List[dict]:
+        """
+        Update the statistics with one event.
+
+        Args:
+            event: Dict with 'venue', 'timestamp' (unix seconds), 'price', 'volume'
+
+        Returns:
+            List of alert dicts (possibly empty); malformed events are
+            counted as rejected instead of raising
+        """
+        try:
+            venue = event['venue']
+            timestamp = float(event['timestamp'])
+            price = float(event['price'])
+            volume = float(event['volume'])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            self.counters['rejected'] += 1
+            return []
+        # json.loads accepts NaN and Infinity, and any JSON value as the venue
+        if (not isinstance(venue, str) or venue not in self.windows
+                or not 0 <= timestamp <= MAX_TIMESTAMP  # False for NaN
+                or not validate_price(price) or not 0 < volume < math.inf):
+            self.counters['rejected'] += 1
+            return []
+
+        self.counters['events'] += 1
+        self.last_price[venue] = price
+
+        hour = int(timestamp) // 3600 * 3600
+        previous = self.current_hour[venue]
+        if previous is None or hour > previous:
+            if previous is not None:
+                self.hours_closed += 1
+            self.current_hour[venue] = hour
+
+        window = self.windows[venue]
+        if price < BAND_LOWER_FLOAT or price > BAND_UPPER_FLOAT:
+            self.counters['outside_band'] += 1
+            buckets = self.hours.setdefault(hour, {})
+            if venue not in buckets:
+                buckets[venue] = HourBucket()
+            buckets[venue].add(price, volume)
+            window.add(timestamp, price, volume)
+
+        # Expire every venue, not just this one, so quiet venues age out too
+        self.clock = max(self.clock, timestamp)
+        for other in self.windows.values():
+            other.expire(self.clock)
+
+        deviation_bps = (price - BAND_CENTER_FLOAT) * 10_000
+        alerts = []
+        self._check(alerts, venue, 'deviation', abs(deviation_bps), self.deviation_alert_bps,
+                    timestamp, round(deviation_bps, 2))
+        for name, other in self.windows.items():
+            self._check(alerts, name, 'volume', other.volume, self.volume_alert,
+                        timestamp, round(other.volume, 2))
+        self.counters['alerts'] += len(alerts)
+        return alerts
+
+    def _check(self, alerts: List[dict], venue: str, kind: str, level: float, threshold: float,
+               timestamp: float, value: float) -> None:
+        # Edge-triggered with hysteresis: one alert when the threshold is
+        # crossed, one when the level falls clearly back below it
+        key = (venue, kind)
+        alerting = self._alerting.get(key, False)
+        breached = level >= (threshold * ALERT_CLEAR_RATIO if alerting else threshold)
+        if breached == alerting:
+            return
+        self._alerting[key] = breached
+        alerts.append({'venue': venue, 'kind': kind, 'state': 'raised' if breached else 'cleared',
+                       'time': datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(),
+                       'value': value, 'price': self.last_price[venue]})
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current-hour and rolling-window statistics per venue."""
+        result = {}
+        for venue in VENUES:
+            hour = self.current_hour[venue]
+            bucket = self.hours.get(hour, {}).get(venue, HourBucket()) if hour is not None else HourBucket()
+            window = self.windows[venue]
+            result[venue] = {
+                'hour': format_hour(hour) if hour is not None else None,
+                'hour_volume': bucket.volume, 'hour_min_price': bucket.min_price,
+                'hour_max_price': bucket.max_price, 'hour_vwap': bucket.vwap,
+                'window_volume': window.volume, 'window_min_price': window.min_price,
+                'window_max_price': window.max_price, 'window_vwap': window.vwap,
+                'window_trades': len(window), 'last_price': self.last_price[venue]
+            }
+        return result
+
+    def hourly_table(self) -> pd.DataFrame:
+        """
+        Hours seen so far in the aggregate_outside_band.py table format.
+
+        Hours between the first and last event without outside-band volume
+        get zero volume and NaN prices, as in the batch table.
+        """
+        seen = [hour for hour in self.current_hour.values() if hour is not None]
+        if not seen:
+            return pd.DataFrame(columns=HOURLY_COLUMNS)
+
+        first = min(min(self.hours, default=min(seen)), min(seen))
+        hours = range(first, max(seen) + 3600, 3600)
+        rows = []
+        for hour in hours:
+            buckets = self.hours.get(hour, {})
+            row = {'time': format_hour(hour)}
+            for venue in VENUES:
+                bucket = buckets.get(venue)
+                row[f'{venue}_volume'] = bucket.volume if bucket else 0.0
+                row[f'{venue}_min_price'] = bucket.min_price if bucket else np.nan
+                row[f'{venue}_max_price'] = bucket.max_price if bucket else np.nan
+            rows.append(row)
+        return pd.DataFrame(rows, columns=HOURLY_COLUMNS)
+
+
+def parse_event(line: str, received_at: float) -> Optional[dict]:
+    """Decode one JSON line and stamp its arrival time (None if malformed)."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(event, dict):
+        return None
+    event['received_at'] = received_at
+    return event
+
+
+class EventSource:
+    """Base class for event sources: events() yields event dicts."""
+
+    malformed = 0
+
+    async def events(self) -> AsyncIterator[dict]:
+        raise NotImplementedError
+        yield
+
+
+class FileTailSource(EventSource):
+    """
+    Follow a JSON-lines file like ``tail -f``.
+
+    Waits for the file to appear, reads it from the start, then polls for
+    appended lines. Partial lines are held until their newline arrives.
+    With follow=False the source ends at EOF.
+    """
+
+    def __init__(self, path: str, follow: bool = True, poll_interval: float = POLL_INTERVAL):
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.malformed = 0
+
+    async def events(self) -> AsyncIterator[dict]:
+        while not os.path.exists(self.path):
+            if not self.follow:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+        with open(self.path, 'r') as f:
+            pending = ''
+            while True:
+                line = f.readline()
+                if not line:
+                    if not self.follow:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                pending += line
+                if not pending.endswith('\n'):
+                    continue
+                line, pending = pending, ''
+                if not line.strip():
+                    continue
+                event = parse_event(line, time.time())
+                if event is None:
+                    self.malformed += 1
+                    continue
+                yield event
+
+            if pending.strip():
+                event = parse_event(pending, time.time())
+                if event is None:
+                    self.malformed += 1
+                else:
+                    yield event
+
+
+class SocketSource(EventSource):
+    """
+    Accept TCP connections and read JSON lines from each of them.
+
+    Any number of producers can connect; their events are interleaved in
+    arrival order through a bounded queue, so a slow consumer applies
+    backpressure to the producers.
+    """
+
+    def __init__(self, host: str = SOCKET_HOST, port: int = SOCKET_PORT, queue_size: int = 10_000):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.malformed = 0
+
+    async def events(self) -> AsyncIterator[dict]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                async for line in reader:
+                    event = parse_event(line.decode('utf-8', 'replace'), time.time())
+                    if event is None:
+                        self.malformed += 1
+                        continue
+                    await queue.put(event)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, self.host, self.port)
+        print(f"Listening for events on {self.host}:{self.port}")
+        async with server:
+            while True:
+                yield await queue.get()
+
+
+class QueueSource(EventSource):
+    """Events put on an asyncio.Queue by an in-process producer; None ends the stream."""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def events(self) -> AsyncIterator[dict]:
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                return
+            event.setdefault('received_at', time.time())
+            yield event
+
+
+def write_checkpoint(monitor: PegMonitor, path: str) -> int:
+    """Atomically write the hourly table; returns the number of hours."""
+    table = monitor.hourly_table()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    save_to_csv(table, tmp_path)
+    os.replace(tmp_path, path)
+    return len(table)
+
+
+def print_alert(alert: dict) -> None:
+    unit = 'bps' if alert['kind'] == 'deviation' else 'USDC'
+    print(f"[{alert['time']}] {alert['venue']} {alert['kind']} {alert['state']}: "
+          f"{alert['value']:,} {unit} (price {alert['price']:.6f})")
+
+
+async def run_monitor(source: EventSource, monitor: PegMonitor,
+                      checkpoint_path: str = CHECKPOINT_PATH,
+                      alerts_path: Optional[str] = ALERTS_PATH,
+                      checkpoint_interval: float = CHECKPOINT_INTERVAL,
+                      on_alert: Callable[[dict], None] = print_alert,
+                      latency: Optional[LatencyTracker] = None) -> LatencyTracker:
+    """
+    Consume a source until it ends or the task is cancelled.
+
+    Checkpoints every checkpoint_interval wall seconds, whenever a venue
+    moves into a new hour, and once more on exit.
+
+    Returns:
+        LatencyTracker with per-event latencies (pass one in to keep the
+        samples when the run is cancelled)
+    """
+    latency = latency if latency is not None else LatencyTracker()
+    alerts_file = None
+    if alerts_path:
+        os.makedirs(os.path.dirname(alerts_path) or '.', exist_ok=True)
+        alerts_file = open(alerts_path, 'a')
+
+    last_checkpoint = time.monotonic()
+    hours_closed = monitor.hours_closed
+    try:
+        async for event in source.events():
+            for alert in monitor.process(event):
+                on_alert(alert)
+                if alerts_file is not None:
+                    alerts_file.write(json.dumps(alert) + '\n')
+                    alerts_file.flush()
+
+            origin = event.get('sent_at', event.get('received_at'))
+            if isinstance(origin, (int, float)) and math.isfinite(origin):
+                latency.record(time.time() - origin)
+
+            if monitor.hours_closed != hours_closed or time.monotonic() - last_checkpoint >= checkpoint_interval:
+                write_checkpoint(monitor, checkpoint_path)
+                hours_closed = monitor.hours_closed
+                last_checkpoint = time.monotonic()
+    finally:
+        write_checkpoint(monitor, checkpoint_path)
+        if alerts_file is not None:
+            alerts_file.close()
+
+    return latency
+
+
+def record_run(monitor: PegMonitor, source: EventSource, latency: LatencyTracker) -> None:
+    """Add the run's counters to the instrumentation recorder."""
+    with stage('monitor'):
+        for name, n in monitor.counters.items():
+            count(name, n)
+        count('malformed', source.malformed)
+        count('hours_closed', monitor.hours_closed)
+        count('latency_samples', latency.total)
+
+
+def assert_rejects_bad_events():
+    """
+    Self-check that malformed events are counted as rejected instead of
+    stopping the monitor.
+    """
+    import tempfile
+
+    good = {'venue': 'bybit', 'timestamp': 1751328000, 'price': 0.9985, 'volume': 100.0}
+    bad = [
+        {**good, 'venue': ['x']},
+        {**good, 'venue': {'bybit': 1}},
+        {**good, 'venue': 'kraken'},
+        {**good, 'timestamp': float('nan')},
+        {**good, 'timestamp': 1e300},
+        {**good, 'timestamp': -1},
+        {**good, 'timestamp': [1751328000]},
+        {**good, 'timestamp': '10' * 400},
+        {**good, 'price': float('nan')},
+        {**good, 'price': float('inf')},
+        {**good, 'volume': float('inf')},
+        {**good, 'volume': -5.0},
+        {**good, 'sent_at': float('nan')},  # Valid event, unusable latency origin
+        {key: value for key, value in good.items() if key != 'price'},
+    ]
+    lines = [json.dumps(event) for event in [good, *bad, good]] + ['[1, 2]', 'not json']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        events_path = os.path.join(tmp, 'events.jsonl')
+        with open(events_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        monitor = PegMonitor()
+        source = FileTailSource(events_path, follow=False)
+        latency = asyncio.run(run_monitor(source, monitor, os.path.join(tmp, 'checkpoint.csv'),
+                                          alerts_path=None, on_alert=lambda alert: None))
+
+    assert monitor.counters['events'] == 3, monitor.counters
+    assert monitor.counters['rejected'] == len(bad) - 1, monitor.counters
+    assert source.malformed == 2
+    assert latency.total == len(bad) + 1  # Every parsed event but the NaN sent_at
+    assert monitor.snapshot()['bybit']['hour_volume'] == 300.0
+
+    print("Peg monitor event validation tests passed!")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the live peg monitor."""
+    parser = argparse.ArgumentParser(description='Real-time USDC peg monitor')
+    parser.add_argument('--source', choices=['file', 'socket'], default='file', help='Event source')
+    parser.add_argument('--path', default=EVENTS_PATH, help='JSON-lines file to tail (file source)')
+    parser.add_argument('--no-follow', action='store_true', help='Stop at end of file instead of tailing')
+    parser.add_argument('--host', default=SOCKET_HOST, help='Listen address (socket source)')
+    parser.add_argument('--port', type=int, default=SOCKET_PORT, help='Listen port (socket source)')
+    parser.add_argument('--window', type=float, default=WINDOW_SECONDS, help='Rolling window in seconds')
+    parser.add_argument('--deviation-bps', type=float, default=DEVIATION_ALERT_BPS,
+                        help='Deviation alert threshold in bps')
+    parser.add_argument('--volume-alert', type=float, default=VOLUME_ALERT,
+                        help='Rolling outside-band volume alert threshold')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='Hourly checkpoint CSV')
+    parser.add_argument('--alerts', default=ALERTS_PATH, help='Alert log (JSON lines)')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Check that malformed events are rejected, then exit')
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        assert_rejects_bad_events()
+        return
+
+    if args.source == 'file':
+        source = FileTailSource(args.path, follow=not args.no_follow)
+    else:
+        source = SocketSource(args.host, args.port)
+    monitor = PegMonitor(args.window, args.deviation_bps, args.volume_alert)
+
+    print("Starting USDC peg monitor...")
+    latency = LatencyTracker()
+    try:
+        asyncio.run(run_monitor(source, monitor, args.checkpoint, args.alerts, latency=latency))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+    print(f"\nProcessed {monitor.counters['events']} events "
+          f"({monitor.counters['outside_band']} outside band, {monitor.counters['rejected']} rejected, "
+          f"{source.malformed} malformed)")
+    print(f"Alerts: {monitor.counters['alerts']}")
+    print(f"Checkpoint saved to: {args.checkpoint}")
+
+    print("\nLatency (event origin -> processed):")
+    for name, value in latency.summary().items():
+        print(f"  {name}: {value:,.3f}" if isinstance(value, float) else f"  {name}: {value}")
+
+    print("\nCurrent state:")
+    for venue, stats in monitor.snapshot().items():
+        print(f"  {venue}: hour {stats['hour']} volume {stats['hour_volume']:,.2f}, "
+              f"window volume {stats['window_volume']:,.2f} ({stats['window_trades']} trades)")
+
+    record_run(monitor, source, latency)
+    report_path = os.path.join(create_temp_dir(), 'monitor_run_report.json')
+    get_recorder().write_report(report_path)
+    print_report(get_recorder().report())
+    print(f"Run report saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+Pipeline runner for the USDC peg deviation analysis.
+
+Models the workflow as a DAG of stages:
+
+    fetch -> decode -> classify -> aggregate   (one branch per venue)
+                                       \\-> merge -> export
+
+Independent stages (the two venue branches) run in parallel. Every stage
+output is stored as an artifact addressed by a hash of the stage name,
+version, parameters and the content hashes of its inputs, so a stage whose
+inputs and parameters are unchanged is skipped and its artifact reused.
+Side outputs a stage declares (e.g. quarantined rows) are written next to
+its artifact under the same key, so they are reused and invalidated with it.
+
+Usage:
+    python -m src.task2_usdc_peg run [--workers N] [--force]
+    python -m src.task2_usdc_peg self-check
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from utils import (
+    BAND_LOWER, BAND_UPPER, aggregate_hourly_data, create_temp_dir,
+    outside_band_mask, save_to_csv
+)
+from instrumentation import (
+    count, enable_profiling, get_recorder, print_report, profile, stage as instrument
+)
+from validation import save_quarantine
+from trade_store import SortedTradeStore
+
+# Configuration
+ARTIFACT_DIR = os.path.join('temp', 'pipeline')
+OUTPUT_PATH = 'outputs/usdc_peg_outside_band_hourly.csv'
+DEFAULT_WORKERS = 4
+
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    Args:
+        name: Unique stage name
+        func: Callable(params, *input_artifacts) -> artifact
+        deps: Names of stages whose artifacts are passed to func, in order
+        params: JSON-serializable parameters hashed into the artifact key
+        version: Bump to invalidate artifacts after changing func
+        cache: Set False for stages with side effects that must always run
+        outputs: Names of side-output files the stage writes; their keyed
+            paths are passed to func as params['output_paths'][name]
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], deps: Sequence[str] = (),
+                 params: Optional[Dict[str, Any]] = None, version: str = '1',
+                 cache: bool = True, outputs: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.version = version
+        self.cache = cache
+        self.outputs = list(outputs)
+
+    def key(self, input_hashes: List[str]) -> str:
+        """Artifact key from stage identity, parameters and input content hashes."""
+        identity = json.dumps({
+            'name': self.name,
+            'version': self.version,
+            'params': self.params,
+            'inputs': input_hashes
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def file_hash(filepath: str) -> str:
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(obj: Any, base_path: str) -> str:
+    """Save a DataFrame as Parquet or anything else as gzipped JSON; returns the path."""
+    if isinstance(obj, pd.DataFrame):
+        filepath = f'{base_path}.parquet'
+        obj.to_parquet(filepath, index=False)
+    else:
+        filepath = f'{base_path}.json.gz'
+        # mtime=0 keeps the gzip bytes (and so the content hash) deterministic
+        with open(filepath, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(json.dumps(obj, sort_keys=True).encode('utf-8'))
+    return filepath
+
+
+def load_artifact(filepath: str) -> Any:
+    """Load an artifact written by save_artifact."""
+    if filepath.endswith('.parquet'):
+        return pd.read_parquet(filepath)
+    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_pipeline(stages: List[Stage], artifact_dir: str = ARTIFACT_DIR,
+                 workers: int = DEFAULT_WORKERS, force: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Run stages in dependency order, in parallel where possible.
+
+    Args:
+        stages: Pipeline stages (any order)
+        artifact_dir: Directory for artifacts and their metadata
+        workers: Maximum stages running at once
+        force: Rebuild every stage even when a matching artifact exists
+
+    Returns:
+        Stage name -> metadata (key, path, outputs, content_hash, status, seconds)
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+    os.makedirs(artifact_dir, exist_ok=True)
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = dict(by_name)
+    running = {}
+
+    def execute(stage: Stage) -> Dict[str, Any]:
+        started = time.perf_counter()
+        input_meta = [results[dep] for dep in stage.deps]
+        key = stage.key([meta['content_hash'] for meta in input_meta])
+        base_path = os.path.join(artifact_dir, f'{stage.name}-{key[:16]}')
+        meta_path = f'{base_path}.meta.json'
+        output_paths = {name: f'{base_path}.{name}.parquet' for name in stage.outputs}
+
+        if stage.cache and not force and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if all(os.path.exists(p) for p in [meta['path'], *meta.get('outputs', {}).values()]):
+                meta.update(status='cached', seconds=time.perf_counter() - started)
+                count('cache_hits', stage=f'pipeline.{stage.name}')
+                return meta
+
+        # Output paths are derived from the key, so they stay out of the hashed params
+        params = {**stage.params, 'output_paths': output_paths} if output_paths else stage.params
+        with instrument(f'pipeline.{stage.name}'):
+            inputs = [load_artifact(meta['path']) for meta in input_meta]
+            with profile(stage.name):
+                artifact = stage.func(params, *inputs)
+            path = save_artifact(artifact, base_path)
+            if isinstance(artifact, (pd.DataFrame, list)):
+                count('rows_out', len(artifact))
+
+        meta = {'stage': stage.name, 'key': key, 'path': path, 'outputs': output_paths,
+                'content_hash': file_hash(path),
+                'built_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        meta.update(status='built', seconds=time.perf_counter() - started)
+        return meta
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            ready = [s for s in pending.values() if all(dep in results for dep in s.deps)]
+            for stage in ready:
+                del pending[stage.name]
+                running[executor.submit(execute, stage)] = stage.name
+
+            if not running:
+                raise ValueError(f"Dependency cycle among stages: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                print(f"[{results[name]['status']:>6}] {name} ({results[name]['seconds']:.2f}s)")
+
+    return results
+
+
+# Stage functions
+
+def fetch_uniswap_stage(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from fetch_uniswap_v3 import fetch_raw_swaps
+    failures = {}
+    swaps = fetch_raw_swaps(params['pool'], params['start_ts'], params['end_ts'], failures)
+    if failures:
+        # A short list would otherwise be cached as the complete fetch
+        raise RuntimeError(f"{len(failures)} Uniswap days failed: {', '.join(sorted(failures))}")
+    return swaps
+
+
+def fetch_bybit_stage(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from fetch_bybit import fetch_raw_trades_by_hour
+    failures = {}
+    trades = fetch_raw_trades_by_hour(params['start_ts'], params['end_ts'], failures)
+    if failures:
+        raise RuntimeError(f"{len(failures)} Bybit hours failed: {', '.join(sorted(failures))}")
+    return trades
+
+
+def decode_uniswap_stage(params: Dict[str, Any], raw: List[Dict[str, Any]]) -> pd.DataFrame:
+    from fetch_uniswap_v3 import process_swap_data
+    quarantine = []
+    df = process_swap_data(raw, params['start_ts'], params['end_ts'], quarantine)
+    save_quarantine(quarantine, params['output_paths']['quarantine'])
+    return SortedTradeStore('uniswap', df).to_frame()
+
+
+def decode_bybit_stage(params: Dict[str, Any], raw: List[Dict[str, Any]]) -> pd.DataFrame:
+    from fetch_bybit import process_trade_data
+    quarantine = []
+    df = process_trade_data(raw, params['start_ts'], params['end_ts'], quarantine)
+    save_quarantine(quarantine, params['output_paths']['quarantine'])
+    return SortedTradeStore('bybit', df).to_frame()
+
+
+def logs_uniswap_stage(params: Dict[str, Any]) -> pd.DataFrame:
+    """Fetch and decode Uniswap Swap event logs over JSON-RPC in one step."""
+    from fetch_uniswap_logs import fetch_swap_logs
+    quarantine = []
+    df = fetch_swap_logs(params['start_ts'], params['end_ts'], params['rpc_url'], params['pool'],
+                         quarantine=quarantine)
+    save_quarantine(quarantine, params['output_paths']['quarantine'])
+    return df
+
+
+def archive_bybit_stage(params: Dict[str, Any]) -> pd.DataFrame:
+    """Download, decode and validate Bybit daily archives in one streaming step."""
+    from fetch_bybit_archive import fetch_archive_trades
+    quarantine = []
+    failures = {}
+    df = fetch_archive_trades(params['start_ts'], params['end_ts'], params['base_url'],
+                              params['symbol'], params['workers'], quarantine=quarantine,
+                              failures=failures)
+    if failures:
+        # Every day was attempted; fail the stage so a partial artifact is never cached
+        raise RuntimeError(f"{len(failures)} Bybit archives failed: {', '.join(sorted(failures))}")
+    save_quarantine(quarantine, params['output_paths']['quarantine'])
+    return df
+
+
+def classify_stage(params: Dict[str, Any], df: pd.DataFrame) -> pd.DataFrame:
+    """Keep outside-band trades only."""
+    if df.empty:
+        return df
+    return df[outside_band_mask(df['price'].to_numpy())].reset_index(drop=True)
+
+
+def aggregate_stage(params: Dict[str, Any], outside_df: pd.DataFrame) -> pd.DataFrame:
+    return aggregate_hourly_data(outside_df.copy(), params['venue'])
+
+
+def merge_stage(params: Dict[str, Any], uniswap_agg: pd.DataFrame,
+                bybit_agg: pd.DataFrame) -> pd.DataFrame:
+    from aggregate_outside_band import merge_and_fill_data
+    return merge_and_fill_data(uniswap_agg, bybit_agg)
+
+
+def export_stage(params: Dict[str, Any], final_df: pd.DataFrame) -> pd.DataFrame:
+    from aggregate_outside_band import validate_output_data, generate_summary_stats
+
+    if not validate_output_data(final_df):
+        raise ValueError("Output validation failed")
+
+    generate_summary_stats(final_df)
+    os.makedirs(os.path.dirname(params['output_path']), exist_ok=True)
+    save_to_csv(final_df, params['output_path'])
+    print(f"\nOutput saved to: {params['output_path']}")
+    return final_df
+
+
+def build_peg_pipeline(start_ts: int, end_ts: int, output_path: str = OUTPUT_PATH,
+                       bybit_source: str = 'rest',
+                       archive_url: Optional[str] = None, uniswap_source: str = 'subgraph',
+                       rpc_url: Optional[str] = None) -> List[Stage]:
+    """
+    Build the stage list for the peg deviation analysis.
+
+    Args:
+        start_ts: Start timestamp in seconds
+        end_ts: End timestamp in seconds
+        output_path: Where the export stage writes the hourly CSV
+        bybit_source: 'rest' (hourly API calls) or 'archive' (daily CSV archives)
+        archive_url: Archive root when bybit_source is 'archive' (None for Bybit's)
+        uniswap_source: 'subgraph' (The Graph) or 'logs' (eth_getLogs over JSON-RPC)
+        rpc_url: JSON-RPC endpoint when uniswap_source is 'logs' (None for ETH_RPC_URL)
+
+    Returns:
+        List of stages
+    """
+    from fetch_uniswap_v3 import POOL_ADDRESS
+    from fetch_bybit import SYMBOL
+
+    window = {'start_ts': start_ts, 'end_ts': end_ts}
+    band = {'band_lower': str(BAND_LOWER), 'band_upper': str(BAND_UPPER)}
+
+    stages = []
+    if uniswap_source == 'logs':
+        from fetch_uniswap_logs import RPC_URL
+        stages.append(Stage('decode_uniswap', logs_uniswap_stage, params={
+            **window, 'pool': POOL_ADDRESS, 'rpc_url': rpc_url or RPC_URL}, outputs=['quarantine']))
+    elif uniswap_source == 'subgraph':
+        stages.append(Stage('fetch_uniswap', fetch_uniswap_stage, params={**window, 'pool': POOL_ADDRESS}))
+        stages.append(Stage('decode_uniswap', decode_uniswap_stage, ['fetch_uniswap'], params=window,
+                            outputs=['quarantine']))
+    else:
+        raise ValueError(f"Unknown Uniswap source: {uniswap_source}")
+
+    if bybit_source == 'archive':
+        from fetch_bybit_archive import ARCHIVE_BASE_URL, DOWNLOAD_WORKERS
+        # Archives stream straight into the decoder, so there is no raw fetch artifact
+        stages.append(Stage('decode_bybit', archive_bybit_stage, params={
+            **window, 'symbol': SYMBOL, 'base_url': archive_url or ARCHIVE_BASE_URL,
+            'workers': DOWNLOAD_WORKERS}, outputs=['quarantine']))
+    elif bybit_source == 'rest':
+        stages.append(Stage('fetch_bybit', fetch_bybit_stage, params={**window, 'symbol': SYMBOL}))
+        stages.append(Stage('decode_bybit', decode_bybit_stage, ['fetch_bybit'], params=window,
+                            outputs=['quarantine']))
+    else:
+        raise ValueError(f"Unknown Bybit source: {bybit_source}")
+
+    for venue in ['uniswap', 'bybit']:
+        stages.append(Stage(f'classify_{venue}', classify_stage, [f'decode_{venue}'], params=band))
+        stages.append(Stage(f'aggregate_{venue}', aggregate_stage, [f'classify_{venue}'],
+                            params={'venue': venue}))
+
+    stages.append(Stage('merge', merge_stage, ['aggregate_uniswap', 'aggregate_bybit']))
+    stages.append(Stage('export', export_stage, ['merge'],
+                        params={'output_path': output_path}, cache=False))
+    return stages
+
+
+def assert_failed_fetch_not_cached():
+    """
+    Self-check that a REST fetch with a failed window leaves no artifact.
+
+    Serves Bybit's recent-trade endpoint from a local http.server stand-in
+    that fails one hour, then recovers.
+    """
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    import fetch_bybit
+    import http_client
+
+    start_ts = int(datetime(2025, 7, 1, tzinfo=timezone.utc).timestamp())
+    failing = {start_ts + 3600}
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            window_start = int(parse_qs(urlparse(self.path).query)['startTime'][0]) // 1000
+            if window_start in failing:
+                payload = {'retCode': 10006, 'retMsg': 'Too many visits!'}
+            else:
+                payload = {'retCode': 0, 'result': {'list': [
+                    {'execId': f'{window_start}-{i}', 'symbol': 'USDCUSDT', 'price': '0.9985',
+                     'size': '100', 'side': 'Buy', 'time': str((window_start + i) * 1000)}
+                    for i in range(3)]}}
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved = fetch_bybit.BYBIT_BASE_URL, http_client._default_client
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            fetch_bybit.BYBIT_BASE_URL = f'http://127.0.0.1:{server.server_address[1]}'
+            http_client._default_client = http_client.HttpClient(
+                cache_dir=os.path.join(tmp, 'http_cache'), max_retries=0)
+            artifact_dir = os.path.join(tmp, 'artifacts')
+            stages = [Stage('fetch_bybit', fetch_bybit_stage,
+                            params={'start_ts': start_ts, 'end_ts': start_ts + 3 * 3600})]
+
+            try:
+                run_pipeline(stages, artifact_dir, workers=1)
+                raise AssertionError("Failed hour did not fail the stage")
+            except RuntimeError:
+                pass
+            assert os.listdir(artifact_dir) == [], os.listdir(artifact_dir)
+
+            # Once the window recovers the stage builds, then is reused
+            failing.clear()
+            assert run_pipeline(stages, artifact_dir, workers=1)['fetch_bybit']['status'] == 'built'
+            meta = run_pipeline(stages, artifact_dir, workers=1)['fetch_bybit']
+            assert meta['status'] == 'cached' and len(load_artifact(meta['path'])) == 9
+    finally:
+        fetch_bybit.BYBIT_BASE_URL, http_client._default_client = saved
+        server.shutdown()
+        server.server_close()
+
+    print("Pipeline failure tests passed!")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point."""
+    from fetch_bybit import START_TIMESTAMP, END_TIMESTAMP
+
+    parser = argparse.ArgumentParser(prog='python -m src.task2_usdc_peg',
+                                     description='USDC peg deviation pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the full pipeline')
+    run_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help='Maximum stages running in parallel')
+    run_parser.add_argument('--force', action='store_true',
+                            help='Rebuild all stages, ignoring cached artifacts')
+    run_parser.add_argument('--artifact-dir', default=ARTIFACT_DIR,
+                            help='Directory for stage artifacts')
+    run_parser.add_argument('--output', default=OUTPUT_PATH,
+                            help='Path of the hourly CSV')
+    run_parser.add_argument('--bybit-source', choices=['rest', 'archive'], default='rest',
+                            help='Fetch Bybit trades from the REST API or the daily archives')
+    run_parser.add_argument('--archive-url', help='Bybit archive root (e.g. a local mirror)')
+    run_parser.add_argument('--uniswap-source', choices=['subgraph', 'logs'], default='subgraph',
+                            help='Fetch Uniswap swaps from The Graph or from eth_getLogs')
+    run_parser.add_argument('--rpc-url', help='Ethereum JSON-RPC endpoint (default: $ETH_RPC_URL)')
+    run_parser.add_argument('--profile', metavar='DIR',
+                            help='Dump cProfile/pyinstrument profiles of each built stage into DIR')
+
+    subparsers.add_parser('self-check', help='Check that failed fetches are not cached, then exit')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'self-check':
+        assert_failed_fetch_not_cached()
+    elif args.command == 'run':
+        from http_client import get_default_client
+
+        create_temp_dir()
+        if args.profile:
+            enable_profiling(args.profile)
+
+        stages = build_peg_pipeline(START_TIMESTAMP, END_TIMESTAMP, args.output, args.bybit_source,
+                                    args.archive_url, args.uniswap_source, args.rpc_url)
+        results = run_pipeline(stages, args.artifact_dir, args.workers, args.force)
+
+        built = sum(1 for meta in results.values() if meta['status'] == 'built')
+        print(f"\nPipeline finished: {built} built, {len(results) - built} cached")
+
+        report_path = os.path.join(args.artifact_dir, 'run_report.json')
+        get_recorder().write_report(report_path, extra={
+            'http': dict(get_default_client().stats),
+            'artifacts': {name: {k: meta[k] for k in ('status', 'seconds', 'path')}
+                          for name, meta in results.items()}
+        })
+        print_report(get_recorder().report())
+        print(f"Run report saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Volume-at-price histograms for USDC peg deviation analysis.
+
+Builds fixed-bin volume and trade-count histograms per venue and per hour
+from raw trades. Profiles built over different shards or hours can be
+merged by adding bin arrays, so questions like "volume below 0.998 on
+Bybit last week" become a sum over stored bins instead of a rescan of
+the raw trade data.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import BAND_LOWER, BAND_UPPER, create_temp_dir
+
+# Configuration
+BIN_LOWER = 0.99
+BIN_UPPER = 1.01
+BIN_WIDTH = 0.00001  # 0.1 bp
+SECONDS_PER_HOUR = 3600
+
+
+def build_bin_edges(lower: float = BIN_LOWER, upper: float = BIN_UPPER,
+                    width: float = BIN_WIDTH) -> np.ndarray:
+    """
+    Build fixed-width price bin edges.
+
+    Args:
+        lower: Lowest bin edge
+        upper: Highest bin edge
+        width: Bin width in price units
+
+    Returns:
+        Sorted array of bin edges (rounded to avoid float drift). When the
+        band's upper bound is in range, an extra edge just above it gives a
+        price exactly at the bound a bin of its own, so the strictly-above
+        volume can be read without splitting a bin.
+    """
+    if width <= 0 or upper <= lower:
+        raise ValueError("Bin width must be positive and upper must exceed lower")
+
+    n_bins = int(round((upper - lower) / width))
+    edges = np.round(lower + width * np.arange(n_bins + 1), 10)
+    band_upper = float(BAND_UPPER)
+    if lower <= band_upper < upper:
+        edges = np.union1d(edges, [np.nextafter(band_upper, np.inf)])
+    return edges
+
+
+class VolumeProfile:
+    """
+    Hour x price-bin volume and trade-count histogram for one venue.
+
+    Bin 0 collects prices below the first edge and the last bin collects
+    prices at or above the final edge, so no volume is ever dropped.
+    """
+
+    def __init__(self, venue: str, edges: np.ndarray,
+                 hours: Optional[np.ndarray] = None,
+                 volume: Optional[np.ndarray] = None,
+                 counts: Optional[np.ndarray] = None):
+        self.venue = venue
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_bins = len(self.edges) + 1
+
+        self.hours = (np.asarray(hours, dtype=np.int64) if hours is not None
+                      else np.empty(0, dtype=np.int64))
+        self.volume = (np.asarray(volume, dtype=np.float64) if volume is not None
+                       else np.zeros((len(self.hours), n_bins)))
+        self.counts = (np.asarray(counts, dtype=np.int64) if counts is not None
+                       else np.zeros((len(self.hours), n_bins), dtype=np.int64))
+
+    @property
+    def n_bins(self) -> int:
+        return len(self.edges) + 1
+
+    @classmethod
+    def from_trades(cls, df: pd.DataFrame, venue: str,
+                    edges: Optional[np.ndarray] = None) -> 'VolumeProfile':
+        """
+        Build a profile from raw trades with bincount accumulation.
+
+        Args:
+            df: Raw trades with 'timestamp' (seconds), 'price' and 'volume'
+            venue: Venue name
+            edges: Bin edges (defaults to build_bin_edges())
+
+        Returns:
+            VolumeProfile covering every hour present in df
+        """
+        if edges is None:
+            edges = build_bin_edges()
+
+        profile = cls(venue, edges)
+        if df.empty:
+            return profile
+
+        timestamps = df['timestamp'].to_numpy(dtype=np.int64)
+        prices = df['price'].to_numpy(dtype=np.float64)
+        volumes = df['volume'].to_numpy(dtype=np.float64)
+
+        hour_starts = timestamps - timestamps % SECONDS_PER_HOUR
+        hours, hour_idx = np.unique(hour_starts, return_inverse=True)
+        bin_idx = np.searchsorted(profile.edges, prices, side='right')
+
+        flat_idx = hour_idx * profile.n_bins + bin_idx
+        size = len(hours) * profile.n_bins
+
+        profile.hours = hours
+        profile.volume = np.bincount(flat_idx, weights=volumes, minlength=size).reshape(len(hours), -1)
+        profile.counts = np.bincount(flat_idx, minlength=size).reshape(len(hours), -1)
+        return profile
+
+    def merge(self, other: 'VolumeProfile') -> 'VolumeProfile':
+        """
+        Combine two profiles built with the same bin edges.
+
+        Hours present in both are summed; hours present in only one are kept.
+        """
+        if self.venue != other.venue:
+            raise ValueError(f"Cannot merge profiles for {self.venue} and {other.venue}")
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge profiles with different bin edges")
+
+        hours = np.union1d(self.hours, other.hours)
+        volume = np.zeros((len(hours), self.n_bins))
+        counts = np.zeros((len(hours), self.n_bins), dtype=np.int64)
+
+        for part in (self, other):
+            rows = np.searchsorted(hours, part.hours)
+            volume[rows] += part.volume
+            counts[rows] += part.counts
+
+        return VolumeProfile(self.venue, self.edges, hours, volume, counts)
+
+    def _hour_mask(self, start_ts: Optional[int], end_ts: Optional[int]) -> np.ndarray:
+        mask = np.ones(len(self.hours), dtype=bool)
+        if start_ts is not None:
+            mask &= self.hours >= start_ts - start_ts % SECONDS_PER_HOUR
+        if end_ts is not None:
+            mask &= self.hours < end_ts
+        return mask
+
+    def _bin_slice(self, lower: Optional[float], upper: Optional[float],
+                   lower_exclusive: bool = False) -> slice:
+        # Bin i (1..len(edges)-1) covers [edges[i-1], edges[i]); thresholds
+        # snap to the nearest edge so sums never split a bin. An exclusive
+        # lower bound starts one bin later, skipping the bin that opens at it,
+        # which is only exact when that bin holds the bound's price alone.
+        first = 0
+        if lower is not None:
+            i = int(np.searchsorted(self.edges, lower - 1e-12, side='left'))
+            if lower_exclusive:
+                one_price_bin = (i + 1 < len(self.edges) and abs(self.edges[i] - lower) <= 1e-12
+                                 and self.edges[i + 1] == np.nextafter(self.edges[i], np.inf))
+                if not one_price_bin:
+                    raise ValueError(f"Exclusive lower bound {lower} has no one-price bin; "
+                                     f"only the band's upper bound ({BAND_UPPER}) does")
+            first = i + 1 + int(lower_exclusive)
+        last = self.n_bins if upper is None else int(np.searchsorted(self.edges, upper - 1e-12, side='left')) + 1
+        return slice(first, last)
+
+    def volume_between(self, lower: Optional[float] = None, upper: Optional[float] = None,
+                       start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       lower_exclusive: bool = False) -> float:
+        """
+        Total volume traded at prices in [lower, upper) within [start_ts, end_ts).
+
+        Args:
+            lower: Lower price bound (None for no bound)
+            upper: Upper price bound (None for no bound)
+            start_ts: Start timestamp in seconds (None for no bound)
+            end_ts: End timestamp in seconds (None for no bound)
+            lower_exclusive: Exclude prices equal to lower, i.e. (lower, upper).
+                Only allowed at a bound with a one-price bin (the band's upper
+                bound); raises ValueError elsewhere rather than drop a bin.
+
+        Returns:
+            Volume in USDC
+        """
+        rows = self._hour_mask(start_ts, end_ts)
+        return float(self.volume[rows, self._bin_slice(lower, upper, lower_exclusive)].sum())
+
+    def count_between(self, lower: Optional[float] = None, upper: Optional[float] = None,
+                      start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                      lower_exclusive: bool = False) -> int:
+        """Number of trades at prices in [lower, upper) within [start_ts, end_ts)."""
+        rows = self._hour_mask(start_ts, end_ts)
+        return int(self.counts[rows, self._bin_slice(lower, upper, lower_exclusive)].sum())
+
+    def price_histogram(self, start_ts: Optional[int] = None,
+                        end_ts: Optional[int] = None) -> pd.DataFrame:
+        """
+        Collapse hours into a single volume-at-price histogram.
+
+        Returns:
+            DataFrame with bin bounds, deviation from 1.0 in bps, volume and trades
+        """
+        rows = self._hour_mask(start_ts, end_ts)
+        lower = np.concatenate([[-np.inf], self.edges])
+        upper = np.concatenate([self.edges, [np.inf]])
+        mid = np.where(np.isfinite(lower) & np.isfinite(upper), (lower + upper) / 2,
+                       np.where(np.isfinite(lower), lower, upper))
+
+        return pd.DataFrame({
+            'price_lower': lower,
+            'price_upper': upper,
+            'deviation_bps': (mid - 1.0) * 10000,
+            'volume': self.volume[rows].sum(axis=0),
+            'trades': self.counts[rows].sum(axis=0)
+        })
+
+    def save(self, filepath: str) -> None:
+        """Save profile to a compressed .npz file."""
+        np.savez_compressed(filepath, venue=self.venue, edges=self.edges,
+                            hours=self.hours, volume=self.volume, counts=self.counts)
+
+    @classmethod
+    def load(cls, filepath: str) -> 'VolumeProfile':
+        """Load profile saved with save()."""
+        with np.load(filepath) as data:
+            return cls(str(data['venue']), data['edges'], data['hours'],
+                       data['volume'], data['counts'])
+
+
+def merge_profiles(profiles: Dict[str, VolumeProfile],
+                   others: Dict[str, VolumeProfile]) -> Dict[str, VolumeProfile]:
+    """
+    Merge two per-venue profile dicts (e.g. from different shards).
+
+    Args:
+        profiles: Venue -> profile
+        others: Venue -> profile
+
+    Returns:
+        New venue -> merged profile dict
+    """
+    merged = dict(profiles)
+    for venue, profile in others.items():
+        merged[venue] = merged[venue].merge(profile) if venue in merged else profile
+    return merged
+
+
+def main():
+    """Build volume profiles from raw venue data and print a band summary."""
+    from aggregate_outside_band import load_venue_data
+
+    temp_dir = create_temp_dir()
+    edges = build_bin_edges()
+
+    for venue in ['uniswap', 'bybit']:
+        df = load_venue_data(venue)
+        profile = VolumeProfile.from_trades(df, venue, edges)
+
+        output_path = os.path.join(temp_dir, f'{venue}_volume_profile.npz')
+        profile.save(output_path)
+        print(f"{venue}: {len(profile.hours)} hours profiled, saved to {output_path}")
+
+        if len(profile.hours) == 0:
+            continue
+
+        # Strictly outside the band, as in utils.is_outside_band
+        below = profile.volume_between(upper=float(BAND_LOWER))
+        above = profile.volume_between(lower=float(BAND_UPPER), lower_exclusive=True)
+        total = profile.volume_between()
+        print(f"  Volume below {BAND_LOWER}: {below:,.2f} USDC")
+        print(f"  Volume above {BAND_UPPER}: {above:,.2f} USDC")
+        print(f"  Total volume: {total:,.2f} USDC")
+
+        first_hour = datetime.fromtimestamp(int(profile.hours[0]), tz=timezone.utc)
+        last_hour = datetime.fromtimestamp(int(profile.hours[-1]), tz=timezone.utc)
+        print(f"  Hours covered: {first_hour} to {last_hour}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Mergeable quantile sketches per venue and time bucket.
+
+The hourly table keeps volume, min and max, and min/max are set by single
+outlier prints. This module keeps a t-digest per venue and bucket for a
+trade column (execution price or trade size). Quantiles such as p1/p50/p99
+can then be read for any hour or day without the raw ticks.
+
+A digest is a sorted list of weighted centroids. Centroids near the tails
+are kept small and those near the median large, using the k1 scale
+function k(q) = compression / (2 pi) * asin(2q - 1). Compression is
+vectorized: points and centroids are sorted together, and each is assigned
+to cluster floor(k) of its cumulative-weight midpoint. Adding a shard's
+centroids and compressing again merges digests, so sketches built over
+different shards combine, and hourly sketches roll up into days.
+
+Price sketches are volume-weighted by default, so a one-lot print at an
+outlier price barely moves p1/p99. Size sketches weight every trade equally.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import BAND_CENTER, create_temp_dir
+
+# Configuration
+COMPRESSION = 200
+BUFFER_FACTOR = 5  # Buffered points (x compression) before an automatic compress
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+QUANTILES = [0.01, 0.5, 0.99]
+VENUES = ['uniswap', 'bybit']
+
+
+class TDigest:
+    """
+    Weighted, mergeable t-digest.
+
+    Args:
+        compression: Scale-function parameter; the digest keeps about
+            compression / 2 centroids
+    """
+
+    def __init__(self, compression: float = COMPRESSION):
+        if compression <= 0:
+            raise ValueError("Compression must be positive")
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+        self.count = 0
+        self._buffer_means: List[np.ndarray] = []
+        self._buffer_weights: List[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def total_weight(self) -> float:
+        self._flush()
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> 'TDigest':
+        """
+        Add values (optionally weighted). NaNs and non-positive weights are ignored.
+
+        Returns:
+            self, for chaining
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        weights = (np.ones(len(values)) if weights is None
+                   else np.atleast_1d(np.asarray(weights, dtype=np.float64)))
+        keep = np.isfinite(values) & np.isfinite(weights) & (weights > 0)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return self
+
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.count += len(values)
+        self._buffer_means.append(values)
+        self._buffer_weights.append(weights)
+        self._buffered += len(values)
+        if self._buffered > BUFFER_FACTOR * self.compression:
+            self._flush()
+        return self
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        """Combine two digests into a new one (inputs are not modified)."""
+        result = TDigest(max(self.compression, other.compression))
+        for part in (self, other):
+            part._flush()
+            if len(part.means):
+                result._buffer_means.append(part.means)
+                result._buffer_weights.append(part.weights)
+                result._buffered += len(part.means)
+            result.min = min(result.min, part.min)
+            result.max = max(result.max, part.max)
+            result.count += part.count
+        result._flush()
+        return result
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+        means = np.concatenate([self.means, *self._buffer_means])
+        weights = np.concatenate([self.weights, *self._buffer_weights])
+        self._buffer_means, self._buffer_weights, self._buffered = [], [], 0
+        self.means, self.weights = compress(means, weights, self.compression)
+
+    def quantile(self, q) -> np.ndarray:
+        """
+        Estimate quantiles (weighted by the update weights).
+
+        Interpolates linearly between centroid centres, anchored at the
+        exact min and max. Returns NaN for an empty digest.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        self._flush()
+        if not len(self.means):
+            return np.full(q.shape, np.nan)
+
+        positions, values = self._knots()
+        return np.interp(np.clip(q, 0, 1) * positions[-1], positions, values)
+
+    def cdf(self, x) -> np.ndarray:
+        """Estimate the weighted fraction of values at or below x."""
+        x = np.asarray(x, dtype=np.float64)
+        self._flush()
+        if not len(self.means):
+            return np.full(x.shape, np.nan)
+
+        positions, values = self._knots()
+        return np.interp(x, values, positions, left=0.0, right=positions[-1]) / positions[-1]
+
+    def _knots(self):
+        # Cumulative weight at each centroid centre, plus the exact extremes
+        cumulative = np.cumsum(self.weights)
+        centres = cumulative - self.weights / 2
+        positions = np.concatenate([[0.0], centres, [cumulative[-1]]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return positions, values
+
+
+def compress(means: np.ndarray, weights: np.ndarray, compression: float):
+    """
+    Merge sorted points/centroids into t-digest centroids in one pass.
+
+    Args:
+        means, weights: Centroid means and weights (any order)
+        compression: Scale-function parameter
+
+    Returns:
+        (means, weights) of the compressed centroids, sorted by mean
+    """
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+
+    cumulative = np.cumsum(weights)
+    q = (cumulative - weights / 2) / total
+    k = compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+    cluster = np.floor(k).astype(np.int64)
+
+    # Sorted input gives non-decreasing cluster ids, so clusters are runs
+    starts = np.flatnonzero(np.concatenate([[True], cluster[1:] != cluster[:-1]]))
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class BucketSketches:
+    """
+    One t-digest per time bucket for a single venue and metric.
+
+    Args:
+        venue: Venue name
+        metric: Sketched column (e.g. 'price' or 'volume')
+        bucket_seconds: Bucket length (3600 for hourly)
+        compression: t-digest compression
+    """
+
+    def __init__(self, venue: str, metric: str, bucket_seconds: int = SECONDS_PER_HOUR,
+                 compression: float = COMPRESSION):
+        self.venue = venue
+        self.metric = metric
+        self.bucket_seconds = bucket_seconds
+        self.compression = compression
+        self.digests: Dict[int, TDigest] = {}
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def update(self, timestamps: np.ndarray, values: np.ndarray,
+               weights: Optional[np.ndarray] = None) -> 'BucketSketches':
+        """
+        Add one chunk of a stream. Chunks may arrive in any order.
+
+        Args:
+            timestamps: Unix seconds
+            values: Values to sketch
+            weights: Optional per-value weights
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(timestamps) == 0:
+            return self
+
+        # Group the chunk by bucket once, then hand each bucket its slice
+        buckets = timestamps - timestamps % self.bucket_seconds
+        order = np.argsort(buckets, kind='stable')
+        buckets, values, weights = buckets[order], values[order], weights[order]
+        starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        ends = np.append(starts[1:], len(buckets))
+
+        for start, end in zip(starts, ends):
+            bucket = int(buckets[start])
+            if bucket not in self.digests:
+                self.digests[bucket] = TDigest(self.compression)
+            self.digests[bucket].update(values[start:end], weights[start:end])
+        return self
+
+    def merge(self, other: 'BucketSketches') -> 'BucketSketches':
+        """Combine sketches of the same venue, metric and resolution (e.g. two shards)."""
+        if (self.venue, self.metric, self.bucket_seconds) != (other.venue, other.metric, other.bucket_seconds):
+            raise ValueError(f"Cannot merge {self.venue}/{self.metric}/{self.bucket_seconds}s sketches "
+                             f"with {other.venue}/{other.metric}/{other.bucket_seconds}s")
+
+        result = BucketSketches(self.venue, self.metric, self.bucket_seconds, self.compression)
+        for part in (self, other):
+            for bucket, digest in part.digests.items():
+                result.digests[bucket] = result.digests.get(bucket, TDigest(self.compression)).merge(digest)
+        return result
+
+    def rollup(self, bucket_seconds: int) -> 'BucketSketches':
+        """Merge buckets into a coarser resolution (a multiple of the current one)."""
+        if bucket_seconds % self.bucket_seconds:
+            raise ValueError(f"{bucket_seconds}s is not a multiple of {self.bucket_seconds}s")
+
+        result = BucketSketches(self.venue, self.metric, bucket_seconds, self.compression)
+        for bucket, digest in sorted(self.digests.items()):
+            coarse = bucket - bucket % bucket_seconds
+            result.digests[coarse] = result.digests.get(coarse, TDigest(self.compression)).merge(digest)
+        return result
+
+    def combined(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> TDigest:
+        """One digest over all buckets starting in [start_ts, end_ts)."""
+        result = TDigest(self.compression)
+        for bucket, digest in self.digests.items():
+            if (start_ts is None or bucket >= start_ts) and (end_ts is None or bucket < end_ts):
+                result = result.merge(digest)
+        return result
+
+    def quantile_table(self, quantiles: Sequence[float] = QUANTILES) -> pd.DataFrame:
+        """
+        Quantiles per bucket.
+
+        Returns:
+            DataFrame with 'time' (ISO8601, as in the hourly table), 'trades',
+            'weight', 'min', 'max' and one 'p<q>' column per quantile
+        """
+        rows = []
+        for bucket in sorted(self.digests):
+            digest = self.digests[bucket]
+            row = {'time': datetime.fromtimestamp(bucket, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                   'trades': digest.count, 'weight': digest.total_weight,
+                   'min': digest.min, 'max': digest.max}
+            row.update(zip(quantile_columns(quantiles), digest.quantile(quantiles)))
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['time', 'trades', 'weight', 'min', 'max',
+                                           *quantile_columns(quantiles)])
+
+    def save(self, filepath: str) -> None:
+        """Save all digests to a compressed .npz file."""
+        buckets = np.array(sorted(self.digests), dtype=np.int64)
+        digests = [self.digests[bucket] for bucket in buckets]
+        for digest in digests:
+            digest._flush()
+        sizes = np.array([len(digest.means) for digest in digests], dtype=np.int64)
+        np.savez_compressed(
+            filepath, venue=self.venue, metric=self.metric,
+            bucket_seconds=self.bucket_seconds, compression=self.compression,
+            buckets=buckets, offsets=np.concatenate([[0], np.cumsum(sizes)]),
+            means=np.concatenate([digest.means for digest in digests]) if digests else np.empty(0),
+            weights=np.concatenate([digest.weights for digest in digests]) if digests else np.empty(0),
+            mins=np.array([digest.min for digest in digests]),
+            maxs=np.array([digest.max for digest in digests]),
+            counts=np.array([digest.count for digest in digests], dtype=np.int64))
+
+    @classmethod
+    def load(cls, filepath: str) -> 'BucketSketches':
+        """Load sketches saved with save()."""
+        with np.load(filepath) as data:
+            sketches = cls(str(data['venue']), str(data['metric']),
+                           int(data['bucket_seconds']), float(data['compression']))
+            offsets = data['offsets']
+            for i, bucket in enumerate(data['buckets']):
+                digest = TDigest(sketches.compression)
+                digest.means = data['means'][offsets[i]:offsets[i + 1]]
+                digest.weights = data['weights'][offsets[i]:offsets[i + 1]]
+                digest.min = float(data['mins'][i])
+                digest.max = float(data['maxs'][i])
+                digest.count = int(data['counts'][i])
+                sketches.digests[int(bucket)] = digest
+        return sketches
+
+
+def combine_venues(parts: Iterable[BucketSketches], venue: str = 'all') -> BucketSketches:
+    """
+    Merge sketches of different venues (same metric and resolution) into one.
+
+    Args:
+        parts: Per-venue sketches
+        venue: Venue label of the combined sketches
+
+    Returns:
+        BucketSketches with every bucket of every part merged
+    """
+    parts = list(parts)
+    if not parts:
+        raise ValueError("Nothing to combine")
+    if len({(part.metric, part.bucket_seconds) for part in parts}) > 1:
+        raise ValueError("Can only combine sketches with the same metric and bucket length")
+
+    result = BucketSketches(venue, parts[0].metric, parts[0].bucket_seconds, parts[0].compression)
+    for part in parts:
+        for bucket, digest in part.digests.items():
+            result.digests[bucket] = result.digests.get(bucket, TDigest(result.compression)).merge(digest)
+    return result
+
+
+def quantile_columns(quantiles: Sequence[float]) -> List[str]:
+    """Column names for quantiles, e.g. 0.01 -> 'p1', 0.5 -> 'p50', 0.999 -> 'p99.9'."""
+    return [f"p{q * 100:g}" for q in quantiles]
+
+
+def sketch_trades(chunks: Iterable[pd.DataFrame], venue: str,
+                  bucket_seconds: int = SECONDS_PER_HOUR,
+                  compression: float = COMPRESSION,
+                  size_column: str = 'volume') -> Dict[str, BucketSketches]:
+    """
+    Build price (size-weighted) and trade-size sketches in one streaming pass.
+
+    Args:
+        chunks: Iterable of trade frames with 'timestamp' (seconds), 'price'
+            and the size column
+        venue: Venue name
+        bucket_seconds: Bucket length
+        compression: t-digest compression
+        size_column: Trade-size column ('volume' for the peg tables)
+
+    Returns:
+        {'price': BucketSketches, 'size': BucketSketches}
+    """
+    price = BucketSketches(venue, 'price', bucket_seconds, compression)
+    size = BucketSketches(venue, 'size', bucket_seconds, compression)
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        timestamps = chunk['timestamp'].to_numpy(dtype=np.int64)
+        sizes = chunk[size_column].to_numpy(dtype=np.float64)
+        price.update(timestamps, chunk['price'].to_numpy(dtype=np.float64), sizes)
+        size.update(timestamps, sizes)
+    return {'price': price, 'size': size}
+
+
+def main():
+    """Sketch peg trade prices and sizes per hour and print daily deviation quantiles."""
+    from aggregate_outside_band import load_venue_data
+    from episodes import iter_chunks
+
+    temp_dir = create_temp_dir()
+    center = float(BAND_CENTER)
+
+    for venue in VENUES:
+        df = load_venue_data(venue)
+        if df.empty:
+            continue
+
+        sketches = sketch_trades(iter_chunks(df), venue)
+        for metric, sketch in sketches.items():
+            output_path = os.path.join(temp_dir, f'{venue}_{metric}_sketch.npz')
+            sketch.save(output_path)
+            print(f"{venue} {metric}: {len(sketch)} hourly sketches saved to {output_path}")
+
+        daily = sketches['price'].rollup(SECONDS_PER_DAY).quantile_table()
+        for column in quantile_columns(QUANTILES):
+            daily[f'{column}_bps'] = (daily[column] - center) * 10000
+        print(f"\n{venue} daily volume-weighted price deviation (bps):")
+        print(daily[['time', 'trades'] + [f'{c}_bps' for c in quantile_columns(QUANTILES)]]
+              .head(10).to_string(index=False, float_format='%.2f'))
+
+        overall = sketches['size'].combined()
+        p50, p99 = overall.quantile([0.5, 0.99])
+        print(f"\n{venue} trade size: median {p50:,.2f}, p99 {p99:,.2f} USDC\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Local read-only query service over the hourly outside-band aggregates.
+
+Notebooks and dashboards ask the same questions of
+outputs/usdc_peg_outside_band_hourly.csv again and again: hours where
+both venues traded outside the band, price ranges, daily totals. This
+service loads the table once and answers those queries over HTTP:
+
+    GET /health
+    GET /hours?start=2025-08-01&end=2025-09-01&venue=bybit&resolution=day&active=both
+    GET /stats?start=2025-07-01&stat=total_volume,both_venues_hours
+
+- start, end: ISO8601 dates or times, UTC, end exclusive
+- venue: uniswap, bybit or all (default)
+- resolution: hour (default), day or week (/hours only)
+- active: all (default), any, both, uniswap or bybit - keep only hours
+  with outside-band volume on any, both or the named venue
+- stat: comma-separated subset of STATS (/stats only)
+- format: json (default), csv or arrow (/hours only)
+
+The artifact version is the file's (mtime, size), which is checked on
+every request. A new version reloads the table and empties the LRU
+result cache, so cached answers never outlive the data they were
+computed from. Cache keys are (version, path, normalized parameters).
+Arrow responses are streamed as IPC record batches over chunked
+transfer encoding, so large results never have to be serialized in
+one piece. The server is threaded; each request only holds the store
+lock long enough to check the version.
+
+Usage:
+    python src/task2_usdc_peg/query_service.py [--artifact PATH] [--port 8765]
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Configuration
+ARTIFACT_PATH = 'outputs/usdc_peg_outside_band_hourly.csv'
+HOST = '127.0.0.1'
+PORT = 8765
+CACHE_SIZE = 256  # Cached results (LRU)
+ARROW_BATCH_ROWS = 4096
+VENUES = ['uniswap', 'bybit']
+RESOLUTIONS = {'hour': None, 'day': 'D', 'week': 'W'}
+ACTIVE_FILTERS = ['all', 'any', 'both'] + VENUES
+FORMATS = ['json', 'csv', 'arrow']
+STATS = ['hours', 'both_venues_hours', 'hours_with_volume', 'total_volume',
+         'mean_hourly_volume', 'max_hourly_volume', 'min_price', 'max_price']
+
+QUERY_PARAMS = {
+    '/hours': {'start', 'end', 'venue', 'resolution', 'active', 'format'},
+    '/stats': {'start', 'end', 'venue', 'active', 'stat'}
+}
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class AggregateStore:
+    """
+    The hourly table plus its artifact version, reloaded when the file changes.
+
+    Args:
+        path: Hourly CSV in the aggregate_outside_band.py format
+        cache: Result cache emptied on every reload
+    """
+
+    def __init__(self, path: str, cache: LRUCache):
+        self.path = path
+        self.cache = cache
+        self.version: Optional[Tuple[int, int]] = None
+        self.frame = pd.DataFrame()
+        self._lock = threading.Lock()
+
+    def artifact_version(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> Tuple[Tuple[int, int], pd.DataFrame]:
+        """(version, table), reloading first if the artifact changed."""
+        version = self.artifact_version()
+        with self._lock:
+            if version != self.version:
+                frame = pd.read_csv(self.path)
+                frame['time'] = pd.to_datetime(frame['time'], utc=True)
+                self.frame = frame.sort_values('time', ignore_index=True)
+                self.version = version
+                self.cache.clear()
+                print(f"Loaded {len(frame)} hours from {self.path} (version {version[0]}:{version[1]})")
+            return self.version, self.frame
+
+
+def parse_time(value: Optional[str]) -> Optional[pd.Timestamp]:
+    if not value:
+        return None
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp.tz_convert('UTC')
+
+
+def normalize_params(path: str, query: str) -> Dict[str, str]:
+    """
+    Validate and fill defaults for a query string.
+
+    Raises:
+        ValueError: On unknown parameters or values
+    """
+    raw = parse_qs(query, keep_blank_values=True)
+    unknown = set(raw) - QUERY_PARAMS[path]
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    params = {name: values[-1] for name, values in raw.items()}
+    params.setdefault('venue', 'all')
+    params.setdefault('active', 'all')
+    if params['venue'] not in VENUES + ['all']:
+        raise ValueError(f"venue must be one of {VENUES + ['all']}")
+    if params['active'] not in ACTIVE_FILTERS:
+        raise ValueError(f"active must be one of {ACTIVE_FILTERS}")
+
+    for name in ('start', 'end'):
+        if params.get(name):
+            try:
+                params[name] = parse_time(params[name]).isoformat()
+            except ValueError:
+                raise ValueError(f"{name} is not a valid time: {params[name]}")
+
+    if path == '/hours':
+        params.setdefault('resolution', 'hour')
+        params.setdefault('format', 'json')
+        if params['resolution'] not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {list(RESOLUTIONS)}")
+        if params['format'] not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+    else:
+        stats = params.get('stat') or ','.join(STATS)
+        unknown_stats = set(stats.split(',')) - set(STATS)
+        if unknown_stats:
+            raise ValueError(f"Unknown stats: {', '.join(sorted(unknown_stats))}")
+        params['stat'] = ','.join(name for name in STATS if name in stats.split(','))
+    return params
+
+
+def filter_hours(frame: pd.DataFrame, params: Dict[str, str]) -> pd.DataFrame:
+    """Rows in [start, end) that pass the activity filter."""
+    mask = np.ones(len(frame), dtype=bool)
+    if params.get('start'):
+        mask &= (frame['time'] >= pd.Timestamp(params['start'])).to_numpy()
+    if params.get('end'):
+        mask &= (frame['time'] < pd.Timestamp(params['end'])).to_numpy()
+
+    active = params['active']
+    if active != 'all':
+        volumes = {venue: (frame[f'{venue}_volume'] > 0).to_numpy() for venue in VENUES}
+        if active == 'any':
+            mask &= volumes['uniswap'] | volumes['bybit']
+        elif active == 'both':
+            mask &= volumes['uniswap'] & volumes['bybit']
+        else:
+            mask &= volumes[active]
+    return frame[mask]
+
+
+def query_hours(frame: pd.DataFrame, params: Dict[str, str]) -> pd.DataFrame:
+    """
+    Filtered rows at the requested resolution.
+
+    Coarser resolutions sum volume, take the min of minimum and the max of
+    maximum prices, and count the hours with outside-band volume.
+    """
+    venues = VENUES if params['venue'] == 'all' else [params['venue']]
+    rows = filter_hours(frame, params)
+    columns = ['time'] + [f'{v}_volume' for v in venues] + \
+              [f'{v}_{c}' for v in venues for c in ('min_price', 'max_price')]
+    rows = rows[columns]
+
+    freq = RESOLUTIONS[params['resolution']]
+    if freq is not None:
+        if freq == 'W':
+            # Weeks start on Monday 00:00 UTC
+            period = rows['time'].dt.floor('D') - pd.to_timedelta(rows['time'].dt.weekday, unit='D')
+        else:
+            period = rows['time'].dt.floor(freq)
+        grouped = rows.groupby(period)
+        aggregated = {}
+        for venue in venues:
+            aggregated[f'{venue}_volume'] = grouped[f'{venue}_volume'].sum()
+        for venue in venues:
+            aggregated[f'{venue}_min_price'] = grouped[f'{venue}_min_price'].min()
+            aggregated[f'{venue}_max_price'] = grouped[f'{venue}_max_price'].max()
+        for venue in venues:
+            aggregated[f'{venue}_hours'] = (rows[f'{venue}_volume'] > 0).groupby(period).sum()
+        rows = pd.DataFrame(aggregated).rename_axis('time').reset_index()
+
+    rows = rows.copy()
+    rows['time'] = rows['time'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return rows.reset_index(drop=True)
+
+
+def query_stats(frame: pd.DataFrame, params: Dict[str, str]) -> Dict[str, Any]:
+    """Summary statistics over the filtered hours (per venue where applicable)."""
+    venues = VENUES if params['venue'] == 'all' else [params['venue']]
+    rows = filter_hours(frame, params)
+    both = int(((rows['uniswap_volume'] > 0) & (rows['bybit_volume'] > 0)).sum())
+
+    def number(value) -> Optional[float]:
+        return None if pd.isna(value) else float(value)
+
+    per_venue = {}
+    for venue in venues:
+        volume = rows[f'{venue}_volume']
+        per_venue[venue] = {
+            'hours_with_volume': int((volume > 0).sum()),
+            'total_volume': number(volume.sum()),
+            'mean_hourly_volume': number(volume.mean()),
+            'max_hourly_volume': number(volume.max()),
+            'min_price': number(rows[f'{venue}_min_price'].min()),
+            'max_price': number(rows[f'{venue}_max_price'].max())
+        }
+
+    result: Dict[str, Any] = {}
+    for name in params['stat'].split(','):
+        if name == 'hours':
+            result[name] = len(rows)
+        elif name == 'both_venues_hours':
+            result[name] = both
+        else:
+            result[name] = {venue: stats[name] for venue, stats in per_venue.items()}
+    return result
+
+
+class ChunkedWriter:
+    """File-like wrapper writing HTTP/1.1 chunked transfer encoding."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        return len(data)
+
+    def flush(self) -> None:
+        self.wfile.flush()
+
+    def finish(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Request handler; the server carries the store and cache."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY a
+    # keep-alive client's delayed ACK adds ~40 ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/health':
+                version, frame = self.server.store.current()
+                self.send_body(200, 'application/json', json.dumps({
+                    'status': 'ok', 'artifact': self.server.store.path,
+                    'version': f"{version[0]}:{version[1]}", 'hours': len(frame),
+                    'cache': self.server.cache.stats()}).encode())
+                return
+            if url.path not in QUERY_PARAMS:
+                self.send_error_json(404, f"Unknown path: {url.path}")
+                return
+
+            params = normalize_params(url.path, url.query)
+            version, frame = self.server.store.current()
+            key = (version, url.path, tuple(sorted(params.items())))
+            result = self.server.cache.get(key)
+            if result is None:
+                result = self.compute(url.path, params, frame)
+                self.server.cache.put(key, result)
+
+            content_type, body = result
+            if content_type == 'application/vnd.apache.arrow.stream':
+                self.send_arrow(body)
+            else:
+                self.send_body(200, content_type, body)
+        except ValueError as e:
+            self.send_error_json(400, str(e))
+        except FileNotFoundError:
+            self.send_error_json(503, f"Artifact not found: {self.server.store.path}")
+
+    def compute(self, path: str, params: Dict[str, str], frame: pd.DataFrame) -> Tuple[str, Any]:
+        """Build a cacheable (content type, body) pair; Arrow bodies stay tables."""
+        if path == '/stats':
+            return 'application/json', json.dumps(query_stats(frame, params)).encode()
+
+        rows = query_hours(frame, params)
+        if params['format'] == 'arrow':
+            return 'application/vnd.apache.arrow.stream', pa.Table.from_pandas(rows, preserve_index=False)
+        if params['format'] == 'csv':
+            return 'text/csv', rows.to_csv(index=False, float_format='%.6f').encode()
+        return 'application/json', rows.to_json(orient='records').encode()
+
+    def send_body(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str) -> None:
+        self.send_body(status, 'application/json', json.dumps({'error': message}).encode())
+
+    def send_arrow(self, table: pa.Table) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.apache.arrow.stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        out = ChunkedWriter(self.wfile)
+        with pa.ipc.new_stream(out, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=ARROW_BATCH_ROWS):
+                writer.write_batch(batch)
+        out.finish()
+
+
+class QueryServer(ThreadingHTTPServer):
+    """Threaded HTTP server sharing one store and result cache across requests."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], artifact_path: str = ARTIFACT_PATH,
+                 cache_size: int = CACHE_SIZE, verbose: bool = False):
+        super().__init__(address, QueryHandler)
+        self.cache = LRUCache(cache_size)
+        self.store = AggregateStore(artifact_path, self.cache)
+        self.verbose = verbose
+
+
+def main(argv: Optional[List[str]] = None):
+    """Serve the hourly aggregates until interrupted."""
+    parser = argparse.ArgumentParser(description='Read-only query service for the hourly aggregates')
+    parser.add_argument('--artifact', default=ARTIFACT_PATH, help='Hourly CSV to serve')
+    parser.add_argument('--host', default=HOST, help='Listen address')
+    parser.add_argument('--port', type=int, default=PORT, help='Listen port')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='LRU result cache entries')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args(argv)
+
+    server = QueryServer((args.host, args.port), args.artifact, args.cache_size, args.verbose)
+    try:
+        server.store.current()
+    except FileNotFoundError:
+        print(f"Warning: {args.artifact} not found yet; queries return 503 until it exists")
+
+    print(f"Serving {args.artifact} on http://{args.host}:{args.port}")
+    print("Endpoints: /health, /hours, /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        server.server_close()
+        cache = server.cache.stats()
+        print(f"Cache: {cache['hits']} hits, {cache['misses']} misses")
+
+
+if __name__ == "__main__":
+    main()
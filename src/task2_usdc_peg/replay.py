@@ -0,0 +1,376 @@
+"""
+Deterministic, accelerated market-data replay.
+
+Merges recorded data into one time-ordered event stream and plays it into
+async consumers, so downstream components can be load-tested on the
+same data every run. Recorded sources are:
+
+- eth_btc_trade: eth-btc-trades.csv
+- eth_btc_book: order-book snapshots (eth-btc-orderbooks.csv or a .obk store)
+- peg_trade: USDC/USDT venue trades from temp/<venue>_raw_data.parquet
+
+Each source is a time-ordered generator. heapq.merge does the k-way
+merge, which is stable, so ties are broken by source order and then by
+position in the source, and the output order is fully deterministic. A
+CRC of the emitted (timestamp, source, sequence) keys is printed as an
+order digest.
+
+Playback runs at real time (--speed 1), N times faster (--speed N) or as
+fast as possible (--speed 0). Every consumer reads from its own bounded
+asyncio.Queue, so a slow consumer stalls the replay (backpressure) rather
+than letting memory grow. Counters cover events per source, throughput,
+backpressure stalls, lag behind the playback schedule and per-consumer
+latency (event scheduled -> handled).
+
+Usage:
+    python src/task2_usdc_peg/replay.py --speed 0 --consumers monitor hedge spoofing
+"""
+
+import argparse
+import asyncio
+import heapq
+import os
+import sys
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from peg_monitor import LatencyTracker, PegMonitor
+
+TASK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TASK_DIR, '..', 'task3_suspicious_patterns'))
+sys.path.insert(0, os.path.join(TASK_DIR, '..', 'task1_hedged_lp'))
+
+from orderbook import BookSnapshots, ORDERBOOK_CSV, TRADES_CSV, load_trades_csv, to_ns  # noqa: E402
+
+# Configuration
+SOURCES = ['eth_btc_trade', 'eth_btc_book', 'peg_trade']
+QUEUE_SIZE = 1_000  # Events buffered per consumer before the replay waits
+MAX_SLEEP = 1.0  # Longest single sleep while pacing, so cancellation stays responsive
+PEG_VENUES = ['uniswap', 'bybit']
+HEDGE_SIZES = [0.1, -0.1, 1.0, -1.0]  # ETH priced against every snapshot by the hedge consumer
+
+
+class ReplayEvent(NamedTuple):
+    """One replayed event; timestamp is int64 ns since epoch (UTC)."""
+    timestamp: int
+    source: str
+    seq: int
+    payload: Any
+
+
+def trade_events(trades: pd.DataFrame) -> Iterator[ReplayEvent]:
+    """ETH/BTC trades (load_trades_csv output) as events with dict payloads."""
+    timestamps = trades['timestamp'].to_numpy(dtype=np.int64)
+    prices = trades['price'].to_numpy()
+    sizes = trades['size'].to_numpy()
+    sides = trades['side'].to_numpy()
+    for i in range(len(trades)):
+        yield ReplayEvent(int(timestamps[i]), 'eth_btc_trade', i,
+                          {'price': float(prices[i]), 'size': float(sizes[i]), 'side': int(sides[i])})
+
+
+def book_events(book: BookSnapshots) -> Iterator[ReplayEvent]:
+    """Order-book snapshots as events whose payload is a one-row BookSnapshots view."""
+    for i in range(len(book)):
+        yield ReplayEvent(int(book.timestamps[i]), 'eth_btc_book', i, book.slice(i, i + 1))
+
+
+def peg_events(frames: Dict[str, pd.DataFrame]) -> Iterator[ReplayEvent]:
+    """
+    Peg venue trades as events in the peg_monitor.py event format.
+
+    Args:
+        frames: Venue -> raw trades ('timestamp' in seconds, 'price', 'volume')
+    """
+    from episodes import merge_venue_streams
+
+    stream = merge_venue_streams(frames)
+    timestamps = stream['timestamp'].to_numpy(dtype=np.int64)
+    prices = stream['price'].to_numpy(dtype=np.float64)
+    volumes = stream['volume'].to_numpy(dtype=np.float64)
+    venues = stream['venue'].to_numpy()
+    for i in range(len(stream)):
+        yield ReplayEvent(int(timestamps[i]) * 1_000_000_000, 'peg_trade', i,
+                          {'venue': venues[i], 'timestamp': int(timestamps[i]),
+                           'price': float(prices[i]), 'volume': float(volumes[i])})
+
+
+def merge_events(sources: Dict[str, Iterable[ReplayEvent]]) -> Iterator[ReplayEvent]:
+    """
+    k-way merge of time-ordered sources into one stream.
+
+    heapq.merge keeps one pending event per source on a heap, so the merge
+    is O(log k) per event and never materializes the inputs. Equal
+    timestamps come out in source order, then in source position.
+    """
+    return heapq.merge(*sources.values(), key=lambda event: event.timestamp)
+
+
+def window_events(events: Iterable[ReplayEvent], start_ns: Optional[int] = None,
+                  end_ns: Optional[int] = None) -> Iterator[ReplayEvent]:
+    """Events with start_ns <= timestamp < end_ns."""
+    for event in events:
+        if start_ns is not None and event.timestamp < start_ns:
+            continue
+        if end_ns is not None and event.timestamp >= end_ns:
+            return
+        yield event
+
+
+class Consumer:
+    """
+    Async event handler fed through its own bounded queue.
+
+    Args:
+        name: Consumer name for the report
+        handler: Async callable taking a ReplayEvent
+        sources: Sources this consumer receives (None for all)
+        queue_size: Queue bound; a full queue stalls the replay
+    """
+
+    def __init__(self, name: str, handler: Callable[[ReplayEvent], Awaitable[None]],
+                 sources: Optional[List[str]] = None, queue_size: int = QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.sources = set(sources) if sources is not None else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.latency = LatencyTracker()
+        self.handled = 0
+        self.errors = 0
+
+    def accepts(self, event: ReplayEvent) -> bool:
+        return self.sources is None or event.source in self.sources
+
+    async def run(self) -> None:
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            event, scheduled = item
+            try:
+                await self.handler(event)
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"{self.name}: handler error: {e}")
+            self.handled += 1
+            self.latency.record(time.perf_counter() - scheduled)
+
+
+class Replayer:
+    """
+    Paces a merged event stream into consumers.
+
+    Args:
+        speed: Playback speed relative to recorded time (1 = real time);
+            0 or None replays as fast as the consumers allow
+    """
+
+    def __init__(self, speed: Optional[float] = 1.0):
+        if speed is not None and speed < 0:
+            raise ValueError("Speed must be non-negative")
+        self.speed = speed or None
+        self.counters: Dict[str, Any] = {}
+
+    async def run(self, events: Iterable[ReplayEvent], consumers: List[Consumer]) -> Dict[str, Any]:
+        """
+        Replay events into consumers until the stream ends.
+
+        Returns:
+            Counters: events per source, elapsed and recorded seconds,
+            throughput, stalls, max schedule lag, order digest and
+            per-consumer latency summaries
+        """
+        tasks = [asyncio.create_task(consumer.run()) for consumer in consumers]
+        per_source: Dict[str, int] = {}
+        emitted = 0
+        stalls = 0
+        max_lag = 0.0
+        digest = 0
+        first_ts = last_ts = None
+        started = time.perf_counter()
+
+        try:
+            for event in events:
+                if first_ts is None:
+                    first_ts = event.timestamp
+                last_ts = event.timestamp
+
+                scheduled = time.perf_counter()
+                if self.speed is not None:
+                    # Wall-clock time this event is due at the chosen speed
+                    due = started + (event.timestamp - first_ts) / 1e9 / self.speed
+                    while (wait := due - time.perf_counter()) > 0:
+                        await asyncio.sleep(min(wait, MAX_SLEEP))
+                    scheduled = due
+                    max_lag = max(max_lag, time.perf_counter() - due)
+
+                for consumer in consumers:
+                    if not consumer.accepts(event):
+                        continue
+                    if consumer.queue.full():
+                        stalls += 1
+                    await consumer.queue.put((event, scheduled))
+
+                emitted += 1
+                per_source[event.source] = per_source.get(event.source, 0) + 1
+                digest = zlib.crc32(f"{event.timestamp}:{event.source}:{event.seq}".encode(), digest)
+                if self.speed is None and emitted % 1000 == 0:
+                    # Yield so consumers drain even when no queue is full
+                    await asyncio.sleep(0)
+        finally:
+            for consumer in consumers:
+                await consumer.queue.put(None)
+            await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - started
+        recorded = (last_ts - first_ts) / 1e9 if first_ts is not None else 0.0
+        self.counters = {
+            'events': emitted,
+            'per_source': per_source,
+            'elapsed_seconds': elapsed,
+            'recorded_seconds': recorded,
+            'events_per_second': emitted / elapsed if elapsed > 0 else 0.0,
+            'effective_speed': recorded / elapsed if elapsed > 0 else 0.0,
+            'backpressure_stalls': stalls,
+            'max_schedule_lag_ms': max_lag * 1000,
+            'order_digest': f"{digest:08x}",
+            'consumers': {consumer.name: {'handled': consumer.handled, 'errors': consumer.errors,
+                                          **consumer.latency.summary()}
+                          for consumer in consumers}
+        }
+        return self.counters
+
+
+def monitor_consumer(monitor: PegMonitor, queue_size: int = QUEUE_SIZE) -> Consumer:
+    """Feed peg trades to a PegMonitor."""
+    async def handle(event: ReplayEvent) -> None:
+        monitor.process(event.payload)
+    return Consumer('monitor', handle, ['peg_trade'], queue_size)
+
+
+def hedge_consumer(sizes: List[float], queue_size: int = QUEUE_SIZE) -> Consumer:
+    """Price a fixed set of hedge sizes against every book snapshot."""
+    from hedge_execution import estimate_execution
+
+    async def handle(event: ReplayEvent) -> None:
+        estimate_execution(event.payload, sizes)
+    return Consumer('hedge', handle, ['eth_btc_book'], queue_size)
+
+
+def spoofing_consumer(queue_size: int = QUEUE_SIZE) -> Consumer:
+    """Diff each book snapshot against the previous one, as a streaming detector would."""
+    from spoofing import SideLevels, diff_side
+
+    state: Dict[str, Optional[BookSnapshots]] = {'previous': None}
+
+    async def handle(event: ReplayEvent) -> None:
+        previous = state['previous']
+        state['previous'] = event.payload
+        if previous is None:
+            return
+        pair = BookSnapshots(
+            np.concatenate([previous.timestamps, event.payload.timestamps]),
+            *(np.concatenate([getattr(previous, name), getattr(event.payload, name)])
+              for name in ('bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes')))
+        for side in ('bid', 'ask'):
+            diff_side(SideLevels(pair, side), pair.mid())
+    return Consumer('spoofing', handle, ['eth_btc_book'], queue_size)
+
+
+def null_consumer(queue_size: int = QUEUE_SIZE) -> Consumer:
+    """Accept every event and do nothing (measures the replay itself)."""
+    async def handle(event: ReplayEvent) -> None:
+        return None
+    return Consumer('null', handle, None, queue_size)
+
+
+def load_sources(names: List[str], book_path: str = ORDERBOOK_CSV,
+                 trades_path: str = TRADES_CSV) -> Dict[str, Iterator[ReplayEvent]]:
+    """Load the requested recorded sources as event generators (in SOURCES order)."""
+    sources = {}
+    for name in SOURCES:
+        if name not in names:
+            continue
+        if name == 'eth_btc_trade':
+            trades = load_trades_csv(trades_path)
+            print(f"eth_btc_trade: {len(trades)} trades")
+            sources[name] = trade_events(trades)
+        elif name == 'eth_btc_book':
+            from spoofing import load_book
+            book = load_book(book_path)
+            print(f"eth_btc_book: {len(book)} snapshots")
+            sources[name] = book_events(book)
+        elif name == 'peg_trade':
+            from aggregate_outside_band import load_venue_data
+            frames = {venue: load_venue_data(venue) for venue in PEG_VENUES}
+            print(f"peg_trade: {sum(len(df) for df in frames.values())} trades")
+            sources[name] = peg_events(frames)
+    return sources
+
+
+def print_counters(counters: Dict[str, Any]) -> None:
+    print("\n=== Replay Report ===")
+    print(f"Events: {counters['events']:,} {counters['per_source']}")
+    print(f"Elapsed: {counters['elapsed_seconds']:.3f}s for {counters['recorded_seconds']:,.0f}s recorded "
+          f"({counters['effective_speed']:,.1f}x)")
+    print(f"Throughput: {counters['events_per_second']:,.0f} events/s")
+    print(f"Backpressure stalls: {counters['backpressure_stalls']:,}")
+    print(f"Max schedule lag: {counters['max_schedule_lag_ms']:.2f} ms")
+    print(f"Order digest: {counters['order_digest']}")
+    for name, stats in counters['consumers'].items():
+        latency = ', '.join(f"{key} {value:.3f}" for key, value in stats.items()
+                            if key.endswith('_ms'))
+        print(f"  {name}: {stats['handled']:,} handled, {stats['errors']} errors; latency {latency}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Replay recorded market data into the selected consumers."""
+    parser = argparse.ArgumentParser(description='Deterministic market-data replay')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='Playback speed (1 = real time, N = N times faster, 0 = as fast as possible)')
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, default=SOURCES, help='Recorded sources')
+    parser.add_argument('--consumers', nargs='+', choices=['monitor', 'hedge', 'spoofing', 'null'],
+                        default=['monitor', 'hedge', 'spoofing'], help='Consumers to feed')
+    parser.add_argument('--book', default=ORDERBOOK_CSV, help='Order-book CSV or .obk store')
+    parser.add_argument('--trades', default=TRADES_CSV, help='ETH/BTC trades CSV')
+    parser.add_argument('--start', default=None, help='Replay from this time (ISO8601, UTC)')
+    parser.add_argument('--end', default=None, help='Replay up to this time (ISO8601, UTC)')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='Per-consumer queue bound')
+    args = parser.parse_args(argv)
+
+    print("Loading recorded sources...")
+    sources = load_sources(args.sources, args.book, args.trades)
+    events = window_events(merge_events(sources),
+                           to_ns(args.start) if args.start else None,
+                           to_ns(args.end) if args.end else None)
+
+    monitor = PegMonitor()
+    factories = {
+        'monitor': lambda size: monitor_consumer(monitor, size),
+        'hedge': lambda size: hedge_consumer(HEDGE_SIZES, size),
+        'spoofing': spoofing_consumer,
+        'null': null_consumer
+    }
+    consumers = [factories[name](args.queue_size) for name in args.consumers]
+
+    speed = 'max speed' if not args.speed else f"{args.speed:g}x"
+    print(f"Replaying at {speed} into {', '.join(args.consumers)}...")
+    replayer = Replayer(args.speed)
+    try:
+        counters = asyncio.run(replayer.run(events, consumers))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+        return
+    print_counters(counters)
+
+    if 'monitor' in args.consumers:
+        print(f"\nPeg monitor: {monitor.counters}")
+
+
+if __name__ == "__main__":
+    main()
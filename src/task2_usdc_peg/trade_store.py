@@ -0,0 +1,176 @@
+"""
+Idempotent, sorted trade store for overlapping fetch windows.
+
+Every record is keyed by its venue id ('trade_id': Bybit execId, Uniswap
+swap id). The store keeps trades as a list of sorted, non-overlapping
+time segments. A new batch only touches the rows inside its own time
+range: the overlapping segments are split at the batch bounds, the rows
+between them merged with the batch by insertion position (no re-sort) and
+duplicate ids dropped, and the result spliced between the untouched
+prefix and suffix. No global drop_duplicates runs over the whole store,
+and in-order batches are appended without touching existing data. Fetch
+windows can therefore overlap, arrive out of order or come from parallel
+workers, and re-ingesting a window never double-counts volume.
+"""
+
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import RAW_COLUMNS, load_from_parquet, save_to_parquet
+from instrumentation import count
+
+def _sort_keys(df: pd.DataFrame) -> np.ndarray:
+    """Single string keys that order rows like (timestamp, trade_id)."""
+    # Zero-padding makes the string order of the timestamps numeric
+    timestamps = df['timestamp'].to_numpy(dtype=np.int64).astype(str)
+    return np.char.add(np.char.zfill(timestamps, 20), df['trade_id'].to_numpy().astype(str))
+
+
+def _sorted_unique(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Sort by (timestamp, trade_id) and keep the first row of each trade_id.
+
+    Returns:
+        (sorted frame, its sort keys)
+    """
+    keys = _sort_keys(df)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    # A trade id always carries the same timestamp, so duplicates end up adjacent
+    keep = np.ones(len(df), dtype=bool)
+    keep[1:] = keys[1:] != keys[:-1]
+    return df.take(order[keep]).reset_index(drop=True), keys[keep]
+
+
+def _merge_sorted(existing: pd.DataFrame, batch: pd.DataFrame,
+                  batch_keys: np.ndarray) -> Tuple[pd.DataFrame, int]:
+    """
+    Merge a sorted, unique batch into sorted existing rows, dropping known ids.
+
+    Returns:
+        (merged frame, number of batch rows added)
+    """
+    existing_keys = _sort_keys(existing)
+    n_existing = len(existing)
+
+    # Insertion position of every batch row; an equal key there is a duplicate
+    pos = np.searchsorted(existing_keys, batch_keys, side='left')
+    duplicate = np.zeros(len(batch), dtype=bool)
+    inside = pos < n_existing
+    duplicate[inside] = existing_keys[pos[inside]] == batch_keys[inside]
+    if duplicate.all():
+        return existing.reset_index(drop=True), 0
+    batch = batch[~duplicate]
+    pos = pos[~duplicate]
+
+    # Two-pointer merge as index arithmetic: batch row k lands at pos[k] + k
+    n_added = len(batch)
+    from_batch = np.zeros(n_existing + n_added, dtype=bool)
+    from_batch[pos + np.arange(n_added)] = True
+    order = np.empty(n_existing + n_added, dtype=np.int64)
+    order[~from_batch] = np.arange(n_existing)
+    order[from_batch] = n_existing + np.arange(n_added)
+
+    merged = pd.concat([existing, batch], ignore_index=True).take(order)
+    return merged.reset_index(drop=True), n_added
+
+
+class SortedTradeStore:
+    """
+    Sorted, de-duplicated trade table for one venue.
+
+    Args:
+        venue: Venue name (used for instrumentation stage names)
+        df: Optional initial contents (sorted and de-duplicated on load)
+    """
+
+    def __init__(self, venue: str, df: Optional[pd.DataFrame] = None):
+        self.venue = venue
+        self._segments: List[pd.DataFrame] = []
+        self._seg_min = np.empty(0, dtype=np.int64)
+        self._seg_max = np.empty(0, dtype=np.int64)
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'rows_in': 0, 'rows_added': 0, 'duplicates': 0}
+
+        if df is not None and not df.empty:
+            self.ingest(df)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def ingest(self, batch: pd.DataFrame) -> int:
+        """
+        Merge a batch of trades into the store.
+
+        Args:
+            batch: Trades with at least 'timestamp' and 'trade_id'
+
+        Returns:
+            Number of new (previously unseen) trades added
+        """
+        if batch.empty:
+            return 0
+
+        batch, batch_keys = _sorted_unique(batch)
+        batch_min = int(batch['timestamp'].iloc[0])
+        batch_max = int(batch['timestamp'].iloc[-1])
+
+        with self._lock:
+            n_in = len(batch)
+
+            # Segments overlapping [batch_min, batch_max] form a contiguous run
+            first = int(np.searchsorted(self._seg_max, batch_min, side='left'))
+            last = int(np.searchsorted(self._seg_min, batch_max, side='right'))
+
+            if first >= last:
+                segments = [batch]
+                added = n_in
+            else:
+                # Only rows inside the batch's time range take part in the merge
+                head, tail = self._segments[first], self._segments[last - 1]
+                split_head = int(np.searchsorted(head['timestamp'].to_numpy(), batch_min, side='left'))
+                split_tail = int(np.searchsorted(tail['timestamp'].to_numpy(), batch_max, side='right'))
+                if first == last - 1:
+                    overlap = head.iloc[split_head:split_tail]
+                else:
+                    overlap = pd.concat([head.iloc[split_head:], *self._segments[first + 1:last - 1],
+                                         tail.iloc[:split_tail]], ignore_index=True)
+                merged, added = _merge_sorted(overlap, batch, batch_keys)
+                segments = [seg for seg in (head.iloc[:split_head], merged, tail.iloc[split_tail:]) if len(seg)]
+
+            self._segments[first:last] = segments
+            self._seg_min = np.concatenate([self._seg_min[:first],
+                                            [int(seg['timestamp'].iloc[0]) for seg in segments],
+                                            self._seg_min[last:]]).astype(np.int64)
+            self._seg_max = np.concatenate([self._seg_max[:first],
+                                            [int(seg['timestamp'].iloc[-1]) for seg in segments],
+                                            self._seg_max[last:]]).astype(np.int64)
+
+            self._rows += added
+            self.stats['batches'] += 1
+            self.stats['rows_in'] += n_in
+            self.stats['rows_added'] += added
+            self.stats['duplicates'] += n_in - added
+
+        count('duplicates_dropped', n_in - added, stage=f'{self.venue}.store')
+        return added
+
+    def to_frame(self) -> pd.DataFrame:
+        """All trades sorted by (timestamp, trade_id)."""
+        with self._lock:
+            if not self._segments:
+                return pd.DataFrame(columns=RAW_COLUMNS)
+            return pd.concat(self._segments, ignore_index=True)
+
+    def save(self, filepath: str) -> None:
+        """Save the store contents to Parquet."""
+        save_to_parquet(self.to_frame(), filepath)
+
+    @classmethod
+    def load(cls, venue: str, filepath: str) -> 'SortedTradeStore':
+        """Load a store saved with save()."""
+        return cls(venue, load_from_parquet(filepath))
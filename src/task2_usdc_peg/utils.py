@@ -14,6 +14,15 @@ BAND_LOWER = Decimal('0.9990')
 BAND_UPPER = Decimal('1.0010')
 BAND_CENTER = Decimal('1.0000')
 
+# Sanity range for executed prices (USDT per USDC)
+PRICE_MIN = 0.5
+PRICE_MAX = 2.0
+
+# Columns of the per-venue raw trade tables written by the fetchers.
+# 'side' is +1 when the taker bought USDC and -1 when they sold it;
+# 'trade_id' is the venue's own id (Bybit execId, Uniswap swap id).
+RAW_COLUMNS = ['timestamp', 'price', 'volume', 'venue', 'side', 'trade_id']
+
 
 def round_to_hour(timestamp: int) -> str:
     """Round unix timestamp to top of hour (ISO8601)."""
@@ -31,6 +40,13 @@ def is_outside_band(price: float) -> bool:
     return price_decimal < BAND_LOWER or price_decimal > BAND_UPPER
 
 
+def outside_band_mask(prices: np.ndarray) -> np.ndarray:
+    """Vectorized is_outside_band for an array of prices."""
+    prices = np.asarray(prices, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return (prices > 0) & ((prices < float(BAND_LOWER)) | (prices > float(BAND_UPPER)))
+
+
 def calculate_price_from_amounts(amount0: float, amount1: float, 
                                 token0_decimals: int, token1_decimals: int,
                                 token0_symbol: str, token1_symbol: str) -> float:
@@ -61,7 +77,7 @@ def validate_price(price: float) -> bool:
     """Check price is reasonable (0.5-2.0 range)."""
     if pd.isna(price):
         return False
-    return 0.5 <= price <= 2.0
+    return PRICE_MIN <= price <= PRICE_MAX
 
 
 def validate_volume(volume: float) -> bool:
@@ -129,7 +145,7 @@ def merge_venue_data(uniswap_df: pd.DataFrame, bybit_df: pd.DataFrame) -> pd.Dat
     start_time = datetime(2025, 7, 1, tzinfo=timezone.utc)
     end_time = datetime(2025, 9, 30, 23, tzinfo=timezone.utc)
     
-    hours = pd.date_range(start=start_time, end=end_time, freq='H')
+    hours = pd.date_range(start=start_time, end=end_time, freq='h')
     hour_strings = [h.strftime('%Y-%m-%dT%H:%M:%SZ') for h in hours]
     
     # Create base DataFrame with all hours
@@ -0,0 +1 @@
+# Task 3: Suspicious Market Patterns Analysis
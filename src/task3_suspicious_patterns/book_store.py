@@ -0,0 +1,318 @@
+"""
+Compact binary storage for order-book snapshots.
+
+File layout (little-endian):
+
+    header  magic 'OBK1', depth, price tick, size scale, snapshot and
+            block counts, offset of the block index
+    blocks  one zlib-compressed block per BLOCK_SNAPSHOTS snapshots
+    index   per block: first/last timestamp, byte offset, length, count
+
+Inside a block, prices are integer tick counts. The best level is stored
+as a delta from the previous snapshot's best level and deeper levels as
+deltas from the level above. Sizes are integers scaled by the size scale,
+-1 marks a missing level and timestamps are delta-encoded. Each array is
+narrowed to the smallest integer type that holds it before compression.
+Readers memory-map the file and only decompress the blocks that overlap
+the requested time range.
+
+Usage:
+    python src/task3_suspicious_patterns/book_store.py convert eth-btc-orderbooks.csv temp/eth-btc-orderbooks.obk
+    python src/task3_suspicious_patterns/book_store.py info temp/eth-btc-orderbooks.obk
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from orderbook import BookSnapshots, load_orderbook_csv, to_ns, SIDES
+
+# Configuration
+MAGIC = b'OBK1'
+BLOCK_SNAPSHOTS = 256
+COMPRESSION_LEVEL = 6
+MAX_DECIMALS = 12  # Finest tick / size unit tried when inferring scales
+
+HEADER = struct.Struct('<4sHHddQIQ')  # magic, version, depth, tick, size scale, n, blocks, index offset
+FORMAT_VERSION = 1
+INDEX_DTYPE = np.dtype([('t_first', '<i8'), ('t_last', '<i8'), ('offset', '<u8'),
+                        ('length', '<u8'), ('count', '<u4')])
+# Arrays in a block, in write order
+BLOCK_ARRAYS = ['timestamps', 'bid_ticks', 'bid_sizes', 'ask_ticks', 'ask_sizes']
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def infer_decimals(values: np.ndarray, max_decimals: int = MAX_DECIMALS) -> int:
+    """
+    Fewest decimals that represent every finite value exactly.
+
+    Raises:
+        ValueError: if more than max_decimals are needed
+    """
+    values = values[np.isfinite(values)]
+    for decimals in range(max_decimals + 1):
+        scaled = values * 10.0 ** decimals
+        if np.all(np.abs(scaled - np.round(scaled)) <= 1e-9 * np.maximum(1.0, np.abs(scaled))):
+            return decimals
+    raise ValueError(f"Values need more than {max_decimals} decimals")
+
+
+def _narrow(arr: np.ndarray) -> np.ndarray:
+    """Cast an int64 array to the smallest signed type holding its range."""
+    if arr.size == 0:
+        return arr.astype(np.int8)
+    lo, hi = int(arr.min()), int(arr.max())
+    for dtype in INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return arr.astype(dtype)
+    return arr
+
+
+def encode_block(book: BookSnapshots, tick: float, size_scale: float) -> bytes:
+    """
+    Encode and compress snapshots into one block.
+
+    Missing levels repeat the price of the level above (zero delta) and
+    store a size of -1, which the decoder turns back into NaN.
+    """
+    timestamps = np.diff(book.timestamps, prepend=0)
+    arrays = {'timestamps': timestamps}
+
+    for side in SIDES:
+        prices = book.prices(side)
+        sizes = book.sizes(side)
+        missing = ~(np.isfinite(prices) & np.isfinite(sizes))
+
+        ticks = np.where(missing, 0, np.round(np.nan_to_num(prices) / tick)).astype(np.int64)
+        # Index of the nearest present level at or above each level
+        source = np.maximum.accumulate(np.where(missing, 0, np.arange(ticks.shape[1])), axis=1)
+        ticks = np.take_along_axis(ticks, source, axis=1)
+
+        deltas = np.empty_like(ticks)
+        deltas[:, 0] = np.diff(ticks[:, 0], prepend=0)  # Best level vs previous snapshot
+        deltas[:, 1:] = np.diff(ticks, axis=1)  # Deeper levels vs the level above
+        arrays[f'{side}_ticks'] = deltas
+        arrays[f'{side}_sizes'] = np.where(missing, -1, np.round(np.nan_to_num(sizes) * size_scale)).astype(np.int64)
+
+    parts = []
+    for name in BLOCK_ARRAYS:
+        arr = _narrow(arrays[name])
+        parts.append(struct.pack('<B', INT_TYPES.index(arr.dtype.type)))
+        parts.append(arr.astype(arr.dtype.newbyteorder('<')).tobytes())
+    return zlib.compress(b''.join(parts), COMPRESSION_LEVEL)
+
+
+def decode_block(data: bytes, count: int, depth: int, tick: float,
+                 size_scale: float) -> BookSnapshots:
+    """Decompress and decode one block written by encode_block."""
+    raw = zlib.decompress(data)
+    pos = 0
+    arrays = {}
+    for name in BLOCK_ARRAYS:
+        dtype = np.dtype(INT_TYPES[raw[pos]]).newbyteorder('<')
+        pos += 1
+        n_values = count if name == 'timestamps' else count * depth
+        arr = np.frombuffer(raw, dtype=dtype, count=n_values, offset=pos).astype(np.int64)
+        pos += n_values * dtype.itemsize
+        arrays[name] = arr if name == 'timestamps' else arr.reshape(count, depth)
+
+    # Dividing by an exact integer scale reproduces decimal prices bit for bit
+    per_unit = 1.0 / tick
+    to_price = (lambda t: t / round(per_unit)) if abs(per_unit - round(per_unit)) < 1e-6 else (lambda t: t * tick)
+
+    levels = {}
+    for side in SIDES:
+        deltas = arrays[f'{side}_ticks']
+        ticks = np.cumsum(deltas, axis=1) - deltas[:, :1] + np.cumsum(deltas[:, 0])[:, None]
+        sizes = arrays[f'{side}_sizes']
+        missing = sizes < 0
+        levels[f'{side}_prices'] = np.where(missing, np.nan, to_price(ticks))
+        levels[f'{side}_sizes'] = np.where(missing, np.nan, sizes / size_scale)
+
+    return BookSnapshots(np.cumsum(arrays['timestamps']), levels['bid_prices'], levels['bid_sizes'],
+                         levels['ask_prices'], levels['ask_sizes'])
+
+
+def write_book_store(book: BookSnapshots, filepath: str, block_snapshots: int = BLOCK_SNAPSHOTS,
+                     tick: Optional[float] = None, size_scale: Optional[float] = None) -> int:
+    """
+    Write snapshots to the binary format.
+
+    Args:
+        book: Snapshots sorted by timestamp
+        filepath: Output file path
+        block_snapshots: Snapshots per compressed block
+        tick: Price tick (None to infer the coarsest exact power of ten)
+        size_scale: Size multiplier (None to infer)
+
+    Returns:
+        Bytes written
+    """
+    if np.any(np.diff(book.timestamps) < 0):
+        raise ValueError("Snapshots must be sorted by timestamp")
+
+    prices = np.concatenate([book.bid_prices.ravel(), book.ask_prices.ravel()])
+    sizes = np.concatenate([book.bid_sizes.ravel(), book.ask_sizes.ravel()])
+    tick = tick or 10.0 ** -infer_decimals(prices)
+    size_scale = size_scale or 10.0 ** infer_decimals(sizes)
+
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    n_blocks = (len(book) + block_snapshots - 1) // block_snapshots
+    index = np.zeros(n_blocks, dtype=INDEX_DTYPE)
+
+    tmp_path = f'{filepath}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        for i in range(n_blocks):
+            block = book.slice(i * block_snapshots, (i + 1) * block_snapshots)
+            data = encode_block(block, tick, size_scale)
+            index[i] = (block.timestamps[0], block.timestamps[-1], f.tell(), len(data), len(block))
+            f.write(data)
+
+        index_offset = f.tell()
+        f.write(index.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, book.depth, tick, size_scale,
+                            len(book), n_blocks, index_offset))
+        size = index_offset + index.nbytes
+    os.replace(tmp_path, filepath)
+    return size
+
+
+class BookStore:
+    """
+    Memory-mapped reader for files written by write_book_store.
+
+    Args:
+        filepath: Path of the .obk file
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.depth, self.tick, self.size_scale, self.n_snapshots, n_blocks, \
+            index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{filepath} is not an order-book store (version {FORMAT_VERSION})")
+        self.index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=n_blocks, offset=index_offset)
+
+    def __len__(self) -> int:
+        return self.n_snapshots
+
+    def __enter__(self) -> 'BookStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map and file handle."""
+        self.index = None
+        self._mmap.close()
+        self._file.close()
+
+    def time_range(self) -> Tuple[int, int]:
+        """(first, last) snapshot timestamp in ns."""
+        if not len(self.index):
+            return (0, 0)
+        return int(self.index['t_first'][0]), int(self.index['t_last'][-1])
+
+    def read_block(self, i: int) -> BookSnapshots:
+        """Decode block i."""
+        entry = self.index[i]
+        offset, length = int(entry['offset']), int(entry['length'])
+        return decode_block(self._mmap[offset:offset + length], int(entry['count']),
+                            self.depth, self.tick, self.size_scale)
+
+    def read(self, start=None, end=None) -> BookSnapshots:
+        """
+        Snapshots with start <= timestamp < end, decoding only overlapping blocks.
+
+        Args:
+            start: Range start (anything pandas can parse, or ns int; None for the beginning)
+            end: Range end, exclusive (None for the end)
+
+        Returns:
+            BookSnapshots for the range
+        """
+        start_ns = None if start is None else to_ns(start)
+        end_ns = None if end is None else to_ns(end)
+
+        first = 0 if start_ns is None else int(np.searchsorted(self.index['t_last'], start_ns, side='left'))
+        last = len(self.index) if end_ns is None else int(np.searchsorted(self.index['t_first'], end_ns, side='left'))
+
+        blocks: List[BookSnapshots] = [self.read_block(i) for i in range(first, last)]
+        if not blocks:
+            empty = np.empty((0, self.depth))
+            return BookSnapshots(np.empty(0, dtype=np.int64), empty, empty, empty, empty)
+
+        book = BookSnapshots(
+            np.concatenate([b.timestamps for b in blocks]),
+            *[np.concatenate([getattr(b, name) for b in blocks])
+              for name in ('bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes')]
+        )
+        return book.between(start_ns, end_ns)
+
+
+def to_iso(ns: int) -> str:
+    return np.datetime64(ns, 'ns').astype(str) + 'Z'
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line converter and inspector."""
+    parser = argparse.ArgumentParser(description='Order-book snapshot store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Convert the order-book CSV to the binary format')
+    convert.add_argument('csv', help='Input CSV (timestamp, asks, bids)')
+    convert.add_argument('output', help='Output .obk file')
+    convert.add_argument('--block-snapshots', type=int, default=BLOCK_SNAPSHOTS,
+                         help='Snapshots per compressed block')
+
+    info = subparsers.add_parser('info', help='Describe a binary store')
+    info.add_argument('path', help='.obk file')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        started = time.perf_counter()
+        book = load_orderbook_csv(args.csv)
+        parsed = time.perf_counter()
+        size = write_book_store(book, args.output, args.block_snapshots)
+        print(f"Parsed {len(book)} snapshots (depth {book.depth}) in {parsed - started:.2f}s")
+        print(f"Wrote {args.output}: {size / 1024:.1f} KB "
+              f"({size / os.path.getsize(args.csv) * 100:.1f}% of the CSV)")
+
+        started = time.perf_counter()
+        with BookStore(args.output) as store:
+            reloaded = store.read()
+        print(f"Reloaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for name in ('timestamps', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes'):
+            assert np.array_equal(getattr(reloaded, name), getattr(book, name), equal_nan=True), \
+                f"Round trip changed {name}"
+        print("Round trip matches the CSV")
+
+    elif args.command == 'info':
+        with BookStore(args.path) as store:
+            first, last = store.time_range()
+            print(f"Snapshots: {len(store)}, depth {store.depth}, blocks {len(store.index)}")
+            print(f"Price tick: {store.tick:g}, size scale: {store.size_scale:g}")
+            if len(store):
+                print(f"Time range: {to_iso(first)} to {to_iso(last)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Load ETH/BTC order-book snapshots and trades.
+
+eth-btc-orderbooks.csv stores each snapshot as a timestamp plus the ask
+and bid ladders as Python-literal lists of {'price': .., 'size': ..}
+dicts. The ladders are pulled out with one regex pass per side instead
+of evaluating every literal, and packed into (snapshots, depth) arrays.
+Asks are ascending and bids descending from the touch. Missing levels
+are NaN. Timestamps are int64 ns since epoch (UTC) throughout.
+"""
+
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+ORDERBOOK_CSV = 'eth-btc-orderbooks.csv'
+TRADES_CSV = 'eth-btc-trades.csv'
+SIDES = ('bid', 'ask')
+
+LEVEL_PATTERN = re.compile(r"'price':\s*([-+0-9.eE]+),\s*'size':\s*([-+0-9.eE]+)")
+
+
+class BookSnapshots:
+    """
+    Order-book snapshots as (n, depth) price and size arrays per side.
+
+    Args:
+        timestamps: Snapshot times as int64 ns since epoch (UTC)
+        bid_prices, bid_sizes: Bid ladder, best first
+        ask_prices, ask_sizes: Ask ladder, best first
+    """
+
+    def __init__(self, timestamps: np.ndarray, bid_prices: np.ndarray, bid_sizes: np.ndarray,
+                 ask_prices: np.ndarray, ask_sizes: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.bid_prices = np.asarray(bid_prices, dtype=np.float64)
+        self.bid_sizes = np.asarray(bid_sizes, dtype=np.float64)
+        self.ask_prices = np.asarray(ask_prices, dtype=np.float64)
+        self.ask_sizes = np.asarray(ask_sizes, dtype=np.float64)
+
+        n = len(self.timestamps)
+        for name in ('bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes'):
+            if getattr(self, name).ndim != 2 or len(getattr(self, name)) != n:
+                raise ValueError(f"{name} must be a (snapshots, depth) array with {n} rows")
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def depth(self) -> int:
+        return self.bid_prices.shape[1]
+
+    def prices(self, side: str) -> np.ndarray:
+        """Level prices for 'bid' or 'ask'."""
+        return self.bid_prices if side == 'bid' else self.ask_prices
+
+    def sizes(self, side: str) -> np.ndarray:
+        """Level sizes for 'bid' or 'ask'."""
+        return self.bid_sizes if side == 'bid' else self.ask_sizes
+
+    def best_bid(self) -> np.ndarray:
+        return self.bid_prices[:, 0]
+
+    def best_ask(self) -> np.ndarray:
+        return self.ask_prices[:, 0]
+
+    def mid(self) -> np.ndarray:
+        return (self.best_bid() + self.best_ask()) / 2
+
+    def slice(self, start: int, stop: int) -> 'BookSnapshots':
+        """Snapshots [start, stop) by position."""
+        return BookSnapshots(self.timestamps[start:stop],
+                             self.bid_prices[start:stop], self.bid_sizes[start:stop],
+                             self.ask_prices[start:stop], self.ask_sizes[start:stop])
+
+    def between(self, start: Optional[pd.Timestamp] = None,
+                end: Optional[pd.Timestamp] = None) -> 'BookSnapshots':
+        """Snapshots with start <= timestamp < end."""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, to_ns(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamps, to_ns(end), side='left'))
+        return self.slice(lo, hi)
+
+    def times(self) -> pd.DatetimeIndex:
+        """Snapshot times as a UTC DatetimeIndex."""
+        return pd.to_datetime(self.timestamps, unit='ns', utc=True)
+
+
+def to_ns(ts) -> int:
+    """Timestamp-like (string, datetime, pd.Timestamp, ns int) -> int64 ns UTC."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    stamp = pd.Timestamp(ts)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize('UTC')
+    return int(stamp.value)
+
+
+def parse_ladders(texts: pd.Series, depth: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of ladder literals into (prices, sizes) arrays.
+
+    Args:
+        texts: One "[{'price': p, 'size': s}, ...]" string per snapshot
+        depth: Levels to keep (None for the deepest ladder seen)
+
+    Returns:
+        (prices, sizes) float64 arrays of shape (n, depth), NaN-padded
+    """
+    ladders = [LEVEL_PATTERN.findall(text) if isinstance(text, str) else [] for text in texts]
+    lengths = np.array([len(levels) for levels in ladders], dtype=np.int64)
+    depth = int(lengths.max(initial=0)) if depth is None else depth
+
+    prices = np.full((len(ladders), depth), np.nan)
+    sizes = np.full((len(ladders), depth), np.nan)
+
+    # Flatten all levels once, then scatter into the padded arrays
+    flat = np.array([level for levels in ladders for level in levels[:depth]], dtype=np.float64).reshape(-1, 2)
+    kept = np.minimum(lengths, depth)
+    rows = np.repeat(np.arange(len(ladders)), kept)
+    cols = np.arange(len(rows)) - np.repeat(np.cumsum(kept) - kept, kept)
+    prices[rows, cols] = flat[:, 0]
+    sizes[rows, cols] = flat[:, 1]
+    return prices, sizes
+
+
+def load_orderbook_csv(filepath: str = ORDERBOOK_CSV, depth: Optional[int] = None) -> BookSnapshots:
+    """
+    Load the order-book CSV into level arrays.
+
+    Args:
+        filepath: CSV with timestamp, asks, bids columns
+        depth: Levels per side to keep (None for all)
+
+    Returns:
+        BookSnapshots sorted by timestamp
+    """
+    df = pd.read_csv(filepath)
+    timestamps = pd.to_datetime(df['timestamp'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.argsort(timestamps, kind='stable')
+
+    bid_prices, bid_sizes = parse_ladders(df['bids'], depth)
+    ask_prices, ask_sizes = parse_ladders(df['asks'], depth)
+
+    # Give both sides the same width when the deepest ladders differ
+    width = max(bid_prices.shape[1], ask_prices.shape[1])
+    bid_prices, bid_sizes, ask_prices, ask_sizes = [
+        np.pad(a, ((0, 0), (0, width - a.shape[1])), constant_values=np.nan)
+        for a in (bid_prices, bid_sizes, ask_prices, ask_sizes)
+    ]
+
+    return BookSnapshots(timestamps[order], bid_prices[order], bid_sizes[order],
+                         ask_prices[order], ask_sizes[order])
+
+
+def load_trades_csv(filepath: str = TRADES_CSV) -> pd.DataFrame:
+    """
+    Load the trades CSV.
+
+    Args:
+        filepath: CSV with timestamp, price, size, side (BUY/SELL taker side)
+
+    Returns:
+        DataFrame sorted by time with int64 ns 'timestamp', 'price', 'size'
+        and 'side' (+1 buy, -1 sell)
+    """
+    df = pd.read_csv(filepath)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(df['timestamp'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+        'price': df['price'].astype(np.float64),
+        'size': df['size'].astype(np.float64),
+        'side': df['side'].str.upper().map({'BUY': 1, 'SELL': -1}).fillna(0).astype(np.int8)
+    }).sort_values('timestamp', kind='stable', ignore_index=True)
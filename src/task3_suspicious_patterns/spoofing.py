@@ -0,0 +1,431 @@
+"""
+Spoofing and layering detection from order-book snapshot diffs.
+
+Consecutive snapshots are diffed level by level on each side. Levels are
+keyed by (snapshot, signed price tick) so every side of the capture is one
+globally sorted key array. Shifting the previous snapshot's keys by one
+snapshot lines them up with the current one, and a stable sort of the two
+sorted runs (a linear merge) pairs equal price levels. Unpaired previous
+levels were removed and unpaired current levels were added. Paired levels
+with a new size were modified. Removals and additions beyond the visible
+depth are tagged leave_view/enter_view rather than cancel/add.
+
+Large resting levels (size at or above a high quantile of all level
+sizes) are tracked as episodes of consecutive snapshots. Each episode
+records its lifetime, size, distance from the touch and how it ended.
+Trades that went through its price while it rested are cross-checked.
+Episodes that appeared mid-capture, lived only a few snapshots and were
+pulled without any trade reaching them are flagged as spoofing
+candidates. Several such levels on one side that appear and vanish
+together are flagged as layering.
+
+Usage:
+    python src/task3_suspicious_patterns/spoofing.py [--book eth-btc-orderbooks.csv|file.obk]
+"""
+
+import argparse
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from orderbook import (
+    BookSnapshots, ORDERBOOK_CSV, SIDES, TRADES_CSV, load_orderbook_csv, load_trades_csv
+)
+
+# Configuration
+PRICE_TICK = 1e-8  # ETH/BTC quotes have 8 decimals
+SIZE_TICK = 1e-8  # So do trade sizes
+LARGE_SIZE_QUANTILE = 0.95  # Levels at or above this size quantile count as large
+MAX_SPOOF_SNAPSHOTS = 3  # Longest lifetime (in snapshots) of a spoofing candidate
+LAYERING_MIN_LEVELS = 3  # Candidates on one side that must appear and vanish together
+EVENTS_OUTPUT = 'outputs/eth_btc_book_events.csv'
+EPISODES_OUTPUT = 'outputs/eth_btc_large_orders.csv'
+
+EVENT_TYPES = ['add', 'cancel', 'modify', 'consumed', 'enter_view', 'leave_view']
+
+
+class SideLevels:
+    """
+    Flattened, sorted levels of one book side.
+
+    Ticks are negated on the bid side so that 'better' is always a lower
+    signed tick and every snapshot's levels are ascending. Keys are
+    snapshot * stride + (signed tick - min tick), globally sorted.
+    """
+
+    def __init__(self, book: BookSnapshots, side: str, tick: float = PRICE_TICK):
+        prices = book.prices(side)
+        sizes = book.sizes(side)
+        sign = -1 if side == 'bid' else 1
+
+        signed = np.where(np.isfinite(prices), sign * np.round(np.nan_to_num(prices) / tick), np.inf)
+        # Sorting depth levels within each row is linear in the number of snapshots
+        order = np.argsort(signed, axis=1, kind='stable')
+        signed = np.take_along_axis(signed, order, axis=1)
+        sizes = np.take_along_axis(sizes, order, axis=1)
+        valid = np.isfinite(signed) & np.isfinite(sizes) & (sizes > 0)
+
+        self.side = side
+        self.sign = sign
+        self.tick = tick
+        self.n_snapshots = len(book)
+        self.snapshot = np.nonzero(valid)[0].astype(np.int64)
+        self.ticks = signed[valid].astype(np.int64)
+        self.sizes = sizes[valid]
+
+        # Visible range and touch of every snapshot (empty snapshots get an empty range)
+        counts = valid.sum(axis=1)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        has_levels = counts > 0
+        self.best = np.full(len(book), np.iinfo(np.int64).max)
+        self.worst = np.full(len(book), np.iinfo(np.int64).min)
+        self.best[has_levels] = self.ticks[starts[has_levels]]
+        self.worst[has_levels] = self.ticks[starts[has_levels] + counts[has_levels] - 1]
+
+        self.min_tick = int(self.ticks.min()) if len(self.ticks) else 0
+        self.stride = (int(self.ticks.max()) - self.min_tick + 1) if len(self.ticks) else 1
+        self.keys = self.snapshot * self.stride + (self.ticks - self.min_tick)
+
+    def price(self, ticks: np.ndarray) -> np.ndarray:
+        """Signed ticks -> prices."""
+        return self.sign * ticks * self.tick
+
+    def find(self, snapshots: np.ndarray, ticks: np.ndarray) -> np.ndarray:
+        """Row of each (snapshot, tick) level, or -1 where absent."""
+        keys = snapshots * self.stride + (ticks - self.min_tick)
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        found = (len(self.keys) > 0) & (self.keys[pos] == keys)
+        return np.where(found, pos, -1)
+
+
+def distance_bps(levels: SideLevels, rows: np.ndarray, mid: np.ndarray) -> np.ndarray:
+    """Distance of levels from their snapshot's touch in bps of mid (positive = behind the touch)."""
+    snapshots = levels.snapshot[rows]
+    return (levels.ticks[rows] - levels.best[snapshots]) * levels.tick / mid[snapshots] * 10000
+
+
+def diff_side(levels: SideLevels, mid: np.ndarray) -> pd.DataFrame:
+    """
+    Diff consecutive snapshots of one side.
+
+    Args:
+        levels: Flattened side levels
+        mid: Mid price per snapshot
+
+    Returns:
+        One row per level event with snapshot (the later one), side, price,
+        event, size_before, size_after and distance_bps
+    """
+    n = levels.n_snapshots
+    # Previous snapshot's levels, keyed as if they belonged to the next snapshot
+    prev_rows = np.nonzero(levels.snapshot < n - 1)[0]
+    cur_rows = np.nonzero(levels.snapshot > 0)[0]
+    prev_keys = levels.keys[prev_rows] + levels.stride
+    cur_keys = levels.keys[cur_rows]
+
+    # Both key runs are sorted, so the stable sort is a linear merge
+    merged = np.concatenate([prev_keys, cur_keys])
+    from_cur = np.concatenate([np.zeros(len(prev_keys), dtype=bool), np.ones(len(cur_keys), dtype=bool)])
+    rows = np.concatenate([prev_rows, cur_rows])
+    order = np.argsort(merged, kind='stable')
+    merged, from_cur, rows = merged[order], from_cur[order], rows[order]
+
+    paired = np.zeros(len(merged), dtype=bool)
+    same = merged[1:] == merged[:-1]
+    paired[1:] |= same
+    paired[:-1] |= same
+
+    events = []
+
+    # Paired levels whose size changed
+    first = np.nonzero(same)[0]
+    before, after = rows[first], rows[first + 1]
+    changed = levels.sizes[before] != levels.sizes[after]
+    before, after = before[changed], after[changed]
+    events.append(pd.DataFrame({
+        'snapshot': levels.snapshot[after],
+        'tick': levels.ticks[after],
+        'event': 'modify',
+        'size_before': levels.sizes[before],
+        'size_after': levels.sizes[after],
+        'distance_bps': distance_bps(levels, after, mid)
+    }))
+
+    # Removed: unpaired previous levels, classified against the next snapshot's visible range
+    removed = rows[~paired & ~from_cur]
+    next_snapshot = levels.snapshot[removed] + 1
+    ticks = levels.ticks[removed]
+    event = np.where(ticks < levels.best[next_snapshot], 'consumed',
+                     np.where(ticks > levels.worst[next_snapshot], 'leave_view', 'cancel'))
+    events.append(pd.DataFrame({
+        'snapshot': next_snapshot,
+        'tick': ticks,
+        'event': event,
+        'size_before': levels.sizes[removed],
+        'size_after': 0.0,
+        'distance_bps': distance_bps(levels, removed, mid)
+    }))
+
+    # Added: unpaired current levels, classified against the previous snapshot's visible range
+    added = rows[~paired & from_cur]
+    ticks = levels.ticks[added]
+    event = np.where(ticks > levels.worst[levels.snapshot[added] - 1], 'enter_view', 'add')
+    events.append(pd.DataFrame({
+        'snapshot': levels.snapshot[added],
+        'tick': ticks,
+        'event': event,
+        'size_before': 0.0,
+        'size_after': levels.sizes[added],
+        'distance_bps': distance_bps(levels, added, mid)
+    }))
+
+    df = pd.concat(events, ignore_index=True).sort_values(['snapshot', 'tick'], kind='stable', ignore_index=True)
+    df.insert(1, 'side', levels.side)
+    df.insert(2, 'price', levels.price(df.pop('tick').to_numpy()))
+    df['event'] = pd.Categorical(df['event'], categories=EVENT_TYPES)
+    return df
+
+
+def traded_through(trades: pd.DataFrame, side: str, prices: np.ndarray,
+                   start_ns: np.ndarray, end_ns: np.ndarray, tick: float = PRICE_TICK) -> np.ndarray:
+    """
+    Volume traded at or through each resting level while it was visible.
+
+    An ask is reached by buy trades at or above its price, a bid by sell
+    trades at or below it.
+
+    Each window is a slice [lo, hi) of the time-sorted taker trades, and its
+    volume is a difference of two prefix sums over trades reaching the
+    level's price. Prefixes are split into power-of-two blocks (the binary
+    digits of the prefix length). At each block size the trades are sorted
+    by (block, signed tick) with a stable sort that merges the previous
+    size's sorted runs, and a cumulative size along that order answers every
+    level's block with one searchsorted. Sizes are summed as integer
+    SIZE_TICK units, so the prefix differences are exact and a level no
+    trade reached gets exactly zero. Work is O((trades + levels) log
+    trades), independent of how long the windows are.
+
+    Args:
+        trades: Output of load_trades_csv
+        side: 'bid' or 'ask'
+        prices: Level prices
+        start_ns: Start of each window (inclusive)
+        end_ns: End of each window (exclusive)
+        tick: Price tick used to compare trade and level prices
+
+    Returns:
+        Traded size per level
+    """
+    aggressor = 1 if side == 'ask' else -1
+    sign = 1 if side == 'ask' else -1
+    taker = trades[trades['side'] == aggressor]
+    times = taker['timestamp'].to_numpy()
+    if not len(times) or not len(prices):
+        return np.zeros(len(prices))
+
+    # Signed ticks make 'reached' a >= comparison on both sides
+    trade_ticks = sign * np.round(taker['price'].to_numpy() / tick).astype(np.int64)
+    level_ticks = sign * np.round(np.asarray(prices, dtype=np.float64) / tick).astype(np.int64)
+    low = min(trade_ticks.min(), level_ticks.min())
+    trade_ticks -= low
+    level_ticks -= low
+    stride = int(max(trade_ticks.max(), level_ticks.max())) + 1
+    trade_units = np.round(taker['size'].to_numpy() / SIZE_TICK).astype(np.int64)
+
+    # Trades are time-sorted, so each window is a slice
+    bounds = np.stack([np.searchsorted(times, end_ns, side='left'),
+                       np.searchsorted(times, start_ns, side='left')])
+    direction = np.array([1, -1])  # Window volume = prefix(hi) - prefix(lo)
+    units = np.zeros(len(prices), dtype=np.int64)
+
+    n = len(times)
+    order = np.arange(n)
+    for level in range(int(n).bit_length()):
+        if level:
+            order = order[np.argsort((order >> level) * stride + trade_ticks[order], kind='stable')]
+        keys = (order >> level) * stride + trade_ticks[order]
+        cum_units = np.concatenate([[0], np.cumsum(trade_units[order])])
+
+        # Prefixes with this bit set include block (length >> level) - 1 in full
+        prefix, window = np.nonzero((bounds >> level) & 1)
+        block = (bounds[prefix, window] >> level) - 1
+        first = np.searchsorted(keys, block * stride + level_ticks[window], side='left')
+        reached = cum_units[(block + 1) << level] - cum_units[first]
+        np.add.at(units, window, direction[prefix] * reached)
+
+    return units / round(1 / SIZE_TICK)
+
+
+def large_level_episodes(levels: SideLevels, book: BookSnapshots, threshold: float,
+                         trades: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Track large resting levels as episodes of consecutive snapshots.
+
+    Args:
+        levels: Flattened side levels
+        book: Snapshots (for timestamps and mid prices)
+        threshold: Minimum size of a large level
+        trades: Optional trades for the fill cross-check
+
+    Returns:
+        One row per episode: side, price, start/end snapshot and time,
+        lifetime, sizes, distance from the touch, end reason and traded
+        volume that reached the level
+    """
+    mid = book.mid()
+    large = np.nonzero(levels.sizes >= threshold)[0]
+    # Only the large subset is re-sorted, by (price, snapshot)
+    large = large[np.lexsort((levels.snapshot[large], levels.ticks[large]))]
+    ticks = levels.ticks[large]
+    snapshots = levels.snapshot[large]
+
+    new_episode = np.ones(len(large), dtype=bool)
+    new_episode[1:] = (ticks[1:] != ticks[:-1]) | (snapshots[1:] != snapshots[:-1] + 1)
+    starts = np.nonzero(new_episode)[0]
+    if not len(starts):
+        return pd.DataFrame(columns=['side', 'price', 'start_snapshot', 'end_snapshot', 'start', 'end',
+                                     'snapshots', 'lifetime_seconds', 'max_size', 'mean_size',
+                                     'min_distance_bps', 'mean_distance_bps', 'end_reason',
+                                     'traded_volume'])
+    lengths = np.diff(np.append(starts, len(large)))
+
+    distances = distance_bps(levels, large, mid)
+    sizes = levels.sizes[large]
+    start_snap = snapshots[starts]
+    end_snap = start_snap + lengths - 1
+    ep_ticks = ticks[starts]
+
+    # How each episode ended, judged from the snapshot after its last one
+    n = levels.n_snapshots
+    following = np.minimum(end_snap + 1, n - 1)
+    still_there = levels.find(following, ep_ticks) >= 0
+    reason = np.where(ep_ticks < levels.best[following], 'consumed',
+                      np.where(ep_ticks > levels.worst[following], 'out_of_view',
+                               np.where(still_there, 'reduced', 'cancelled')))
+    reason = np.where(end_snap == n - 1, 'open', reason)
+
+    timestamps = book.timestamps
+    window_end = np.where(end_snap == n - 1, timestamps[-1] + 1, timestamps[following])
+    prices = levels.price(ep_ticks)
+    traded = (traded_through(trades, levels.side, prices, timestamps[start_snap], window_end)
+              if trades is not None else np.full(len(starts), np.nan))
+
+    return pd.DataFrame({
+        'side': levels.side,
+        'price': prices,
+        'start_snapshot': start_snap,
+        'end_snapshot': end_snap,
+        'start': pd.to_datetime(timestamps[start_snap], unit='ns', utc=True),
+        'end': pd.to_datetime(timestamps[end_snap], unit='ns', utc=True),
+        'snapshots': lengths,
+        'lifetime_seconds': (timestamps[end_snap] - timestamps[start_snap]) / 1e9,
+        'max_size': np.maximum.reduceat(sizes, starts),
+        'mean_size': np.add.reduceat(sizes, starts) / lengths,
+        'min_distance_bps': np.minimum.reduceat(distances, starts),
+        'mean_distance_bps': np.add.reduceat(distances, starts) / lengths,
+        'end_reason': reason,
+        'traded_volume': traded
+    })
+
+
+def flag_spoofing(episodes: pd.DataFrame, max_snapshots: int = MAX_SPOOF_SNAPSHOTS,
+                  layering_min_levels: int = LAYERING_MIN_LEVELS) -> pd.DataFrame:
+    """
+    Add spoof_candidate and layering flags to large-level episodes.
+
+    A spoofing candidate appeared after the first snapshot, lived at most
+    max_snapshots snapshots, was cancelled or reduced (not consumed, not
+    out of view) and no trade reached its price while it rested.
+    """
+    df = episodes.copy()
+    df['spoof_candidate'] = (
+        (df['start_snapshot'] > 0) &
+        (df['snapshots'] <= max_snapshots) &
+        df['end_reason'].isin(['cancelled', 'reduced']) &
+        (df['traded_volume'].fillna(0) == 0)
+    )
+    group_size = df[df['spoof_candidate']].groupby(
+        ['side', 'start_snapshot', 'end_snapshot'])['price'].transform('size')
+    df['layering'] = False
+    df.loc[group_size.index, 'layering'] = group_size >= layering_min_levels
+    return df
+
+
+def detect_spoofing(book: BookSnapshots, trades: Optional[pd.DataFrame] = None,
+                    tick: float = PRICE_TICK,
+                    large_quantile: float = LARGE_SIZE_QUANTILE) -> Dict[str, pd.DataFrame]:
+    """
+    Run the full detector over a snapshot stream.
+
+    Args:
+        book: Snapshots sorted by time
+        trades: Optional trades (load_trades_csv) for the fill cross-check
+        tick: Price tick
+        large_quantile: Size quantile above which a level counts as large
+
+    Returns:
+        {'events': level events, 'episodes': flagged large-level episodes}
+    """
+    mid = book.mid()
+    sides = {side: SideLevels(book, side, tick) for side in SIDES}
+    all_sizes = np.concatenate([levels.sizes for levels in sides.values()])
+    threshold = float(np.quantile(all_sizes, large_quantile)) if len(all_sizes) else np.inf
+
+    events = pd.concat([diff_side(levels, mid) for levels in sides.values()], ignore_index=True)
+    events = events.sort_values(['snapshot', 'side'], kind='stable', ignore_index=True)
+    events.insert(0, 'timestamp', pd.to_datetime(book.timestamps[events['snapshot']], unit='ns', utc=True))
+
+    episodes = pd.concat([large_level_episodes(levels, book, threshold, trades)
+                          for levels in sides.values()], ignore_index=True)
+    episodes = flag_spoofing(episodes).sort_values(['start_snapshot', 'side', 'price'], ignore_index=True)
+    episodes.attrs['large_size_threshold'] = threshold
+
+    return {'events': events, 'episodes': episodes}
+
+
+def load_book(path: str) -> BookSnapshots:
+    """Load snapshots from the CSV or a binary store (.obk)."""
+    if path.endswith('.obk'):
+        from book_store import BookStore
+        with BookStore(path) as store:
+            return store.read()
+    return load_orderbook_csv(path)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to run spoofing detection on the ETH/BTC capture."""
+    parser = argparse.ArgumentParser(description='Spoofing and layering detection')
+    parser.add_argument('--book', default=ORDERBOOK_CSV, help='Order-book CSV or .obk store')
+    parser.add_argument('--trades', default=TRADES_CSV, help='Trades CSV')
+    args = parser.parse_args(argv)
+
+    book = load_book(args.book)
+    trades = load_trades_csv(args.trades)
+    print(f"Loaded {len(book)} snapshots (depth {book.depth}) and {len(trades)} trades")
+
+    result = detect_spoofing(book, trades)
+    events, episodes = result['events'], result['episodes']
+
+    print(f"\nLevel events: {len(events)}")
+    print(events.groupby(['side', 'event'], observed=True).size().unstack(fill_value=0).to_string())
+
+    print(f"\nLarge levels: size >= {episodes.attrs['large_size_threshold']:.6f}")
+    print(f"Episodes: {len(episodes)}")
+    if not episodes.empty:
+        print(episodes['end_reason'].value_counts().to_string())
+        candidates = episodes[episodes['spoof_candidate']]
+        print(f"\nSpoofing candidates: {len(candidates)} ({int(candidates['layering'].sum())} in layering groups)")
+        if not candidates.empty:
+            print(candidates[['start', 'side', 'price', 'snapshots', 'max_size',
+                              'min_distance_bps', 'end_reason']].head(20).to_string(index=False))
+
+    for df, path in ((events, EVENTS_OUTPUT), (episodes, EPISODES_OUTPUT)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+        print(f"Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Hourly price and trade-size quantiles for the ETH/BTC trades.
+
+Uses the mergeable t-digest sketches from the peg analysis
+(task2_usdc_peg/quantile_sketch.py). Trades are sketched per taker side.
+The buy and sell sketches are then merged into an 'all' view, which is
+also what combining shards of a longer capture looks like. Price
+quantiles are size-weighted, and are reported as the hourly p1/p99
+spread around the median in bps. That spread is a robust alternative to
+the min/max range when looking for prints walked away from the market.
+
+Usage:
+    python src/task3_suspicious_patterns/trade_quantiles.py [--trades eth-btc-trades.csv]
+"""
+
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+import pandas as pd
+
+from orderbook import TRADES_CSV, load_trades_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'task2_usdc_peg'))
+
+from quantile_sketch import (  # noqa: E402
+    SECONDS_PER_HOUR, combine_venues, quantile_columns, sketch_trades
+)
+
+# Configuration
+QUANTILES = [0.01, 0.25, 0.5, 0.75, 0.99]
+SIDE_NAMES = {1: 'buy', -1: 'sell'}
+OUTPUT_PATH = 'outputs/eth_btc_trade_quantiles.csv'
+
+
+def sketch_eth_btc_trades(trades: pd.DataFrame, bucket_seconds: int = SECONDS_PER_HOUR):
+    """
+    Build price and size sketches per taker side, plus their merge.
+
+    Args:
+        trades: Output of load_trades_csv (ns timestamps, price, size, side)
+        bucket_seconds: Bucket length
+
+    Returns:
+        {side name: {'price': BucketSketches, 'size': BucketSketches}} with
+        'buy', 'sell' and 'all'
+    """
+    frame = pd.DataFrame({'timestamp': trades['timestamp'] // 1_000_000_000,
+                          'price': trades['price'], 'volume': trades['size']})
+
+    sketches = {}
+    for side, name in SIDE_NAMES.items():
+        sketches[name] = sketch_trades([frame[trades['side'] == side]], name, bucket_seconds)
+
+    sketches['all'] = {metric: combine_venues(sketches[name][metric] for name in SIDE_NAMES.values())
+                       for metric in ('price', 'size')}
+    return sketches
+
+
+def quantile_report(sketches, quantiles: List[float] = QUANTILES) -> pd.DataFrame:
+    """
+    One row per side and hour with price and size quantiles.
+
+    Returns:
+        DataFrame with side, time, trades, price_<p> and size_<p> columns and
+        the p1-p99 price spread around the median in bps
+    """
+    columns = quantile_columns(quantiles)
+    frames = []
+    for name, metrics in sketches.items():
+        price = metrics['price'].quantile_table(quantiles)
+        size = metrics['size'].quantile_table(quantiles)
+        if price.empty:
+            continue
+        frame = price[['time', 'trades', *columns]].rename(columns={c: f'price_{c}' for c in columns})
+        frame.insert(0, 'side', name)
+        frame = frame.merge(size[['time', *columns]].rename(columns={c: f'size_{c}' for c in columns}),
+                            on='time', how='left')
+        frame['price_spread_bps'] = ((frame[f'price_{columns[-1]}'] - frame[f'price_{columns[0]}'])
+                                     / frame['price_p50'] * 10000)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to print and save ETH/BTC trade quantiles."""
+    parser = argparse.ArgumentParser(description='ETH/BTC trade price and size quantiles')
+    parser.add_argument('--trades', default=TRADES_CSV, help='Trades CSV')
+    args = parser.parse_args(argv)
+
+    trades = load_trades_csv(args.trades)
+    print(f"Loaded {len(trades)} trades")
+
+    sketches = sketch_eth_btc_trades(trades)
+    report = quantile_report(sketches)
+    if report.empty:
+        print("No trades to sketch!")
+        return
+
+    overall = report[report['side'] == 'all']
+    print("\nHourly size-weighted price quantiles (all trades):")
+    print(overall[['time', 'trades', 'price_p1', 'price_p50', 'price_p99', 'price_spread_bps']]
+          .to_string(index=False, float_format='%.6f'))
+
+    for name in ('all', *SIDE_NAMES.values()):
+        size = sketches[name]['size'].combined()
+        if size.count:
+            p50, p99 = size.quantile([0.5, 0.99])
+            print(f"{name} trade size: median {p50:.6f}, p99 {p99:.6f} ETH ({size.count} trades)")
+
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    report.to_csv(OUTPUT_PATH, index=False)
+    print(f"\nSaved: {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()